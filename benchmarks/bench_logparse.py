@@ -0,0 +1,54 @@
+"""
+Parses a synthetic channel log with `fluidpy.logparse` using a growing number of worker
+processes, and reports throughput and speed-up over a single process.
+
+The log is built from the corpora of `bench_process_message.py` (the captured
+`session.log` and generated 6-axis status reports), repeated up to `--size-mb`:
+
+    python benchmarks/bench_logparse.py --size-mb 2048 --processes 1 2 4 8
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from bench_process_message import load_corpora
+from fluidpy.logparse import parse_logs
+
+
+def write_corpus(path: str, size: int) -> int:
+    corpora = load_corpora(["session", "status6"])
+    block = "\n".join(corpora["status6"] + corpora["session"]).encode() + b"\n"
+    written = 0
+    with open(path, "wb") as file:
+        while written < size:
+            file.write(block)
+            written += len(block)
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--size-mb", type=int, default=256, help="size of the synthetic log")
+    parser.add_argument("--processes", type=int, nargs="+",
+                        default=sorted({1, 2, 4, os.cpu_count() or 1}), help="worker counts to run")
+    parser.add_argument("--chunk-mb", type=float, default=8.0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "synthetic.log")
+        size = write_corpus(path, args.size_mb * 1024 * 1024)
+        print(f"{size / 1024 / 1024:.0f} MiB log, {args.chunk_mb} MiB chunks, {os.cpu_count()} cores")
+        print(f"{'processes':>10} {'seconds':>9} {'MiB/sec':>9} {'lines/sec':>12} {'speed-up':>9}")
+        single = None
+        for processes in args.processes:
+            start = time.perf_counter()
+            summary = parse_logs(path, processes=processes, chunk_bytes=int(args.chunk_mb * 1024 * 1024))
+            elapsed = time.perf_counter() - start
+            single = single or elapsed
+            print(f"{processes:>10} {elapsed:>9.2f} {size / 1024 / 1024 / elapsed:>9.1f} "
+                  f"{summary['lines'] / elapsed:>12.0f} {single / elapsed:>8.2f}x")
+
+
+if __name__ == "__main__":
+    main()
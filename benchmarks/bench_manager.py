@@ -0,0 +1,99 @@
+"""
+Runs several simulated controllers, each on its own pseudo-terminal in a separate process,
+from one `ControllerManager` event loop, streaming a job to every controller at once.
+Reports combined throughput (lines and messages per second) as the number of controllers
+grows, to show where a single loop stops keeping up.
+
+    python benchmarks/bench_manager.py --controllers 1 2 4 8 16 --lines 500
+"""
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from fluidpy import FluidNC, Streamer
+from fluidpy.fluidnc import ticks_ns
+from fluidpy.manager import ControllerManager
+
+
+class Counter(FluidNC):
+
+    def __init__(self, report_interval: int):
+        self.reports = 0
+        self.ready = False
+        super().__init__(None, report_interval=report_interval)
+
+    def handle_version(self, version: str) -> None:
+        self.ready = True
+
+    def handle_machine_state(self, state: str) -> None:
+        self.reports += 1
+
+
+def start_simulators(count: int, directory: str, args) -> list:
+    processes = []
+    for i in range(count):
+        link = os.path.join(directory, f"cnc{i}")
+        processes.append((link, subprocess.Popen(
+            [sys.executable, "-m", "fluidpy.simulator", "--link", link, "--block-ms", str(args.block_ms)],
+            stdout=subprocess.DEVNULL)))
+    deadline = time.monotonic() + 10
+    while not all(os.path.exists(link) for link, _ in processes):
+        if time.monotonic() > deadline:
+            raise RuntimeError("simulators didn't start")
+        time.sleep(0.01)
+    return processes
+
+
+async def stream_all(manager: ControllerManager, lines: int) -> float:
+    runner = asyncio.ensure_future(manager.run())
+    controllers = list(manager.controllers.values())
+    while not all(controller.fluidnc.ready for controller in controllers):
+        await asyncio.sleep(0.01)
+    job = [f"G1 X{i % 100}.{i % 7}25 Y{(i * 3) % 100}.5 F3000" for i in range(lines)]
+    streamers = [Streamer(controller.fluidnc, job) for controller in controllers]
+    start = ticks_ns()
+    for streamer in streamers:
+        streamer.start()
+    while not all(streamer.done for streamer in streamers):
+        await asyncio.sleep(0.005)
+    elapsed = (ticks_ns() - start) / 1_000_000_000
+    manager.stop()
+    await runner
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--controllers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--lines", type=int, default=500, help="lines streamed to each controller")
+    parser.add_argument("--block-ms", type=float, default=0.5, help="execution time of each line")
+    parser.add_argument("--report-interval", type=int, default=20, help="$Report/Interval in ms")
+    args = parser.parse_args()
+
+    print(f"{args.lines} lines per controller, {args.block_ms} ms per block, "
+          f"status reports every {args.report_interval} ms")
+    print(f"{'controllers':>12} {'seconds':>9} {'lines/sec':>11} {'msgs/sec':>10} {'reports/sec':>12}")
+    for count in args.controllers:
+        with tempfile.TemporaryDirectory() as directory:
+            processes = start_simulators(count, directory, args)
+            try:
+                manager = ControllerManager()
+                for i, (link, _) in enumerate(processes):
+                    manager.add(f"cnc{i}", link, Counter(args.report_interval))
+                elapsed = asyncio.run(stream_all(manager, args.lines))
+            finally:
+                for _, process in processes:
+                    process.terminate()
+                    process.wait()
+        messages = sum(controller.messages for controller in manager.controllers.values())
+        reports = sum(controller.fluidnc.reports for controller in manager.controllers.values())
+        print(f"{count:>12} {elapsed:>9.3f} {count * args.lines / elapsed:>11.1f} "
+              f"{messages / elapsed:>10.1f} {reports / elapsed:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
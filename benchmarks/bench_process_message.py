@@ -0,0 +1,163 @@
+"""
+Replays corpora of controller messages through `FluidNC.process_message` and reports
+throughput, time per message by kind and peak memory.
+
+Corpora are the `*.log` files in `benchmarks/corpora` (one raw channel message per line,
+eg. `session.log`, captured from a controller at startup and jogging) plus two generated
+ones: `status6`, a high-rate stream of 6-axis status reports, and `settings`, a `$$` dump.
+
+    python benchmarks/bench_process_message.py
+    python benchmarks/bench_process_message.py --save baseline.json
+    python benchmarks/bench_process_message.py --compare baseline.json
+
+Handlers are no-ops by default (`--handlers null`), so the numbers are the cost of the
+library itself; `--handlers default` uses the base class handlers, which format log messages.
+`--reuse-objects` parses status reports into objects updated in place, see `FluidNC.__init__`.
+"""
+import argparse
+import json
+import os
+import time
+import tracemalloc
+
+from fluidpy import FluidNC, BufferInterface
+
+CORPORA_DIR = os.path.join(os.path.dirname(__file__), "corpora")
+
+
+class NullInterface(BufferInterface):
+
+    def write(self, data: bytes) -> int:
+        return len(data)
+
+    def readline(self) -> bytes:
+        return b""
+
+
+class NullHandlers(FluidNC):
+    """
+    Every `handle_*` method that only logs is replaced with a no-op.
+    """
+
+
+for _name in dir(FluidNC):
+    if _name.startswith("handle_") and _name not in ("handle_exp_id", "handle_exp_io"):
+        setattr(NullHandlers, _name, lambda self, *args: None)
+
+
+def status6(count: int = 10000) -> list:
+    states = ("Run", "Run", "Run", "Jog", "Hold:0", "Idle")
+    messages = []
+    for i in range(count):
+        axes = ",".join(f"{(i * (axis + 1)) % 5000 / 10:.3f}" for axis in range(6))
+        message = f"<{states[i % len(states)]}|MPos:{axes}|FS:{1500 + i % 300},{12000 + i % 50}"
+        if i % 10 == 0:
+            message += "|WCO:10.000,20.000,-5.000,0.000,0.000,0.000"
+        if i % 20 == 5:
+            message += "|Ov:100,100,100|A:SF"
+        message += f"|Ln:{i}|Pn:XP>"
+        messages.append(message)
+    return messages
+
+
+def settings(count: int = 10) -> list:
+    dump = [f"$N{n}=" for n in range(2)]
+    dump += [f"${n}={n * 3 % 250}.{n % 10}00" for n in range(133)]
+    dump += [
+        "$Report/Interval=200", "$Config/Filename=config.yaml", "$Message/Level=Info",
+        "$Start/Message=Grbl \\V [FluidNC \\B (\\R) \\H]", "$Firmware/Build=",
+        "$Hostname=fluidnc", "$Sta/SSID=shop", "$WiFi/Mode=STA>AP", "$HTTP/Port=80",
+        "$Telnet/Port=23", "$HTTP/BlockDuringMotion=ON", "$SD/FallbackCS=-1",
+    ]
+    return (dump + ["ok"]) * count
+
+
+def load_corpora(names: list | None) -> dict:
+    corpora = {"status6": status6(), "settings": settings()}
+    for filename in sorted(os.listdir(CORPORA_DIR)):
+        if filename.endswith(".log"):
+            with open(os.path.join(CORPORA_DIR, filename)) as f:
+                corpora[filename[:-4]] = [line.strip() for line in f if line.strip()]
+    if names:
+        corpora = {name: corpora[name] for name in names}
+    return corpora
+
+
+def bench(fnc_class, messages: list, repeat: int, reuse_objects: bool = False) -> dict:
+    # throughput, without any per-message timing overhead
+    fnc = fnc_class(NullInterface(), reuse_objects=reuse_objects)
+    process = fnc.process_message
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for message in messages:
+            process(message)
+    elapsed = time.perf_counter() - start
+    total = len(messages) * repeat
+
+    # time per message by kind
+    clock = time.perf_counter_ns
+    kinds = dict()
+    for message in messages:
+        begin = clock()
+        kind = process(message)
+        ns = clock() - begin
+        count, total_ns = kinds.get(kind, (0, 0))
+        kinds[kind] = (count + 1, total_ns + ns)
+
+    # peak memory for one pass over the corpus
+    fnc = fnc_class(NullInterface(), reuse_objects=reuse_objects)
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    for message in messages:
+        fnc.process_message(message)
+    peak = tracemalloc.get_traced_memory()[1] - baseline
+    tracemalloc.stop()
+
+    return {
+        "messages": total,
+        "msgs_per_sec": total / elapsed,
+        "us_per_msg": {kind: total_ns / count / 1000 for kind, (count, total_ns) in sorted(kinds.items())},
+        "peak_kib": peak / 1024,
+    }
+
+
+def report(results: dict, baseline: dict | None) -> None:
+    def change(new, old):
+        return f" ({(new - old) / old * 100:+.1f}%)" if old else ""
+
+    for name, result in results.items():
+        old = (baseline or {}).get(name, {})
+        print(f"{name}: {result['messages']} messages")
+        print(f"  {result['msgs_per_sec']:12.0f} msgs/sec{change(result['msgs_per_sec'], old.get('msgs_per_sec'))}")
+        print(f"  {result['peak_kib']:12.1f} KiB peak{change(result['peak_kib'], old.get('peak_kib'))}")
+        for kind, us in result["us_per_msg"].items():
+            print(f"  {us:12.2f} us/msg {kind}{change(us, old.get('us_per_msg', {}).get(kind))}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--corpus", action="append", help="corpus to run (repeatable), default all")
+    parser.add_argument("--repeat", type=int, default=5, help="passes over each corpus")
+    parser.add_argument("--handlers", choices=("null", "default"), default="null")
+    parser.add_argument("--reuse-objects", action="store_true", help="update status objects in place")
+    parser.add_argument("--save", help="write results to a json file")
+    parser.add_argument("--compare", help="json file of earlier results to compare against")
+    args = parser.parse_args()
+
+    fnc_class = NullHandlers if args.handlers == "null" else FluidNC
+    results = {name: bench(fnc_class, messages, args.repeat, args.reuse_objects)
+               for name, messages in load_corpora(args.corpus).items()}
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    report(results, baseline)
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
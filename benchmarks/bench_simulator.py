@@ -0,0 +1,67 @@
+"""
+Streams a job to the simulated controller in real time and reports end-to-end throughput
+and listener latency, the time from the controller sending a status report to its
+`handle_machine_state` running.
+
+Unlike `bench_streaming.py` (virtual time, modelled link) this runs the library's own
+poll loop against `fluidpy.simulator`, so it includes the cost of parsing and dispatch.
+
+    python benchmarks/bench_simulator.py --lines 2000 --block-ms 1 --report-interval 50
+"""
+import argparse
+
+from fluidpy import FluidNC, Streamer
+from fluidpy.fluidnc import ticks_ns
+from fluidpy.simulator import SimulatorInterface
+
+
+class Listener(FluidNC):
+
+    def __init__(self, io: SimulatorInterface):
+        self.latencies_ns = []
+        super().__init__(io)
+
+    def handle_machine_state(self, state: str) -> None:
+        self.latencies_ns.append(ticks_ns() - self.io.controller.last_emitted_ns)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--lines", type=int, default=2000)
+    parser.add_argument("--block-ms", type=float, default=1.0, help="execution time of each line")
+    parser.add_argument("--planner-blocks", type=int, default=16)
+    parser.add_argument("--rx-buffer", type=int, default=128)
+    parser.add_argument("--report-interval", type=int, default=50, help="$Report/Interval in ms")
+    args = parser.parse_args()
+
+    io = SimulatorInterface(rx_buffer_size=args.rx_buffer, planner_blocks=args.planner_blocks,
+                            block_ms=args.block_ms)
+    fnc = Listener(io)
+    fnc.report_interval = args.report_interval
+    while fnc.poll():
+        pass
+
+    job = (f"G1 X{i % 100}.{i % 7}25 Y{(i * 3) % 100}.5 F3000" for i in range(args.lines))
+    streamer = Streamer(fnc, job)
+    start = ticks_ns()
+    streamer.run()
+    # the last lines are answered while still in the planner, wait until they've run
+    while io.controller.state(ticks_ns()) != "Idle":
+        fnc.poll()
+    elapsed = (ticks_ns() - start) / 1_000_000_000
+    throughput = args.lines / elapsed
+    limit = 1000 / args.block_ms
+
+    latencies = sorted(fnc.latencies_ns) or [0]
+    print(f"{args.lines} lines, {args.block_ms} ms per block, {args.planner_blocks} planner blocks, "
+          f"{args.rx_buffer} byte receive buffer")
+    print(f"  {elapsed:8.3f} s  {throughput:8.1f} lines/sec  (planner limit {limit:.1f} lines/sec)")
+    print(f"  {len(fnc.latencies_ns)} status reports, listener latency "
+          f"p50 {latencies[len(latencies) // 2] / 1000:.1f} us, "
+          f"p99 {latencies[len(latencies) * 99 // 100] / 1000:.1f} us, max {latencies[-1] / 1000:.1f} us")
+    print(f"  receive buffer overflows: {io.controller.rx_overflows}")
+    assert throughput <= limit, "lines executed faster than the planner allows"
+
+
+if __name__ == "__main__":
+    main()
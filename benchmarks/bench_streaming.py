@@ -0,0 +1,119 @@
+"""
+Compares character counting (`Streamer`) against ping-pong sending (wait for each `ok`)
+over a simulated serial link.
+
+The link and controller are modelled in virtual time, so the numbers are deterministic and
+the benchmark finishes in a moment regardless of the simulated baud rate:
+
+- bytes travel at `baud / 10` bytes/sec in each direction, plus `latency_ms` of
+  adapter/driver latency each way
+- the controller takes a line out of its receive buffer as soon as the planner has room,
+  spending `parse_ms` on it before answering `ok`
+- each planned block takes `block_ms` to execute
+
+    python benchmarks/bench_streaming.py --lines 2000 --block-ms 2
+"""
+import argparse
+from collections import deque
+
+from fluidpy import FluidNC, BufferInterface, Streamer
+
+
+class SimulatedLink(BufferInterface):
+
+    def __init__(self, baud: int = 115200, planner_blocks: int = 16, block_ms: float = 2.0,
+                 latency_ms: float = 1.0, parse_ms: float = 0.1):
+        self.byte_time = 10 / baud
+        self.latency = latency_ms / 1000
+        self.parse_time = parse_ms / 1000
+        self.planner_blocks = planner_blocks
+        self.block_time = block_ms / 1000
+        self.now = 0.0
+        self._host_tx_free = 0.0
+        self._ctrl_tx_free = 0.0
+        self._ctrl_time = 0.0
+        self._rx_lines = deque()    # arrival time of each line sent by the host
+        self._planner = deque()     # finish time of each planned block
+        self._out = deque()         # (arrival time, response) sent by the controller
+
+    def write(self, data: bytes) -> int:
+        self._host_tx_free = max(self.now, self._host_tx_free) + len(data) * self.byte_time
+        self._rx_lines.append(self._host_tx_free + self.latency)
+        return len(data)
+
+    def readline(self) -> bytes:
+        self._run_controller(self.now)
+        while not self._out:
+            if not self._run_controller(float("inf"), max_lines=1):
+                return b""
+        arrival, response = self._out.popleft()
+        self.now = max(self.now, arrival)
+        return response
+
+    def _run_controller(self, until: float, max_lines: int | None = None) -> int:
+        parsed = 0
+        while self._rx_lines and (max_lines is None or parsed < max_lines):
+            t = max(self._rx_lines[0], self._ctrl_time)
+            while self._planner and self._planner[0] <= t:
+                self._planner.popleft()
+            if len(self._planner) >= self.planner_blocks:
+                t = self._planner[0]
+            if t > until:
+                break
+            while self._planner and self._planner[0] <= t:
+                self._planner.popleft()
+            self._rx_lines.popleft()
+            t += self.parse_time
+            self._ctrl_time = t
+            start = self._planner[-1] if self._planner else t
+            self._planner.append(max(start, t) + self.block_time)
+            self._ctrl_tx_free = max(t, self._ctrl_tx_free) + 3 * self.byte_time
+            self._out.append((self._ctrl_tx_free + self.latency, b"ok\r\n"))
+            parsed += 1
+        return parsed
+
+
+def make_job(count: int):
+    for i in range(count):
+        yield f"G1 X{i % 100}.{i % 7}25 Y{(i * 3) % 100}.5 F3000"
+
+
+def ping_pong(link: SimulatedLink, count: int) -> float:
+    fnc = FluidNC(link)
+    for line in make_job(count):
+        fnc.send_message(line + "\n")
+        while link.readline().strip() != b"ok":
+            pass
+    return link.now
+
+
+def character_counting(link: SimulatedLink, count: int, rx_buffer_size: int) -> float:
+    fnc = FluidNC(link, rx_buffer_size=rx_buffer_size)
+    Streamer(fnc, make_job(count)).run()
+    return link.now
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--lines", type=int, default=2000)
+    parser.add_argument("--baud", type=int, default=115200)
+    parser.add_argument("--block-ms", type=float, default=2.0, help="execution time of each line")
+    parser.add_argument("--latency-ms", type=float, default=1.0, help="one-way link latency")
+    parser.add_argument("--parse-ms", type=float, default=0.1, help="controller time per line")
+    parser.add_argument("--rx-buffer", type=int, default=128)
+    args = parser.parse_args()
+
+    def link():
+        return SimulatedLink(args.baud, block_ms=args.block_ms, latency_ms=args.latency_ms,
+                             parse_ms=args.parse_ms)
+
+    pp = ping_pong(link(), args.lines)
+    cc = character_counting(link(), args.lines, args.rx_buffer)
+    print(f"{args.lines} lines @ {args.baud} baud, {args.block_ms} ms per block, "
+          f"{args.latency_ms} ms latency")
+    print(f"  ping-pong          {pp:8.3f} s  {args.lines / pp:8.1f} lines/sec")
+    print(f"  character counting {cc:8.3f} s  {args.lines / cc:8.1f} lines/sec  ({pp / cc:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
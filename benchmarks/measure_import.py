@@ -0,0 +1,78 @@
+"""
+Measures the time and heap taken to import fluidpy, create a `FluidNC` and parse a first
+status report. Runs under CPython and the MicroPython unix port:
+
+    python benchmarks/measure_import.py
+    micropython benchmarks/measure_import.py
+"""
+import gc
+import sys
+import time
+
+sys.path.insert(0, __file__.rsplit("/", 2)[0] + "/src" if "/" in __file__ else "../src")
+
+if sys.implementation.name == "micropython":
+    def ticks_us():
+        return time.ticks_us()
+
+    def elapsed_us(start):
+        return time.ticks_diff(time.ticks_us(), start)
+
+    def heap_used():
+        gc.collect()
+        return gc.mem_alloc()
+
+    def stop_heap():
+        pass
+else:
+    import tracemalloc
+    tracemalloc.start()
+
+    def ticks_us():
+        return time.perf_counter_ns() // 1000
+
+    def elapsed_us(start):
+        return ticks_us() - start
+
+    def heap_used():
+        gc.collect()
+        return tracemalloc.get_traced_memory()[0]
+
+    def stop_heap():
+        tracemalloc.stop()
+
+
+class NullInterface:
+
+    def write(self, data):
+        return len(data)
+
+    def readline(self):
+        return b""
+
+
+def main():
+    results = []
+    base = heap_used()
+
+    start = ticks_us()
+    import fluidpy
+    results.append(("import fluidpy", elapsed_us(start), heap_used() - base))
+
+    start = ticks_us()
+    fnc = fluidpy.FluidNC(NullInterface())
+    results.append(("FluidNC()", elapsed_us(start), heap_used() - base))
+
+    start = ticks_us()
+    fnc.process_message("<Idle|MPos:3.000,0.000,0.000|FS:0,0|Pn:PT>")
+    results.append(("first status report", elapsed_us(start), heap_used() - base))
+    stop_heap()
+
+    print(sys.implementation.name, sys.version.split()[0])
+    for name, us, heap in results:
+        print("  %-22s %8.2f ms  %8d bytes" % (name, us / 1000, heap))
+    for module in ("asyncio", "fluidpy.udecimal_constants"):
+        print("  %-22s %s" % (module, "loaded" if module in sys.modules else "not loaded"))
+
+
+main()
@@ -1,3 +1,5 @@
 
-from fluidpy.fluidnc import FluidNC, FluidParseError, BufferInterface, Position, Mode
+from fluidpy.fluidnc import FluidNC, FluidParseError, BufferInterface, Position, Mode, RealtimeCommand, \
+    Response, CommandFuture, CommandCancelledError
+from fluidpy.streamer import Streamer
 from fluidpy.udecimal import DecimalNumber as Decimal
@@ -0,0 +1,65 @@
+"""
+Wrapping of `FluidNC` methods on the instance, used by the features turned on with the
+`enable_*` methods. Each method keeps a chain of wrappers around the original (in
+`FluidNC._method_chains`), so features can be turned on and off in any order.
+"""
+
+
+def wrap_methods(fluidnc, names, wrapper) -> dict:
+    """
+    Wrap methods of the instance with `wrapper(name, method)`, on top of any wrappers
+    already there. Wrappers can be removed with `restore_methods` in any order, those left
+    being wrapped again around the original method, so features can be turned on and off
+    independently.
+
+    Returns:
+        what is needed to remove these wrappers with `restore_methods`
+    """
+    chains = fluidnc._method_chains
+    saved = dict()
+    for name in names:
+        chain = chains.get(name)
+        if chain is None:
+            # remember whether the instance already overrode the method (eg. with a mock)
+            chain = chains[name] = [getattr(fluidnc, name), name in fluidnc.__dict__, [], None]
+        layer = [wrapper]       # a new list each time, so the same wrapper can be added twice
+        chain[2].append(layer)
+        saved[name] = layer
+        rebuild_method(fluidnc, name)
+    return saved
+
+
+def restore_methods(fluidnc, saved: dict) -> None:
+    """
+    Remove the wrappers added by `wrap_methods`, leaving any others in place.
+    """
+    chains = fluidnc._method_chains
+    for name, layer in saved.items():
+        chain = chains.get(name)
+        if chain is None or not any(entry is layer for entry in chain[2]):
+            raise ValueError(f"{name} isn't wrapped by this layer")
+        chain[2] = [entry for entry in chain[2] if entry is not layer]
+        rebuild_method(fluidnc, name)
+
+
+def rebuild_method(fluidnc, name: str) -> None:
+    """
+    Wrap a method again with the wrappers left in its chain, or put the original back once
+    there are none.
+    """
+    chain = fluidnc._method_chains[name]
+    if chain[3] is not None and fluidnc.__dict__.get(name) is not chain[3]:
+        # the handler was replaced (or removed) on the instance since, keep what is there now
+        chain[0], chain[1] = getattr(fluidnc, name), name in fluidnc.__dict__
+    method, overridden, layers, _ = chain
+    if not layers:
+        del fluidnc._method_chains[name]
+        if overridden:
+            setattr(fluidnc, name, method)
+        else:
+            delattr(fluidnc, name)
+        return
+    for layer in layers:
+        method = layer[0](name, method)
+    chain[3] = method
+    setattr(fluidnc, name, method)
@@ -0,0 +1,299 @@
+from array import array
+
+from fluidpy.fluidnc import RealtimeCommand, ticks_ns, logging
+from fluidpy.chain import wrap_methods, restore_methods
+
+logger = logging.getLogger(__name__)
+
+MAX_PINS = 64
+
+# an input going low or high is reported as the UTF-8 encoding of PIN_LOW + n or PIN_HIGH + n
+PIN_LOW = 0x100
+PIN_HIGH = 0x140
+
+PIN_CODES = tuple(chr(code).encode() for code in range(PIN_LOW, PIN_HIGH + MAX_PINS))
+
+# words of a pin's mode, eg. `in,low,pu`
+PIN_MODES = ('in', 'out', 'low', 'high', 'pu', 'pd', 'pwm')
+
+
+def pin_number(io_name: str) -> int:
+    """
+    Number of an expander pin, eg. `3` for `io.3`.
+    """
+    prefix, _, number = io_name.strip().partition(".")
+    if prefix != "io" or not number.isdigit():
+        raise ValueError(f"not an expander pin: {io_name}")
+    return int(number)
+
+
+class ExpanderIO:
+    """
+    Pin table of an I/O expander, kept as bitmasks (bit `n` for `io.n`): which pins are
+    configured, inputs, outputs, active low, and the level of each. Attach with
+    `FluidNC.enable_expander`.
+
+    - `[INI:io.n=mode]` from the controller configures a pin, acknowledged with `PIN_ACK`,
+      or `PIN_NAK` if the pin or mode isn't supported
+    - `[MSG:SET: io.n=value]` sets an output, passed on to `write_output`
+    - inputs are sampled on every `poll`, from `read_inputs` or the levels given to
+      `sample`. A new level is only accepted once it has held for `debounce_ms`, so a
+      chattering contact isn't reported until it settles, and accepted changes are sent at
+      most every `batch_ms`, all in one write. A pin that changes and changes back within
+      a batch isn't reported at all.
+
+    Levels are logical: a pin configured `low` reads `True` when its signal is low.
+    """
+
+    def __init__(self, read_inputs=None, write_output=None, pins: int = 64,
+                 debounce_ms: float = 5.0, batch_ms: float = 10.0) -> None:
+        """
+        Parameters:
+            read_inputs: function returning the level of every pin as a bitmask, or `None`
+            write_output: function called with the pin number and level of a changed output
+            pins: number of pins, at most 64
+            debounce_ms: time an input must hold a new level before it is reported
+            batch_ms: shortest time between reports of input changes
+        """
+        if not 0 < pins <= MAX_PINS:
+            raise ValueError(f"at most {MAX_PINS} pins")
+        self.read_inputs = read_inputs
+        self.write_output = write_output
+        self.pins = pins
+        self.debounce_ns = int(debounce_ms * 1_000_000)
+        self.batch_ns = int(batch_ms * 1_000_000)
+
+        self.configured = 0
+        self.inputs = 0
+        self.outputs = 0
+        self.active_low = 0
+        self.pull_up = 0
+        self.pull_down = 0
+        self.pwm = 0
+        self.output_levels = 0
+        """level of each output, as last set by the controller"""
+        self.duty = dict()
+        """duty cycle of each PWM output"""
+        self.input_levels = 0
+        """debounced level of each input"""
+
+        self.transitions = 0
+        """raw input changes seen, including bounces"""
+        self.reports = 0
+        """writes of input changes to the controller"""
+        self.changes_reported = 0
+        """input changes reported"""
+
+        self._raw = 0
+        self._unsettled = 0
+        self._changed_ns = array('q', [0] * pins)
+        self._reported = 0
+        self._force = 0             # inputs whose level is reported even if unchanged
+        self._last_report_ns = None
+        self._fluidnc = None
+        self._wrapped = dict()
+
+    def reset(self) -> None:
+        """
+        Forget every pin, as the controller configures them again when it restarts.
+        """
+        self.configured = self.inputs = self.outputs = 0
+        self.active_low = self.pull_up = self.pull_down = self.pwm = 0
+        self.output_levels = self.input_levels = 0
+        self.duty.clear()
+        self._raw = self._unsettled = self._reported = self._force = 0
+
+    def configure(self, io_name: str, io_mode: str) -> bool:
+        """
+        Configure a pin from its `[INI:]` mode, eg. `in,low,pu`.
+
+        Returns:
+            `False` if the pin or mode isn't supported
+        """
+        try:
+            pin = pin_number(io_name)
+        except ValueError:
+            return False
+        words = [word.strip() for word in io_mode.split(",")]
+        if pin >= self.pins or any(word not in PIN_MODES for word in words):
+            return False
+        is_input = 'in' in words
+        if is_input == ('out' in words) or ('pu' in words and 'pd' in words):
+            return False
+
+        bit = 1 << pin
+        clear = ~bit
+        self.configured |= bit
+        self.inputs = (self.inputs & clear) | (bit if is_input else 0)
+        self.outputs = (self.outputs & clear) | (0 if is_input else bit)
+        self.active_low = (self.active_low & clear) | (bit if 'low' in words else 0)
+        self.pull_up = (self.pull_up & clear) | (bit if 'pu' in words else 0)
+        self.pull_down = (self.pull_down & clear) | (bit if 'pd' in words else 0)
+        self.pwm = (self.pwm & clear) | (bit if 'pwm' in words else 0)
+        self.output_levels &= clear
+        self.duty.pop(pin, None)
+        if is_input:
+            # the controller needs the current level of a new input
+            self._force |= bit
+        return True
+
+    def set_output(self, io_name: str, value: str) -> None:
+        """
+        Set an output to the value sent by the controller, `0`/`1` or a PWM duty cycle.
+        """
+        pin = pin_number(io_name)
+        bit = 1 << pin
+        if not self.outputs & bit:
+            logger.warning(f"set of {io_name}, which isn't an output")
+            return
+        duty = float(value)
+        level = duty != 0
+        self.output_levels = (self.output_levels | bit) if level else (self.output_levels & ~bit)
+        if self.pwm & bit:
+            self.duty[pin] = duty
+        if self.write_output is not None:
+            low = bool(self.active_low & bit)
+            if self.pwm & bit:
+                self.write_output(pin, 1.0 - duty if low else duty)
+            else:
+                self.write_output(pin, level != low)
+
+    def sample(self, levels: int, now: int | None = None) -> None:
+        """
+        Debounce a sample of the input pins' signal levels (bit `n` for `io.n`), and report
+        any changes to the controller once the batch interval has passed.
+        """
+        if now is None:
+            now = ticks_ns()
+        inputs = self.inputs
+        raw = (levels ^ self.active_low) & inputs
+        changed = raw ^ self._raw
+        if changed:
+            self._raw = raw
+            self._unsettled |= changed
+            mask = changed
+            pin = 0
+            while mask:
+                if mask & 1:
+                    self._changed_ns[pin] = now
+                    self.transitions += 1
+                mask >>= 1
+                pin += 1
+
+        if self._unsettled:
+            mask = self._unsettled
+            pin = 0
+            while mask:
+                if mask & 1 and now - self._changed_ns[pin] >= self.debounce_ns:
+                    self._unsettled &= ~(1 << pin)
+                mask >>= 1
+                pin += 1
+        settled = inputs & ~self._unsettled
+        self.input_levels = (self.input_levels & ~settled) | (raw & settled)
+
+        pending = ((self.input_levels ^ self._reported) | self._force) & inputs & settled
+        if pending and (self._last_report_ns is None or now - self._last_report_ns >= self.batch_ns):
+            self._report(pending, now)
+
+    def update(self, now: int | None = None) -> None:
+        """
+        Sample the inputs with `read_inputs`, if any inputs are configured. Called on every
+        `poll`.
+        """
+        if not self.inputs:
+            return
+        # without `read_inputs`, the latest levels given to `sample` are sampled again so
+        # that they settle and are reported
+        levels = self.read_inputs() if self.read_inputs is not None else self._raw ^ self.active_low
+        self.sample(levels, now)
+
+    def _report(self, pending: int, now: int) -> None:
+        levels = self.input_levels
+        data = b""
+        mask = pending
+        pin = 0
+        while mask:
+            if mask & 1:
+                data += PIN_CODES[(PIN_HIGH if levels >> pin & 1 else PIN_LOW) - PIN_LOW + pin]
+                self.changes_reported += 1
+            mask >>= 1
+            pin += 1
+        self._reported = (self._reported & ~pending) | (levels & pending)
+        self._force &= ~pending
+        self._last_report_ns = now
+        self.reports += 1
+        if self._fluidnc is not None:
+            self._fluidnc.send_realtime(data)
+
+    def attach(self, fluidnc) -> None:
+        expander = self
+        self._fluidnc = fluidnc
+        dispatched = "handle_exp_set" in fluidnc.require_handlers(["handle_exp_set"])
+
+        def handling(name, handler):
+            if name == 'handle_exp_id':
+                def handle_exp_id():
+                    # the controller restarted and will configure every pin again
+                    expander.reset()
+                    handler()
+                return handle_exp_id
+            elif name == 'handle_exp_io':
+                def handle_exp_io(io_name, io_mode):
+                    if expander.configure(io_name, io_mode):
+                        fluidnc.realtime(RealtimeCommand.PIN_ACK)
+                    else:
+                        logger.warning(f"unsupported pin: {io_name}={io_mode}")
+                        fluidnc.realtime(RealtimeCommand.PIN_NAK)
+                return handle_exp_io
+            elif name == 'handle_exp_set':
+                def handle_exp_set(io_name, value):
+                    expander.set_output(io_name, value)
+                    if dispatched:
+                        handler(io_name, value)
+                return handle_exp_set
+
+            def poll(*args, **kwargs):
+                result = handler(*args, **kwargs)
+                expander.update()
+                return result
+            return poll
+
+        self._wrapped = wrap_methods(fluidnc, ['handle_exp_id', 'handle_exp_io', 'handle_exp_set', 'poll'],
+                                     handling)
+
+    def detach(self, fluidnc) -> None:
+        restore_methods(fluidnc, self._wrapped)
+        self._wrapped = dict()
+        self._fluidnc = None
+        fluidnc.release_handlers(["handle_exp_set"])
+
+
+class SimulatedPins:
+    """
+    Pins for testing an `ExpanderIO` without hardware: set input levels (or make them
+    chatter) and see what was written to the outputs.
+
+    ```python
+    pins = SimulatedPins()
+    fnc.enable_expander(pins.read_inputs, pins.write_output)
+    pins.set_input(2, True)
+    ```
+    """
+
+    def __init__(self) -> None:
+        self.levels = 0
+        """signal level of each input, as a bitmask"""
+        self.outputs = dict()
+        """latest level written to each output pin"""
+        self.writes = []
+        """`(pin, level)` for every output write, in order"""
+
+    def set_input(self, pin: int, level: bool) -> None:
+        self.levels = (self.levels | (1 << pin)) if level else (self.levels & ~(1 << pin))
+
+    def read_inputs(self) -> int:
+        return self.levels
+
+    def write_output(self, pin: int, level) -> None:
+        self.outputs[pin] = level
+        self.writes.append((pin, level))
@@ -0,0 +1,218 @@
+import os
+import struct
+import sys
+from array import array
+
+from fluidpy.fluidnc import VALID_STATES, ticks_ns
+from fluidpy.history import AXES
+from fluidpy.chain import wrap_methods, restore_methods
+
+# size of the `.npy` header, rewritten in place with the row count as the file grows
+HEADER_BYTES = 128
+
+# code stored in the `state` column for states not in `VALID_STATES`
+UNKNOWN_STATE = 255
+
+# handlers wrapped by `ColumnExporter.attach`
+EXPORT_HANDLERS = ('handle_machine_state', 'handle_feed', 'handle_spindle', 'handle_line_number')
+
+_ENDIAN = '<' if sys.byteorder == 'little' else '>'
+
+# array typecode and `.npy` dtype of each kind of column
+_TYPES = {
+    'q': _ENDIAN + 'i8',
+    'd': _ENDIAN + 'f8',
+    'B': '|u1',
+}
+
+
+def state_code(state: str) -> int:
+    """
+    Code of a machine state in the `state` column: its index in `VALID_STATES`, ignoring
+    any sub-state (`Hold:0` is `Hold`).
+    """
+    name = state.split(":", 1)[0]
+    return VALID_STATES.index(name) if name in VALID_STATES else UNKNOWN_STATE
+
+
+def npy_header(descr: str, rows: int) -> bytes:
+    """
+    Header of a version 1.0 `.npy` file holding a one-dimensional array, padded to
+    `HEADER_BYTES`.
+    """
+    header = "{'descr': '%s', 'fortran_order': False, 'shape': (%d,), }" % (descr, rows)
+    header = header + " " * (HEADER_BYTES - 10 - 1 - len(header)) + "\n"
+    return b"\x93NUMPY\x01\x00" + struct.pack("<H", len(header)) + header.encode()
+
+
+class _Column:
+    # one `.npy` file, filled from an array of `chunk_rows` values
+
+    def __init__(self, path: str, typecode: str, chunk_rows: int) -> None:
+        self.descr = _TYPES[typecode]
+        self.values = array(typecode, [0] * chunk_rows)
+        self.rows = 0
+        self.file = open(path, "wb")
+        self.file.write(npy_header(self.descr, 0))
+
+    def write(self, count: int) -> None:
+        file = self.file
+        file.write(memoryview(self.values)[:count])
+        self.rows += count
+        file.seek(0)
+        file.write(npy_header(self.descr, self.rows))
+        file.seek(0, 2)
+        file.flush()
+
+    def close(self) -> None:
+        self.file.close()
+
+
+class ColumnExporter:
+    """
+    Writes status reports straight into typed columns, one `.npy` file each in `directory`:
+    `time` (ns, int64), `state` (uint8, see `state_code`), one per axis (`x`, `y`, ...,
+    float64), `feed` and `spindle` (float64) and `line` (int64, `-1` when the report has no
+    line number). Rows are collected in preallocated arrays and appended to the files every
+    `chunk_rows` reports, each file's header being updated to the new length, so the files
+    are always valid and never held in memory. Attach with `FluidNC.enable_export`.
+
+    NumPy isn't needed to write the files. To read them, memory-mapped without copying:
+
+    ```python
+    columns = fluidpy.export.load_columns("telemetry/2024-05-01")
+    moving = columns["x"][columns["state"] == fluidpy.export.state_code("Run")]
+    ```
+    """
+
+    def __init__(self, directory: str, axes: int = 3, chunk_rows: int = 4096) -> None:
+        """
+        Parameters:
+            directory: where to create the column files, replacing any already there
+            axes: number of axes exported, from `x`
+            chunk_rows: reports collected before being written
+        """
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.axes = axes
+        self.chunk_rows = chunk_rows
+        self.rows = 0
+        """number of rows exported, including those not yet written"""
+        names = [('time', 'q'), ('state', 'B')] + [(AXES[axis], 'd') for axis in range(axes)]
+        names += [('feed', 'd'), ('spindle', 'd'), ('line', 'q')]
+        self.columns = {name: _Column(os.path.join(directory, name + ".npy"), typecode, chunk_rows)
+                        for name, typecode in names}
+        self._time = self.columns['time'].values
+        self._state = self.columns['state'].values
+        self._positions = [self.columns[AXES[axis]].values for axis in range(axes)]
+        self._feed = self.columns['feed'].values
+        self._spindle = self.columns['spindle'].values
+        self._line = self.columns['line'].values
+        self._count = 0
+        self._report = [UNKNOWN_STATE, 0.0, 0.0, -1]   # state, feed, spindle, line of the current report
+        self._wrapped = dict()
+
+    def append(self, time_ns: int, state: int, position, feed: float, spindle: float, line: int = -1) -> None:
+        """
+        Add a row, writing the chunk once it is full.
+
+        Parameters:
+            time_ns: when the report was received
+            state: `state_code` of the machine state
+            position: `Position`, or a sequence of floats with a value per axis
+            feed: feed rate
+            spindle: spindle speed
+            line: line number, `-1` if none
+        """
+        i = self._count
+        self._time[i] = time_ns
+        self._state[i] = state
+        axis = 0
+        if isinstance(position, (list, tuple, array)):
+            while axis < self.axes:
+                self._positions[axis][i] = position[axis]
+                axis += 1
+        else:
+            while axis < self.axes:
+                self._positions[axis][i] = getattr(position, AXES[axis]).to_float()
+                axis += 1
+        self._feed[i] = feed
+        self._spindle[i] = spindle
+        self._line[i] = line
+        self.rows += 1
+        self._count = i + 1
+        if self._count == self.chunk_rows:
+            self.flush()
+
+    def flush(self) -> None:
+        """
+        Write the rows collected so far.
+        """
+        if self._count:
+            for column in self.columns.values():
+                column.write(self._count)
+            self._count = 0
+
+    def close(self) -> None:
+        self.flush()
+        for column in self.columns.values():
+            column.close()
+
+    def attach(self, fluidnc) -> None:
+        exporter = self
+        report = self._report
+        dispatched = fluidnc.require_handlers(EXPORT_HANDLERS)
+
+        def record(name, handler):
+            call = handler if name in dispatched else None
+            if name == 'handle_machine_state':
+                def handle(state):
+                    report[0] = state_code(state)
+                    if call:
+                        call(state)
+            elif name == 'handle_line_number':
+                def handle(line_number):
+                    report[3] = line_number
+                    if call:
+                        call(line_number)
+            else:
+                field = 1 if name == 'handle_feed' else 2
+
+                def handle(value):
+                    report[field] = value.to_float()
+                    if call:
+                        call(value)
+            return handle
+
+        def exporting(name, process):
+            def process_message(message):
+                report[3] = -1
+                kind = process(message)
+                if kind == "status":
+                    position = fluidnc.machine_position
+                    if position is not None:
+                        exporter.append(ticks_ns(), report[0], position, report[1], report[2], report[3])
+                return kind
+            return process_message
+
+        self._wrapped = wrap_methods(fluidnc, EXPORT_HANDLERS, record)
+        self._wrapped.update(wrap_methods(fluidnc, ["process_message"], exporting))
+
+    def detach(self, fluidnc) -> None:
+        restore_methods(fluidnc, self._wrapped)
+        self._wrapped = dict()
+        fluidnc.release_handlers(EXPORT_HANDLERS)
+
+
+def load_columns(directory: str, mmap: bool = True) -> dict:
+    """
+    Load the columns written by a `ColumnExporter` as NumPy arrays, memory-mapped
+    read-only (no copy is made) unless `mmap` is `False`. Needs NumPy.
+    """
+    import numpy as np
+
+    columns = dict()
+    for filename in sorted(os.listdir(directory)):
+        if filename.endswith(".npy"):
+            columns[filename[:-4]] = np.load(os.path.join(directory, filename), mmap_mode='r' if mmap else None)
+    return columns
@@ -1,5 +1,9 @@
-import asyncio
 import re
+try:
+    from time import monotonic_ns as ticks_ns
+except ImportError:
+    # micropython
+    from time import time_ns as ticks_ns
 try:
     # python 3.10+
     import logging
@@ -40,13 +44,51 @@ except ImportError:
             def getLogger(cls, name: str):  # noqa
                 return Logger(name)
         logging = Logging()
+try:
+    from threading import Lock
+except ImportError:
+    try:
+        # micropython
+        from _thread import allocate_lock as Lock
+    except ImportError:
+        # no threads, nothing to lock
+        Lock = None
 
 from fluidpy.udecimal import DecimalNumber as Decimal
 
 logger = logging.getLogger(__name__)
 
+
+def _debug_enabled() -> bool:
+    try:
+        return logger.isEnabledFor(logging.DEBUG)
+    except AttributeError:
+        return getattr(logger, "level", logging.WARNING) <= logging.DEBUG
+
 VALID_STATES = ('Idle', 'Run', 'Hold', 'Jog', 'Alarm', 'Door', 'Check', 'Home', 'Sleep')
 
+# status report fields and the handlers that consume them
+STATUS_FIELD_HANDLERS = {
+    'MPos': ('handle_position', 'handle_work_position'),
+    'WPos': ('handle_position', 'handle_work_position'),
+    'WCO': ('handle_position', 'handle_work_position'),
+    'F': ('handle_feed', 'handle_spindle'),
+    'FS': ('handle_feed', 'handle_spindle'),
+    'Pn': ('handle_triggers',),
+    'Err': ('handle_error',),
+    'Ov': ('handle_overrides',),
+    'Ln': ('handle_line_number',),
+    'Bf': ('handle_buffer_size',),
+    'A': ('handle_accessory_state',),
+}
+
+# handlers that do more than log, and are always called
+REQUIRED_HANDLERS = ('handle_exp_id', 'handle_exp_io')
+
+# kinds of message returned by `FluidNC.process_message`
+MESSAGE_KINDS = ('exp', 'status', 'version', 'msg', 'ini', 'gc', 'mode_command', 'variable',
+                 'help', 'tlo', 'prb', 'echo', 'error', 'ok', 'alarm', 'unknown')
+
 class BufferInterface:
 
     def read(self, n: int) -> bytes:
@@ -61,10 +103,43 @@ class BufferInterface:
         """Read a line from the buffer."""
         raise NotImplementedError
 
+class RealtimeCommand:
+    """
+    Single-byte realtime commands, acted upon by the controller as soon as they are
+    received (even in the middle of a line) instead of being queued with g-code.
+    """
+    STATUS_REPORT = 0x3F            # '?'
+    CYCLE_START = 0x7E              # '~'
+    FEED_HOLD = 0x21                # '!'
+    SOFT_RESET = 0x18               # ctrl-x
+    SAFETY_DOOR = 0x84
+    JOG_CANCEL = 0x85
+    FEED_OVR_RESET = 0x90
+    FEED_OVR_COARSE_PLUS = 0x91
+    FEED_OVR_COARSE_MINUS = 0x92
+    FEED_OVR_FINE_PLUS = 0x93
+    FEED_OVR_FINE_MINUS = 0x94
+    RAPID_OVR_RESET = 0x95
+    RAPID_OVR_MEDIUM = 0x96
+    RAPID_OVR_LOW = 0x97
+    SPINDLE_OVR_RESET = 0x99
+    SPINDLE_OVR_COARSE_PLUS = 0x9A
+    SPINDLE_OVR_COARSE_MINUS = 0x9B
+    SPINDLE_OVR_FINE_PLUS = 0x9C
+    SPINDLE_OVR_FINE_MINUS = 0x9D
+    SPINDLE_STOP = 0x9E
+    FLOOD_TOGGLE = 0xA0
+    MIST_TOGGLE = 0xA1
+    PIN_ACK = 0xB2
+    PIN_NAK = 0xB3
+
 class FluidParseError(Exception):
     pass
 
-class InvalidStateError(Exception):
+class InvalidStateError(FluidParseError):
+    pass
+
+class CommandCancelledError(Exception):
     pass
 
 class Position:
@@ -94,6 +169,14 @@ class Position:
     def __repr__(self) -> str:
         return f"Position(x={self.x}, y={self.y}, z={self.z}, a={self.a}, b={self.b}, c={self.c})"
 
+    def __add__(self, other: 'Position') -> 'Position':
+        return Position(self.x + other.x, self.y + other.y, self.z + other.z,
+                        self.a + other.a, self.b + other.b, self.c + other.c)
+
+    def __sub__(self, other: 'Position') -> 'Position':
+        return Position(self.x - other.x, self.y - other.y, self.z - other.z,
+                        self.a - other.a, self.b - other.b, self.c - other.c)
+
 class Mode:
     PLANES = ('XY', 'XZ', 'YZ')
     FEED_RATE_MODES = ('INVERSE', 'UNITS/MIN', 'UNITS/REV')
@@ -172,58 +255,1080 @@ class Mode:
         return cls(**params)
 
 
+class Response:
+    """
+    Response of the controller to a command sent with `FluidNC.send_command`.
+    """
+
+    __slots__ = ("command", "status", "lines")
+    def __init__(self, command: str, status: str, lines: list):
+        self.command: str = command
+        """command as it was sent"""
+        self.status: str = status
+        """`'ok'` or `'error:N'`"""
+        self.lines: list = lines
+        """output sent by the controller before the status, eg. `$x=val` lines"""
+
+    @property
+    def ok(self) -> bool:
+        """`True` if the command was answered with `ok`"""
+        return self.status.startswith("ok")
+
+    @property
+    def error(self) -> str | None:
+        """error code of an `error:N` response, `None` for `ok`"""
+        return None if self.ok else self.status.partition(":")[2]
+
+    def __repr__(self) -> str:
+        return f"Response(command={self.command}, status={self.status}, lines={len(self.lines)})"
+
+
+def wake_waiter(waiting) -> None:
+    """
+    Set the `asyncio.Event` of a coroutine waiting in `waiting`, a `(loop, event)` pair,
+    from the loop's thread or another one (eg. running `listen`).
+    """
+    if waiting is not None:
+        loop, ready = waiting
+        call_soon_threadsafe = getattr(loop, "call_soon_threadsafe", None)
+        if call_soon_threadsafe is None:
+            ready.set()
+        else:
+            call_soon_threadsafe(ready.set)
+
+
+class CommandFuture:
+    """
+    Pending response to a command sent with `FluidNC.send_command`. Await it in a coroutine
+    while `alisten` is running, or call `result` to read messages until it is answered.
+    """
+
+    PENDING = 0
+    DONE = 1
+    TIMED_OUT = 2
+    CANCELLED = 3
+
+    def __init__(self, fluidnc: 'FluidNC', command: str, timeout: float | None = None):
+        self.fluidnc = fluidnc
+        self.command = command
+        self.output = []
+        self.state = self.PENDING
+        self._response = None
+        self._deadline = None if timeout is None else ticks_ns() + int(timeout * 1_000_000_000)
+        self._waiting = None    # loop and `asyncio.Event` of the `wait` for the response
+
+    def set_response(self, status: str | None) -> None:
+        # called in order as the controller answers each line, even after a timeout
+        if self.state != self.PENDING:
+            return
+        if status is None:
+            self.state = self.CANCELLED
+        else:
+            self._response = Response(self.command, status, self.output)
+            self.state = self.DONE
+        wake_waiter(self._waiting)
+
+    def done(self) -> bool:
+        """`True` once the command has been answered, timed out or cancelled"""
+        if self.state == self.PENDING and self._deadline is not None and ticks_ns() > self._deadline:
+            self.state = self.TIMED_OUT
+        return self.state != self.PENDING
+
+    def result(self) -> Response:
+        """
+        Return the response, reading messages from the controller until it arrives. Do not
+        call from another thread while `listen` is running, use `done` to check instead.
+
+        Raises:
+            TimeoutError: the command was not answered in time
+            CommandCancelledError: the controller restarted before answering
+        """
+        while not self.done():
+            self.fluidnc.poll()
+        return self._get()
+
+    async def wait(self) -> Response:
+        """
+        Wait for the response while other tasks (eg. `alisten`) read from the controller.
+        """
+        import asyncio
+        if self.done():
+            return self._get()
+        ready = asyncio.Event()
+        self._waiting = (asyncio.get_event_loop(), ready)
+        try:
+            while not self.done():
+                if self._deadline is None:
+                    await ready.wait()
+                else:
+                    # woken by the response, or timed out by `done` once the deadline passes
+                    remaining = max(0, self._deadline - ticks_ns()) / 1_000_000_000
+                    try:
+                        await asyncio.wait_for(ready.wait(), remaining)
+                    except asyncio.TimeoutError:
+                        pass
+                ready.clear()
+        finally:
+            self._waiting = None
+        return self._get()
+
+    def __await__(self):
+        return self.wait().__await__()
+
+    def _get(self) -> Response:
+        if self.state == self.TIMED_OUT:
+            raise TimeoutError(f"no response to: {self.command}")
+        if self.state == self.CANCELLED:
+            raise CommandCancelledError(f"controller restarted before answering: {self.command}")
+        return self._response
+
+
+class _Pattern:
+    """
+    Regular expression compiled the first time it is matched rather than at import, after
+    which the compiled pattern replaces this placeholder on `FluidNC`. Plain methods rather
+    than a descriptor, which CircuitPython builds without `MICROPY_PY_DESCRIPTORS` ignore.
+    """
+
+    _compiled = dict()
+
+    def __init__(self, name: str, pattern: str):
+        self.name = name
+        self.pattern = pattern
+
+    def compile(self):
+        compiled = self._compiled.get(self.pattern)
+        if compiled is None:
+            compiled = self._compiled[self.pattern] = re.compile(self.pattern)
+        setattr(FluidNC, self.name, compiled)
+        return compiled
+
+    def match(self, string: str):
+        return self.compile().match(string)
+
+    def search(self, string: str):
+        return self.compile().search(string)
+
+
+# helpers for `FluidNC(reuse_objects=True)`, which scan a status report in place instead
+# of slicing and splitting it, so that steady-state parsing allocates next to nothing
+
+STATUS_FIELDS = tuple(STATUS_FIELD_HANDLERS)
+
+
+def _field_at(text: str, start: int, end: int) -> str | None:
+    # the `STATUS_FIELDS` entry spelled by text[start:end]
+    i = 0
+    while i < len(STATUS_FIELDS):
+        field = STATUS_FIELDS[i]
+        if len(field) == end - start and text.startswith(field, start):
+            return field
+        i += 1
+    return None
+
+
+# searched for in a status report to find a position field
+_POSITION_KEYS = {'MPos': '|MPos:', 'WPos': '|WPos:', 'WCO': '|WCO:'}
+
+
+def _field_text(report: str, kind: str) -> str | None:
+    # value of a position field in a status report
+    key = _POSITION_KEYS[kind]
+    start = report.find(key)
+    if start < 0:
+        return None
+    start += len(key)
+    end = report.find("|", start)
+    return report[start:end if end >= 0 else report.find(">", start)]
+
+
+def _scan_decimal(number: Decimal, text: str, start: int, end: int) -> None:
+    # parse text[start:end] into `number`, replacing its value
+    positive = True
+    value = 0
+    decimals = 0
+    point = False
+    i = start
+    if i < end and text[i] == "-":
+        positive = False
+        i += 1
+    if i == end:
+        raise FluidParseError(f"invalid number: {text[start:end]}")
+    while i < end:
+        char = text[i]
+        if char == ".":
+            point = True
+        elif "0" <= char <= "9":
+            value = value * 10 + ord(char) - 48
+            if point:
+                decimals += 1
+        else:
+            raise FluidParseError(f"invalid number: {text[start:end]}")
+        i += 1
+    number._number = value
+    number._num_decimals = decimals
+    number._is_positive = positive
+    number._reduce_to_scale()
+
+
+def _scan_decimals(numbers: tuple, text: str, start: int, end: int) -> int:
+    # parse comma separated text[start:end] into `numbers`, zeroing any left over
+    count = 0
+    while start < end and count < len(numbers):
+        comma = text.find(",", start, end)
+        if comma < 0:
+            comma = end
+        _scan_decimal(numbers[count], text, start, comma)
+        count += 1
+        start = comma + 1
+    i = count
+    while i < len(numbers):
+        numbers[i]._number = 0
+        numbers[i]._num_decimals = 0
+        numbers[i]._is_positive = True
+        i += 1
+    return count
+
+
+def _scan_int(text: str, start: int, end: int) -> int:
+    value = 0
+    i = start
+    if i == end:
+        raise FluidParseError(f"invalid number: {text[start:end]}")
+    while i < end:
+        char = text[i]
+        if not "0" <= char <= "9":
+            raise FluidParseError(f"invalid number: {text[start:end]}")
+        value = value * 10 + ord(char) - 48
+        i += 1
+    return value
+
+
 class FluidNC:
-    version_re = re.compile(r"\[FluidNC\s(v.+?)\s")
+    version_re = _Pattern("version_re", r"\[FluidNC\s(v.+?)\s")
 
     # pin initialization
     # eg. [EXP:ID] or [EXP:io.2=out]
-    exp_re = re.compile(r"\[EXP:(.+?)\]")
+    exp_re = _Pattern("exp_re", r"\[EXP:(.+?)\]")
 
-    # eg. [INI: io.1=in,low,pu]
-    ini_re = re.compile(r"\[INI:(.+?)\]")
+    # eg. [INI: io.1=in,low,pu], also sent as [MSG:INI: io.1=in,low,pu]
+    # outputs are set with [MSG:SET: io.1=1]
+    ini_re = _Pattern("ini_re", r"\[INI:(.+?)\]")
 
     # machine mode
     # eg. [GC:G0 G55 G17 G21 G90 G94 M5 M9 T0 F0 S0]
-    mode_re = re.compile(r"\[GC:(.+?)\]")
+    mode_re = _Pattern("mode_re", r"\[GC:(.+?)\]")
     # eg. [G54:]
-    mode_cmd_re = re.compile(r"\[G([0-9C]{1,2}):(.*)?\]")
+    mode_cmd_re = _Pattern("mode_cmd_re", r"\[G([0-9C]{1,2}):(.*)?\]")
     # >G54G20:ok
-    mode_change_re = re.compile(r">((G[0-9]{1,2})+)(\:([a-z]+))?")
+    mode_change_re = _Pattern("mode_change_re", r">((G[0-9]{1,2})+)(\:([a-z]+))?")
 
     # eg. machine status
     # <Jog|MPos:59.304,0.000,0.000|FS:300,0|Pn:PT>
-    status_re = re.compile(r"<(\w+)\|(.+?)>")
+    # <Hold:0|MPos:59.304,0.000,0.000|FS:0,0>
+    status_re = _Pattern("status_re", r"<([\w:]+)\|(.+?)>")
 
     # log messages
     # eg. [MSG:INFO: Z Axis driver test passed]
-    log_re = re.compile(r"\[MSG:(\w+:)?\s*?(\w.+)\]")
+    log_re = _Pattern("log_re", r"\[MSG:(\w+:)?\s*?(\w.+)\]")
 
     # variable value messages
     # eg. $x=val
-    var_re = re.compile(r"\$([a-zA-Z0-9\/]+?)=(.*)")
+    var_re = _Pattern("var_re", r"\$([a-zA-Z0-9\/]+?)=(.*)")
 
     # help and status messages
-    help_re = re.compile(r"\[HLP:(.*?)\]")
-    tlo_re = re.compile(r"\[TLO:(.*?)\]")
-    prb_re = re.compile(r"\[PRB:(.*?)\]")
-    ver_re = re.compile(r"\[VER:(.*?)\]")
-    echo_re = re.compile(r"\[echo:(.*?)\]")
-
-
-    def __init__(self, io: BufferInterface) -> None:
+    help_re = _Pattern("help_re", r"\[HLP:(.*?)\]")
+    tlo_re = _Pattern("tlo_re", r"\[TLO:(.*?)\]")
+    prb_re = _Pattern("prb_re", r"\[PRB:(.*?)\]")
+    ver_re = _Pattern("ver_re", r"\[VER:(.*?)\]")
+    echo_re = _Pattern("echo_re", r"\[echo:(.*?)\]")
+
+    # preallocated writes for the realtime lane, keyed by command byte
+    realtime_bytes = {
+        getattr(RealtimeCommand, name): bytes((getattr(RealtimeCommand, name),))
+        for name in dir(RealtimeCommand) if name.isupper()
+    }
+
+    # pre-encoded messages sent by the library, extended per instance with `register_message`
+    # and `register_line` so repeated sends don't encode (and allocate) every time
+    encoded_messages = {
+        "(EXP,fluidpy)": b"(EXP,fluidpy)",
+    }
+    encoded_lines = {
+        "$Report/Interval=200": b"$Report/Interval=200\n",
+    }
+
+    dispatch_all = False
+    """call every `handle_*` method, including the default (logging) ones"""
+
+    def __init__(self, io: BufferInterface, rx_buffer_size: int = 128, write_buffer_size: int = 0,
+                 reuse_objects: bool = False, report_interval: int = 200) -> None:
+        """
+        Parameters:
+            io: connection to the controller
+            rx_buffer_size: size of the controller's receive buffer
+            write_buffer_size: when non-zero, outgoing messages are collected and written
+                together once this many bytes are waiting or on the next `poll`, whichever
+                comes first. Realtime commands are always written immediately. The buffer is
+                locked, so lines can be sent from another thread while `listen` runs.
+            reuse_objects: parse status reports into `Position` and `Decimal` objects
+                owned by this instance, updated in place for every report rather than
+                created for each one. Handlers must copy any value they keep.
+            report_interval: interval (ms) between status reports, requested from the
+                controller when it starts, `0` for none
+        """
         self.io = io
 
-    def send_message(self, message: str) -> None:
+        self.write_buffer_size = write_buffer_size
+        self._write_buffer = bytearray() if write_buffer_size else None
+        # taken while adding to or writing out the buffer, so bytes are never sent twice
+        self._write_lock = Lock() if write_buffer_size and Lock is not None else None
+        self.encoded_messages = dict(self.encoded_messages)
+        self.encoded_lines = dict(self.encoded_lines)
+
+        self.writes_requested = 0
+        """number of messages handed to the connection for sending"""
+        self.writes_issued = 0
+        """number of writes made to `io`"""
+        self.bytes_sent = 0
+        """number of bytes written to `io`"""
+
+        self.rx_buffer_size = rx_buffer_size
+        """size of the controller's receive buffer, used for character counting"""
+        self._queued_lines = []     # (data, callback, output) waiting for room in the receive buffer
+        self._sent_lines = []       # (size, callback, output) waiting for an `ok` or `error`
+        self._sent_bytes = 0
+
+        self.realtime_latency_ns = 0
+        """time spent writing the most recent realtime command"""
+        self.realtime_latency_max_ns = 0
+        """worst-case time spent writing a realtime command"""
+
+        self._status_report = None      # latest status report
+        self._wco_report = None         # latest status report that included `WCO`
+        self._position_cache = dict()   # kind: (text, Position) of the last position parsed
+        self._derived = (None, None, None)  # (position, offset, result) of the last WPos/MPos derived
+
+        self.report_interval = report_interval
+        """interval (ms) between status reports, requested from the controller when it starts"""
+
+        self._stats = None
+        self._handler_timer = None
+        self._report_metrics = None
+        self._adaptive_reporting = None
+        self.machine_state = None
+        """`MachineState` kept up to date once `enable_machine_state` is called"""
+        self.history = None
+        """`MotionHistory` recorded once `enable_history` is called"""
+        self.expander = None
+        """`ExpanderIO` pin table once `enable_expander` is called"""
+        self.exporter = None
+        """`ColumnExporter` writing status reports once `enable_export` is called"""
+        self.settings = None
+        """`SettingsCache` of the controller's `$` settings once `enable_settings` is called"""
+        self._throttle = None
+        self._events = None
+        self._method_chains = dict()    # name: [method, overridden, wrappers, installed] of wrapped methods
+
+        self.reuse_objects = reuse_objects
+        if reuse_objects:
+            self._positions = {kind: Position(*(Decimal(0) for _ in range(6))) for kind in ('MPos', 'WPos', 'WCO')}
+            self._axes = {kind: (p.x, p.y, p.z, p.a, p.b, p.c) for kind, p in self._positions.items()}
+            self._feed_spindle = (Decimal(0), Decimal(0))
+            self._overrides = (Decimal(0), Decimal(0), Decimal(0))
+            self._strings = []      # state, trigger and accessory strings seen so far
+            self._scanned = dict()  # kind: report last scanned into `_positions[kind]`
+            self._derived_position = Position(*(Decimal(0) for _ in range(6)))
+            self._derived_reports = [None, None]    # status and `WCO` reports it was derived from
+
+        self._required_handlers = {name: 1 for name in REQUIRED_HANDLERS}     # name: features requiring it
+        self._dispatch = set()
+        self._planned_size = -1     # size of the instance `__dict__` when the plan was made
+        self._skip_fields = set()
+        self._parse_status_fields = True
+        self.update_dispatch_plan()
+
+    def send_message(self, message: str | bytes) -> None:
         """
-        Send a string message to the controller.
+        Send a message to the controller. Strings registered with `register_message` are
+        sent without being encoded again, `bytes`, `bytearray` and `memoryview` are
+        passed to the io as they are.
         """
-        self.io.write(message.encode())
+        if isinstance(message, str):
+            data = self.encoded_messages.get(message)
+            self._write(message.encode() if data is None else data)
+        else:
+            self._write(message)
 
     def send_bytes(self, command: bytes) -> None:
         """
         Send a bytes message to the controller.
         """
-        self.io.write(command)
+        self._write(command)
+
+    def register_message(self, message: str) -> bytes:
+        """
+        Encode a message once so that sending it with `send_message` doesn't allocate.
+
+        Returns:
+            the encoded message
+        """
+        data = self.encoded_messages[message] = message.encode()
+        return data
+
+    def register_line(self, line: str) -> bytes:
+        """
+        Encode a line, with its trailing newline, once so that sending it with `queue_line`
+        or `send_command` doesn't allocate.
+
+        Returns:
+            the encoded line
+        """
+        data = self.encoded_lines[line] = (line + "\n").encode()
+        return data
+
+    def _encode_line(self, line: str | bytes) -> bytes:
+        if isinstance(line, str):
+            data = self.encoded_lines.get(line)
+            return (line + "\n").encode() if data is None else data
+        if len(line) and line[-1] == 0x0A:
+            return line
+        return bytes(line) + b"\n"
+
+    def flush(self) -> None:
+        """
+        Write any messages collected in the write buffer.
+        """
+        if self._write_buffer:
+            if self._write_lock is None:
+                self._flush_buffer()
+            else:
+                with self._write_lock:
+                    self._flush_buffer()
+
+    def _flush_buffer(self) -> None:
+        # the buffer may have been written by another thread while waiting for the lock
+        data = self._write_buffer
+        if data:
+            # the io may hang on to what it was given, start a new buffer rather than clearing
+            self._write_buffer = bytearray()
+            self._io_write(data)
+
+    def _write(self, data: bytes) -> None:
+        self.writes_requested += 1
+        if self._write_buffer is None:
+            self._io_write(data)
+            return
+        lock = self._write_lock
+        if lock is None:
+            self._write_buffer += data
+            if len(self._write_buffer) >= self.write_buffer_size:
+                self._flush_buffer()
+            return
+        with lock:
+            self._write_buffer += data
+            if len(self._write_buffer) >= self.write_buffer_size:
+                self._flush_buffer()
+
+    def _io_write(self, data: bytes) -> None:
+        self.io.write(data)
+        self.writes_issued += 1
+        self.bytes_sent += len(data)
+
+    def queue_line(self, line: str | bytes, callback=None) -> None:
+        """
+        Queue a line (g-code or `$` command) to be sent to the controller. Lines are only
+        written once there is room for them in the controller's receive buffer, which is
+        freed as each `ok` or `error` response arrives (GRBL's character counting protocol).
+
+        Responses are matched to lines in the order they were sent, so lines sent with
+        `send_message` while others are still waiting for a response will throw the
+        matching off.
+
+        Parameters:
+            line: line to send, a newline is added unless it is bytes-like and already
+                ends with one (in which case it is sent without copying)
+            callback: called with the response (`'ok'` or `'error:N'`) to the line, or
+                `None` if the controller restarted before the line was answered
+        """
+        self._queued_lines.append((self._encode_line(line), callback, None))
+        self.send_queued()
+
+    def send_command(self, command: str | bytes, timeout: float | None = None) -> 'CommandFuture':
+        """
+        Queue a command and return a future for its response, along with any output the
+        controller sends before it (eg. the `$x=val` lines of a `$$` query). Any number of
+        commands can be waiting for a response at once.
+
+        Parameters:
+            command: command to send, a newline is added as for `queue_line`
+            timeout: seconds to wait for the response, `None` to wait forever
+
+        Returns:
+            `CommandFuture` resolving to a `Response`
+        """
+        future = CommandFuture(self, command, timeout)
+        self._queued_lines.append((self._encode_line(command), future.set_response, future.output))
+        self.send_queued()
+        return future
+
+    def send_queued(self) -> int:
+        """
+        Send as many queued lines as fit in the controller's receive buffer.
+
+        Returns:
+            number of lines sent
+        """
+        sent = 0
+        while self._queued_lines:
+            data, callback, output = self._queued_lines[0]
+            size = len(data)
+            # a line longer than the buffer goes out on its own once everything else is done
+            if self._sent_lines and self._sent_bytes + size > self.rx_buffer_size:
+                break
+            self._queued_lines.pop(0)
+            self._write(data)
+            self._sent_lines.append((size, callback, output))
+            self._sent_bytes += size
+            sent += 1
+        return sent
+
+    @property
+    def lines_queued(self) -> int:
+        """number of lines waiting for room in the controller's receive buffer"""
+        return len(self._queued_lines)
+
+    @property
+    def lines_in_flight(self) -> int:
+        """number of lines sent and waiting for a response"""
+        return len(self._sent_lines)
+
+    @property
+    def bytes_in_flight(self) -> int:
+        """number of bytes sent and waiting for a response"""
+        return self._sent_bytes
+
+    def _complete_line(self, response: str) -> None:
+        if not self._sent_lines:
+            return
+        size, callback, _ = self._sent_lines.pop(0)
+        self._sent_bytes -= size
+        if callback is not None:
+            callback(response)
+        self.send_queued()
+
+    def _reset_lines(self) -> None:
+        # the controller discards its receive buffer when it restarts, drop everything pending
+        pending = self._sent_lines + self._queued_lines
+        self._sent_lines = []
+        self._queued_lines = []
+        self._sent_bytes = 0
+        for _, callback, _ in pending:
+            if callback is not None:
+                callback(None)
+
+    def realtime(self, command: int) -> None:
+        """
+        Send a single-byte realtime command to the controller. The byte is written straight
+        to the io, ahead of anything queued or buffered for sending, and the time taken to
+        write it is recorded in `realtime_latency_ns` and `realtime_latency_max_ns`.
+
+        Parameters:
+            command: one of the `RealtimeCommand` values
+        """
+        data = self.realtime_bytes.get(command)
+        if data is None:
+            raise ValueError(f"not a realtime command: {command}")
+        start = ticks_ns()
+        self._io_write(data)
+        latency = ticks_ns() - start
+        self.realtime_latency_ns = latency
+        if latency > self.realtime_latency_max_ns:
+            self.realtime_latency_max_ns = latency
+
+    def send_realtime(self, data: bytes) -> None:
+        """
+        Write bytes that are acted upon as they arrive (eg. expander pin changes) straight
+        to the io, ahead of anything queued or buffered for sending.
+        """
+        self._io_write(data)
+
+    def query_status(self) -> None:
+        """
+        Request a status report (`?`).
+        """
+        self.realtime(RealtimeCommand.STATUS_REPORT)
+
+    def feed_hold(self) -> None:
+        """
+        Pause motion with a controlled deceleration (`!`).
+        """
+        self.realtime(RealtimeCommand.FEED_HOLD)
+
+    def cycle_start(self) -> None:
+        """
+        Resume from a feed hold or start a queued cycle (`~`).
+        """
+        self.realtime(RealtimeCommand.CYCLE_START)
+
+    def soft_reset(self) -> None:
+        """
+        Halt the machine and reset the controller (ctrl-x).
+        """
+        self.realtime(RealtimeCommand.SOFT_RESET)
+
+    def safety_door(self) -> None:
+        """
+        Trigger the safety door state.
+        """
+        self.realtime(RealtimeCommand.SAFETY_DOOR)
+
+    def jog_cancel(self) -> None:
+        """
+        Cancel the current jog and flush any queued jog motions.
+        """
+        self.realtime(RealtimeCommand.JOG_CANCEL)
+
+    def update_dispatch_plan(self) -> None:
+        """
+        Work out which `handle_*` methods are overridden, by a subclass or on the instance,
+        so that `process_message` only parses what some handler will receive. The default
+        handlers only log, so they are skipped unless the `fluidpy.fluidnc` logger is at
+        `DEBUG` or `dispatch_all` is set.
+
+        Called from `__init__`, and again before the next message once attributes are added
+        to or removed from the instance, eg. a handler set with `fnc.handle_position = ...`.
+        Call it after changing `dispatch_all` or the log level.
+        """
+        dispatch_all = self.dispatch_all or _debug_enabled()
+        chains = self._method_chains
+        self._dispatch = {
+            name for name in dir(self)
+            if name.startswith("handle_") and (
+                dispatch_all or name in self._required_handlers
+                # wrappers installed by `enable_*` don't count, only what they wrap
+                or (chains[name][1] if name in chains else name in self.__dict__)
+                or getattr(type(self), name) is not getattr(FluidNC, name, None)
+            )
+        }
+        self._skip_fields = {
+            field for field, handlers in STATUS_FIELD_HANDLERS.items()
+            if not any(handler in self._dispatch for handler in handlers)
+        }
+        self._parse_status_fields = len(self._skip_fields) < len(STATUS_FIELD_HANDLERS)
+        self._planned_size = len(self.__dict__)
+
+    def require_handlers(self, names) -> set:
+        """
+        Have `process_message` call `names` whatever the dispatch plan, for a feature that
+        wraps them. Every call is undone by one call to `release_handlers`, a handler staying
+        required as long as any feature still requires it.
+
+        Returns:
+            those of `names` that were dispatched before, whose original handlers the
+            feature's wrappers should still call
+        """
+        dispatch = self._current_dispatch()
+        dispatched = {name for name in names if name in dispatch}
+        required = self._required_handlers
+        for name in names:
+            required[name] = required.get(name, 0) + 1
+        self.update_dispatch_plan()
+        return dispatched
+
+    def release_handlers(self, names) -> None:
+        """
+        Undo a call to `require_handlers`.
+        """
+        required = self._required_handlers
+        for name in names:
+            count = required.get(name, 0) - 1
+            if count > 0:
+                required[name] = count
+            else:
+                required.pop(name, None)
+        self.update_dispatch_plan()
+
+    def _current_dispatch(self) -> set:
+        # the dispatch plan, made again if handlers were set on the instance since
+        if len(self.__dict__) != self._planned_size:
+            self.update_dispatch_plan()
+        return self._dispatch
+
+    def set_report_interval(self, interval: int) -> None:
+        """
+        Ask the controller for a status report every `interval` ms (`0` for none), now and
+        whenever it restarts.
+        """
+        self.report_interval = interval
+        self.queue_line(f"$Report/Interval={interval}")
+
+    def enable_adaptive_reporting(self, idle_ms: int | None = None, active_ms: int | None = None,
+                                  max_ms: int = 2000, budget_fraction: float = 0.25,
+                                  max_waiting: int = 256, recover_after: int = 20) -> None:
+        """
+        Change the status report interval with what the machine is doing and how well the
+        listener is keeping up: `active_ms` while running or jogging, `idle_ms` otherwise,
+        doubling (up to `max_ms`) whenever a report takes longer than `budget_fraction`
+        of the interval to process or more than `max_waiting` bytes are waiting to be
+        read, and halving again once `recover_after` reports in a row would have been
+        within budget at the faster rate.
+
+        Parameters:
+            idle_ms: interval while the machine isn't moving, `None` for `report_interval`
+            active_ms: interval during `Run` and `Jog`, `None` for `idle_ms`
+            max_ms: longest interval to back off to
+            budget_fraction: fraction of the interval a report may take to process
+            max_waiting: bytes waiting to be read before the listener counts as behind
+            recover_after: reports processed within budget before returning to a faster rate
+        """
+        if self._adaptive_reporting is None:
+            from fluidpy.reporting import AdaptiveReportInterval
+            self._adaptive_reporting = AdaptiveReportInterval(
+                self.report_interval if idle_ms is None else idle_ms, active_ms, max_ms,
+                budget_fraction, max_waiting, recover_after)
+            self._adaptive_reporting.attach(self)
+
+    def disable_adaptive_reporting(self) -> None:
+        """
+        Stop adapting the report interval, going back to the interval used when idle.
+        """
+        if self._adaptive_reporting is not None:
+            self._adaptive_reporting.detach(self)
+            if self.report_interval != self._adaptive_reporting.idle_ms:
+                self.set_report_interval(self._adaptive_reporting.idle_ms)
+            self._adaptive_reporting = None
+
+    def enable_machine_state(self) -> 'MachineState':
+        """
+        Keep `machine_state` up to date with every message processed: state, positions,
+        feed and spindle, overrides, pins, accessories, line number, buffers, modal state
+        and alarm. Other threads can read `machine_state.snapshot()` without locking.
+        Enable after any handlers have been replaced on the instance.
+
+        Returns:
+            the `MachineState`
+        """
+        if self.machine_state is None:
+            from fluidpy.state import MachineState
+            self.machine_state = MachineState()
+            self.machine_state.attach(self)
+        return self.machine_state
+
+    def disable_machine_state(self) -> None:
+        """
+        Stop updating `machine_state`, removing all of its overhead.
+        """
+        if self.machine_state is not None:
+            self.machine_state.detach(self)
+            self.machine_state = None
+
+    def enable_history(self, capacity: int = 256, axes: int = 3) -> 'MotionHistory':
+        """
+        Record the time, machine position, feed and spindle of the latest `capacity` status
+        reports in `history`, for velocity estimates, stall detection or plots.
+
+        Parameters:
+            capacity: number of reports kept
+            axes: number of axes recorded, from `x`
+
+        Returns:
+            the `MotionHistory`
+        """
+        if self.history is None:
+            from fluidpy.history import MotionHistory
+            self.history = MotionHistory(capacity, axes)
+            self.history.attach(self)
+        return self.history
+
+    def disable_history(self) -> None:
+        """
+        Stop recording `history`, removing all of its overhead.
+        """
+        if self.history is not None:
+            self.history.detach(self)
+            self.history = None
+
+    def enable_expander(self, read_inputs=None, write_output=None, pins: int = 64,
+                        debounce_ms: float = 5.0, batch_ms: float = 10.0) -> 'ExpanderIO':
+        """
+        Act as an I/O expander: pins initialized by the controller are checked and
+        acknowledged, outputs it sets are driven with `write_output`, and input changes read
+        with `read_inputs` are debounced and reported back in batches on every `poll`.
+
+        Parameters:
+            read_inputs: function returning the level of every pin as a bitmask (bit `n`
+                for `io.n`), `None` to feed levels in with `ExpanderIO.sample`
+            write_output: function called with the pin number and level (`True`/`False`,
+                or a duty cycle for PWM outputs) whenever an output changes
+            pins: number of pins, at most 64
+            debounce_ms: time an input must hold a new level before it is reported
+            batch_ms: shortest time between reports of input changes
+
+        Returns:
+            the `ExpanderIO`
+        """
+        if self.expander is None:
+            from fluidpy.expander import ExpanderIO
+            self.expander = ExpanderIO(read_inputs, write_output, pins, debounce_ms, batch_ms)
+            self.expander.attach(self)
+        return self.expander
+
+    def disable_expander(self) -> None:
+        """
+        Stop acting as an I/O expander, going back to acknowledging every pin.
+        """
+        if self.expander is not None:
+            self.expander.detach(self)
+            self.expander = None
+
+    def enable_export(self, directory: str, axes: int = 3, chunk_rows: int = 4096) -> 'ColumnExporter':
+        """
+        Write the time, state, machine position, feed, spindle and line number of every
+        status report to typed columns, one `.npy` file each in `directory`, for loading with
+        `numpy.load(mmap_mode='r')`.
+
+        Parameters:
+            directory: where to create the column files
+            axes: number of axes exported, from `x`
+            chunk_rows: reports collected before being written
+
+        Returns:
+            the `ColumnExporter`
+        """
+        if self.exporter is None:
+            from fluidpy.export import ColumnExporter
+            self.exporter = ColumnExporter(directory, axes, chunk_rows)
+            self.exporter.attach(self)
+        return self.exporter
+
+    def disable_export(self) -> None:
+        """
+        Stop exporting, writing any rows collected and closing the files.
+        """
+        if self.exporter is not None:
+            self.exporter.detach(self)
+            self.exporter.close()
+            self.exporter = None
+
+    def enable_settings(self) -> 'SettingsCache':
+        """
+        Keep every `$x=val` line from the controller in a `SettingsCache`, so settings can be
+        read without a round trip once loaded with `SettingsCache.load`.
+
+        Returns:
+            the `SettingsCache`
+        """
+        if self.settings is None:
+            from fluidpy.settings import SettingsCache
+            self.settings = SettingsCache()
+            self.settings.attach(self)
+        return self.settings
+
+    def disable_settings(self) -> None:
+        """
+        Stop caching settings, dropping the cache.
+        """
+        if self.settings is not None:
+            self.settings.detach(self)
+            self.settings = None
+
+    def enable_throttle(self, target: str, max_hz: float) -> None:
+        """
+        Call a handler at most `max_hz` times a second, delivering only the latest value
+        when reports arrive faster, eg. to redraw a display at the rate it can manage.
+        Messages are still parsed at full rate. Changes of machine state, pins and
+        accessories are always delivered at once, as are alarms and errors. Enable after
+        any handlers have been replaced on the instance.
+
+        Parameters:
+            target: a handler (eg. `'handle_position'`) or a kind of message, throttling
+                each of its handlers (eg. `'status'`, see `fluidpy.throttle.KIND_HANDLERS`)
+            max_hz: most calls per second
+        """
+        from fluidpy.throttle import Throttle, throttle_targets
+        names = throttle_targets(target)
+        if self._throttle is None:
+            self._throttle = Throttle()
+        self._throttle.add(self, names, max_hz)
+
+    def disable_throttle(self, target: str | None = None) -> None:
+        """
+        Stop throttling `target` (everything if `None`), delivering any values held back.
+        """
+        if self._throttle is not None:
+            from fluidpy.throttle import throttle_targets
+            self._throttle.remove(self, None if target is None else throttle_targets(target))
+            if not self._throttle.periods:
+                self._throttle = None
+
+    def subscribe(self, events=None, maxsize: int = 64) -> 'Subscription':
+        """
+        Queue an `Event` for every call to the handlers of `events`, for a consumer reading
+        them in its own thread. Each subscriber has its own queue: one that falls behind only
+        drops its own oldest events, and messages are parsed once for all of them. Subscribe
+        after any handlers have been replaced on the instance.
+
+        ```python
+        positions = fnc.subscribe(['position', 'machine_state'], maxsize=16)
+        threading.Thread(target=fnc.listen, daemon=True).start()
+        while event := positions.get():
+            print(event.name, *event.args)
+        ```
+
+        Parameters:
+            events: event names (a handler without `handle_`, eg. `'alarm'`), kinds of
+                message (eg. `'status'`), or `None` for every handler
+            maxsize: events queued before the oldest are dropped
+
+        Returns:
+            the `Subscription`
+        """
+        from fluidpy.pubsub import Subscription, event_handlers
+        return self._subscribe(Subscription(event_handlers(self, events), maxsize))
+
+    def subscribe_async(self, events=None, maxsize: int = 64) -> 'AsyncSubscription':
+        """
+        `subscribe` for a task running alongside `alisten`: the `AsyncSubscription` is
+        awaited with `get` or read with `async for`.
+        """
+        from fluidpy.pubsub import AsyncSubscription, event_handlers
+        return self._subscribe(AsyncSubscription(event_handlers(self, events), maxsize))
+
+    def _subscribe(self, subscription):
+        if self._events is None:
+            from fluidpy.pubsub import EventBus
+            self._events = EventBus()
+        self._events.add(self, subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: 'Subscription') -> None:
+        """
+        Stop queueing events for `subscription`.
+        """
+        if self._events is not None and subscription in self._events.subscriptions:
+            self._events.remove(self, subscription)
+            if not self._events.subscriptions:
+                self._events = None
+
+    def enable_stats(self) -> None:
+        """
+        Start counting messages per kind and timing how long they take to parse and to
+        dispatch to the `handle_*` methods. Enable after any handlers have been replaced
+        on the instance.
+        """
+        if self._stats is None:
+            from fluidpy.stats import MessageStats
+            self._stats = MessageStats()
+            self._stats.attach(self)
+
+    def disable_stats(self) -> None:
+        """
+        Stop collecting statistics, removing all of their overhead.
+        """
+        if self._stats is not None:
+            self._stats.detach(self)
+            self._stats = None
+
+    def reset_stats(self) -> None:
+        """
+        Clear the statistics collected so far.
+        """
+        if self._stats is not None:
+            self._stats.reset()
+        if self._handler_timer is not None:
+            self._handler_timer.reset()
+        if self._report_metrics is not None:
+            self._report_metrics.reset()
+        self.writes_requested = self.writes_issued = self.bytes_sent = 0
+        self.realtime_latency_max_ns = 0
+
+    def stats(self) -> dict | None:
+        """
+        Snapshot of the statistics collected since they were enabled or last reset.
+
+        Returns:
+            `None` if statistics are disabled, otherwise a dict with the overall message
+            count, per-kind counts, rates (messages/sec) and parse and dispatch latency
+            histograms, and the outgoing write counters
+        """
+        if self._stats is None:
+            return None
+        snapshot = self._stats.snapshot()
+        snapshot["writes"] = {
+            "requested": self.writes_requested,
+            "issued": self.writes_issued,
+            "bytes": self.bytes_sent,
+            "realtime_latency_max_ns": self.realtime_latency_max_ns,
+        }
+        return snapshot
+
+    def enable_handler_timing(self, budget_ms: float | None = None, budget_fraction: float = 0.25) -> None:
+        """
+        Time every call to a `handle_*` method, keeping per-handler totals and maxima, and
+        log a warning when a handler takes longer than its budget. A slow handler holds up
+        reading from the controller, which shows up as dropped data on a serial link.
+
+        Parameters:
+            budget_ms: longest a handler may take, `None` for a fraction of `report_interval`
+                (50 ms while status reports are off)
+            budget_fraction: fraction of `report_interval` used when `budget_ms` is `None`
+        """
+        if self._handler_timer is None:
+            from fluidpy.stats import HandlerTimer
+            self._handler_timer = HandlerTimer(budget_ms, budget_fraction)
+            self._handler_timer.attach(self)
+
+    def disable_handler_timing(self) -> None:
+        """
+        Stop timing handlers, removing all of the overhead.
+        """
+        if self._handler_timer is not None:
+            self._handler_timer.detach(self)
+            self._handler_timer = None
+
+    def handler_timings(self) -> dict | None:
+        """
+        Returns:
+            `None` if handler timing is disabled, otherwise the number of calls, total, mean
+            and maximum time (ms) and number of calls over budget for each handler called
+        """
+        if self._handler_timer is None:
+            return None
+        return self._handler_timer.snapshot()
+
+    def enable_report_metrics(self) -> None:
+        """
+        Timestamp every status report as it is read and keep running statistics of the
+        time between reports, against `report_interval`, and of the time from a report
+        being read to its handlers finishing. Shows whether a display of the reported
+        position can be trusted to be current.
+        """
+        if self._report_metrics is None:
+            from fluidpy.stats import ReportMetrics
+            self._report_metrics = ReportMetrics()
+            self._report_metrics.attach(self)
+
+    def disable_report_metrics(self) -> None:
+        """
+        Stop timing status reports, removing all of the overhead.
+        """
+        if self._report_metrics is not None:
+            self._report_metrics.detach(self)
+            self._report_metrics = None
+
+    def report_metrics(self) -> dict | None:
+        """
+        Returns:
+            `None` if report metrics are disabled, otherwise the number of reports, the age
+            (ms) of the latest one, the mean, min, max and standard deviation of the interval
+            between reports, a running jitter estimate and the largest deviation from
+            `report_interval`, the number of late reports (more than 1.5 intervals apart)
+            and a histogram of the time from reading a report to its handlers finishing
+        """
+        if self._report_metrics is None:
+            return None
+        return self._report_metrics.snapshot(self.report_interval)
 
     def read_message(self) -> str | None:
         msg = self.io.readline()
@@ -253,10 +1358,100 @@ class FluidNC:
     @staticmethod
     def parse_position(axes_message:str):
         kind, axes = axes_message.split(":")
-        if kind in ('MPos', 'WCO'):
+        if kind in ('MPos', 'WPos', 'WCO'):
             return kind, Position(*map(Decimal, axes.split(",")))
         return None
 
+    def _position(self, kind: str, text: str) -> Position:
+        # parsed `text` of a position field, reused while the controller reports the same value
+        cached = self._position_cache.get(kind)
+        if cached is not None and cached[0] == text:
+            return cached[1]
+        position = Position(*map(Decimal, text.split(",")))
+        self._position_cache[kind] = (text, position)
+        return position
+
+    def _reported_position(self, kind: str) -> Position | None:
+        report = self._wco_report if kind == 'WCO' else self._status_report
+        if report is None:
+            return None
+        if self.reuse_objects:
+            return self._scanned_position(kind, report)
+        text = _field_text(report, kind)
+        return None if text is None else self._position(kind, text)
+
+    def _scanned_position(self, kind: str, report: str) -> Position | None:
+        # with `reuse_objects`, the position field of `report` scanned into `_positions[kind]`
+        if self._scanned.get(kind) is not report:
+            key = _POSITION_KEYS[kind]
+            start = report.find(key)
+            if start < 0:
+                return None
+            start += len(key)
+            end = report.find("|", start)
+            _scan_decimals(self._axes[kind], report, start, end if end >= 0 else report.find(">", start))
+            self._scanned[kind] = report
+        return self._positions[kind]
+
+    def _derive(self, position: Position | None, offset: Position | None, subtract: bool) -> Position | None:
+        # position -/+ offset, worked out again only when either has changed
+        if position is None or offset is None:
+            return None
+        if self.reuse_objects:
+            return self._derive_in_place(position, offset, subtract)
+        last_position, last_offset, result = self._derived
+        if position is not last_position or offset is not last_offset:
+            result = position - offset if subtract else position + offset
+            self._derived = (position, offset, result)
+        return result
+
+    def _derive_in_place(self, position: Position, offset: Position, subtract: bool) -> Position:
+        # same as `_derive` into `_derived_position`, worked out again for each new report
+        result = self._derived_position
+        reports = self._derived_reports
+        if reports[0] is not self._status_report or reports[1] is not self._wco_report:
+            for axis in Position.__slots__:
+                value = getattr(result, axis)
+                value.copy_from(getattr(position, axis))
+                if subtract:
+                    value -= getattr(offset, axis)
+                else:
+                    value += getattr(offset, axis)
+            reports[0] = self._status_report
+            reports[1] = self._wco_report
+        return result
+
+    @property
+    def work_offset(self) -> Position | None:
+        """
+        Work coordinate offset from the latest status report that included one (the
+        controller only sends it every few reports), `None` until one has been received.
+        """
+        return self._reported_position('WCO')
+
+    @property
+    def machine_position(self) -> Position | None:
+        """
+        Machine position from the latest status report, worked out from the work position
+        and offset when the controller reports `WPos`.
+        """
+        position = self._reported_position('MPos')
+        if position is None:
+            return self._derive(self._reported_position('WPos'), self.work_offset, False)
+        return position
+
+    @property
+    def work_position(self) -> Position | None:
+        """
+        Work position from the latest status report, worked out from the machine position
+        and offset when the controller reports `MPos`. It is only computed again when one
+        of them changes.
+        """
+        position = self._reported_position('WPos')
+        if position is None:
+            return self._derive(self._reported_position('MPos'), self.work_offset, True)
+        return position
+
     # ------------------------------------------
 
     def handle_exp_id(self) -> None:
@@ -277,7 +1472,17 @@ class FluidNC:
         Returns:
             None
         """
-        self.send_bytes(bytes([0xB2,]))  # default response is ACK
+        self.realtime(RealtimeCommand.PIN_ACK)  # default response is ACK
+
+    def handle_exp_set(self, io_name: str, value: str) -> None:
+        """
+        Handle the controller setting an expander output pin, eg. `[MSG:SET: io.1=1]`.
+
+        Parameters:
+            io_name: `io.1`, `io.2`, etc
+            value: `0` or `1`, or a duty cycle between `0` and `1` for PWM outputs
+        """
+        logger.debug(f"exp set >> {io_name}={value}")
 
     def handle_machine_state(self, state: str) -> None:
         """
@@ -289,11 +1494,22 @@ class FluidNC:
     def handle_position(self, kind: str, position: Position) -> None:
         """
         Parameters:
-            kind: `MPos` (machine position) or `WCO` (work coordinate offset)
+            kind: `MPos` (machine position), `WPos` (work position) or `WCO` (work
+                coordinate offset), as reported by the controller
             position: `Position` object with `x`, `y`, `z`, `a`, `b`, `c` attributes
         """
         logger.debug(f"{kind} >> {position}")
 
+    def handle_work_position(self, position: Position) -> None:
+        """
+        Called after each status report once the work position is known, whether the
+        controller reports `MPos` (it is then `MPos - WCO`) or `WPos`.
+
+        Parameters:
+            position: `Position` object with `x`, `y`, `z`, `a`, `b`, `c` attributes
+        """
+        logger.debug(f"WPos >> {position}")
+
     def handle_mode(self, mode: Mode) -> None:
         """
         Parameters:
@@ -412,12 +1628,13 @@ class FluidNC:
         """
         logger.debug(f"Ok >> {ok}")
 
-    def handle_buffer_size(self, size: int):
+    def handle_buffer_size(self, blocks: int, rx_bytes: int | None = None):
         """
         Parameters:
-            size: current buffer size
+            blocks: free blocks in the planner buffer
+            rx_bytes: free bytes in the receive buffer, if reported
         """
-        logger.debug(f"Buffer size >> {size}")
+        logger.debug(f"Buffer size >> blocks: {blocks}, rx bytes: {rx_bytes}")
 
     def handle_accessory_state(self, state: str):
         """
@@ -442,49 +1659,74 @@ class FluidNC:
 
     # ------------------------------------------
 
+    def poll(self, catch_exc: bool = True) -> bool:
+        """
+        Read and process a single message from the controller, first writing anything
+        waiting in the write buffer.
+
+        Returns:
+            `True` if a message was read, `False` if nothing was waiting
+        """
+        if self._write_buffer:
+            self.flush()
+        data = None
+        try:
+            data = self.read_message()
+        except UnicodeError as e:
+            logger.warning(f"Unicode error: {e}")
+        if not data:
+            return False
+        try:
+            self.process_message(data)
+        except FluidParseError as e:
+            if not catch_exc:
+                logger.error(f"Fluid parse error: {e}")
+                raise e
+            logger.warning(f"Fluid parse error: {e}")
+        return True
+
     def listen(self, catch_exc: bool = True):
         print("Listening...")
 
         while True:
-            data = None
-            try:
-                data = self.read_message()
-            except UnicodeError as e:
-                logger.warning(f"Unicode error: {e}")
-            if not data:
-                continue
-            try:
-                self.process_message(data)
-            except FluidParseError as e:
-                if not catch_exc:
-                    logger.error(f"Fluid parse error: {e}")
-                    raise e
-                logger.warning(f"Fluid parse error: {e}")
+            self.poll(catch_exc)
 
     async def alisten(self, catch_exc: bool = True):
+        import asyncio
         print("Listening...")
         while True:
-            data = None
             # TODO : create an async read message
-            try:
-                data = self.read_message()
-            except UnicodeError as e:
-                logger.warning(f"Unicode error: {e}")
-
-            if not data:
+            if not self.poll(catch_exc):
                 await asyncio.sleep(0)
-                continue
-            try:
-                self.process_message(data)
-            except FluidParseError as e:
-                if not catch_exc:
-                    logger.error(f"Fluid parse error: {e}")
-                    raise e
-                logger.warning(f"Fluid parse error: {e}")
-
-    def process_message(self, message: str) -> None:
-
-        if match := self.exp_re.match(message):
+
+    def process_message(self, message: str) -> str:
+        """
+        Parse a message from the controller and call the matching `handle_*` methods.
+
+        Returns:
+            kind of message, one of `MESSAGE_KINDS`
+        """
+
+        # collect the output of a command sent with `send_command`
+        if self._sent_lines and (output := self._sent_lines[0][2]) is not None:
+            if not (message.startswith("<") or message.startswith("ok") or message.startswith("error")):
+                output.append(message)
+
+        # a handler set on the instance adds to its `__dict__`, checked here rather than
+        # with a `__setattr__` that would slow down every attribute write
+        if len(self.__dict__) != self._planned_size:
+            self.update_dispatch_plan()
+
+        if self.reuse_objects and message.startswith("<"):
+            return self._process_status_in_place(message)
+
+        dispatch = self._dispatch
+        # `$x=val` lines come in bulk from `$$` and `$S`, so they skip the other patterns
+        if message.startswith("$") and (match := self.var_re.match(message)):
+            if "handle_variable" in dispatch:
+                self.handle_variable(*match.groups())
+            return "variable"
+        elif match := self.exp_re.match(message):
             exp = match.group(1)
             if exp == "ID":
                 self.handle_exp_id()
@@ -492,21 +1734,32 @@ class FluidNC:
                 self.handle_exp_io(*exp.split("="))
             else:
                 raise FluidParseError(f"unknown exp: {exp}")
+            return "exp"
         elif match := self.status_re.match(message):
+            self._status_report = message
+            if "|WCO:" in message:
+                self._wco_report = message
             state, message = match.groups()
-            if self.is_state_valid(state):
-                self.handle_machine_state(state)
-            else:
+            if not self.is_state_valid(state):
                 raise InvalidStateError(f"Invalid state: {state}")
+            if "handle_machine_state" in dispatch:
+                self.handle_machine_state(state)
+            if not self._parse_status_fields:
+                return "status"
+            skip_fields = self._skip_fields
             for partial in message.split("|"):
                 kind, mantissa = partial.split(":")
-                if kind in ('MPos', 'WCO'):
-                    parsed_position = self.parse_position(partial)
-                    self.handle_position(*parsed_position)
+                if kind in skip_fields:
+                    continue
+                if kind in ('MPos', 'WPos', 'WCO'):
+                    if "handle_position" in dispatch:
+                        self.handle_position(kind, self._position(kind, mantissa))
                 elif kind in ('F', 'FS'):
-                    feed, speed = map(Decimal, mantissa.split(","))
-                    self.handle_feed(feed)
-                    self.handle_spindle(speed)
+                    values = mantissa.split(",")
+                    if "handle_feed" in dispatch:
+                        self.handle_feed(Decimal(values[0]))
+                    if kind == 'FS' and "handle_spindle" in dispatch:
+                        self.handle_spindle(Decimal(values[1]))
                 elif kind == 'Pn':
                     self.handle_triggers(mantissa)
                 elif kind == 'Err':
@@ -521,40 +1774,157 @@ class FluidNC:
                     self.handle_accessory_state(mantissa)
                 else:
                     raise FluidParseError(f"unknown status: {kind}:{mantissa}")
+            if "handle_work_position" in dispatch and (position := self.work_position) is not None:
+                self.handle_work_position(position)
+            return "status"
         elif match := self.version_re.search(message):
-            self.send_message("$Report/Interval=200")
-            self.handle_version(match.group(1))
+            self._reset_lines()
+            self.queue_line(f"$Report/Interval={self.report_interval}")
+            if "handle_version" in dispatch:
+                self.handle_version(match.group(1))
+            return "version"
         elif match := self.ver_re.match(message):
-            self.handle_version(match.group(1))
+            if "handle_version" in dispatch:
+                self.handle_version(match.group(1))
+            return "version"
         elif match := self.log_re.match(message):
             level, message = match.groups()
-            self.handle_log(level, message)
+            if level == "INI:":
+                self.handle_exp_io(*message.strip().split("=", 1))
+                return "ini"
+            elif level == "SET:":
+                if "handle_exp_set" in dispatch:
+                    self.handle_exp_set(*message.strip().split("=", 1))
+                return "exp"
+            if "handle_log" in dispatch:
+                self.handle_log(level, message)
+            return "msg"
         elif match := self.ini_re.match(message):
-            print(f"ini >> {match.groups()}")
+            self.handle_exp_io(*match.group(1).strip().split("=", 1))
+            return "ini"
         elif match := self.mode_re.match(message):
-            mode = Mode.from_string(match.group(1))
-            self.handle_mode(mode)
+            if "handle_mode" in dispatch:
+                mode = Mode.from_string(match.group(1))
+                self.handle_mode(mode)
+            return "gc"
         elif match := self.mode_cmd_re.match(message):
-            self.handle_mode_command(match.group(2))
+            if "handle_mode_command" in dispatch:
+                self.handle_mode_command(match.group(2))
+            return "mode_command"
         elif match := self.mode_change_re.match(message):
-            status = "No Status" if len(match.groups()) < 4 else match.group(3)
-            self.handle_mode_command(match.group(1), status)
-        elif match := self.var_re.match(message):
-            self.handle_variable(*match.groups())
+            if "handle_mode_command" in dispatch:
+                status = "No Status" if len(match.groups()) < 4 else match.group(3)
+                self.handle_mode_command(match.group(1), status)
+            return "mode_command"
         elif match := self.help_re.match(message):
-            self.handle_help(match.group(1))
+            if "handle_help" in dispatch:
+                self.handle_help(match.group(1))
+            return "help"
         elif match := self.tlo_re.match(message):
-            self.handle_tlo(match.group(1))
+            if "handle_tlo" in dispatch:
+                self.handle_tlo(match.group(1))
+            return "tlo"
         elif match := self.prb_re.match(message):
-            self.handle_prb(match.group(1))
+            if "handle_prb" in dispatch:
+                self.handle_prb(match.group(1))
+            return "prb"
         elif match := self.echo_re.match(message):
-            self.handle_echo(match.group(1))
+            if "handle_echo" in dispatch:
+                self.handle_echo(match.group(1))
+            return "echo"
         elif message.startswith("error"):
-            self.handle_error(message)
+            self._complete_line(message)
+            if "handle_error" in dispatch:
+                self.handle_error(message)
+            return "error"
         elif message.startswith("ok"):
-            self.handle_ok(message)
+            self._complete_line(message)
+            if "handle_ok" in dispatch:
+                self.handle_ok(message)
+            return "ok"
         elif message.startswith("ALARM:"):
-            self.handle_alarm(message[6:])
+            if "handle_alarm" in dispatch:
+                self.handle_alarm(message[6:])
+            return "alarm"
         else:
             raise FluidParseError(f"unknown >> {message}")
 
+    def _string_at(self, text: str, start: int, end: int) -> str:
+        # text[start:end], reusing the string from an earlier report when it is the same
+        strings = self._strings
+        i = 0
+        while i < len(strings):
+            string = strings[i]
+            if len(string) == end - start and text.startswith(string, start):
+                return string
+            i += 1
+        string = text[start:end]
+        if len(strings) < 64:
+            strings.append(string)
+        return string
+
+    def _process_status_in_place(self, message: str) -> str:
+        # same as the status branch of `process_message`, without slicing the report
+        bar = message.find("|")
+        end = message.find(">", bar)
+        if bar < 2 or end < 0:
+            raise FluidParseError(f"unknown >> {message}")
+        self._status_report = message
+        if "|WCO:" in message:
+            self._wco_report = message
+        state = self._string_at(message, 1, bar)
+        if not self.is_state_valid(state):
+            raise InvalidStateError(f"Invalid state: {state}")
+        dispatch = self._dispatch
+        if "handle_machine_state" in dispatch:
+            self.handle_machine_state(state)
+        if not self._parse_status_fields:
+            return "status"
+        skip_fields = self._skip_fields
+        start = bar + 1
+        while start < end:
+            stop = message.find("|", start, end)
+            if stop < 0:
+                stop = end
+            colon = message.find(":", start, stop)
+            kind = _field_at(message, start, colon) if colon > 0 else None
+            if kind is None:
+                raise FluidParseError(f"unknown status: {message[start:stop]}")
+            value = colon + 1
+            if kind in skip_fields:
+                pass
+            elif kind == 'MPos' or kind == 'WPos' or kind == 'WCO':
+                if "handle_position" in dispatch:
+                    _scan_decimals(self._axes[kind], message, value, stop)
+                    self._scanned[kind] = message
+                    self.handle_position(kind, self._positions[kind])
+            elif kind == 'F' or kind == 'FS':
+                feed, speed = self._feed_spindle
+                _scan_decimals(self._feed_spindle, message, value, stop)
+                if "handle_feed" in dispatch:
+                    self.handle_feed(feed)
+                if kind == 'FS' and "handle_spindle" in dispatch:
+                    self.handle_spindle(speed)
+            elif kind == 'Pn':
+                self.handle_triggers(self._string_at(message, value, stop))
+            elif kind == 'Err':
+                self.handle_error(self._string_at(message, value, stop))
+            elif kind == 'Ov':
+                feed, rapid, spindle = self._overrides
+                _scan_decimals(self._overrides, message, value, stop)
+                self.handle_overrides(feed, rapid, spindle)
+            elif kind == 'Ln':
+                self.handle_line_number(_scan_int(message, value, stop))
+            elif kind == 'Bf':
+                comma = message.find(",", value, stop)
+                if comma < 0:
+                    self.handle_buffer_size(_scan_int(message, value, stop))
+                else:
+                    self.handle_buffer_size(_scan_int(message, value, comma), _scan_int(message, comma + 1, stop))
+            elif kind == 'A':
+                self.handle_accessory_state(self._string_at(message, value, stop))
+            start = stop + 1
+        if "handle_work_position" in dispatch and (position := self.work_position) is not None:
+            self.handle_work_position(position)
+        return "status"
+
@@ -0,0 +1,228 @@
+from array import array
+
+from fluidpy.fluidnc import ticks_ns
+from fluidpy.chain import wrap_methods, restore_methods
+
+AXES = ('x', 'y', 'z', 'a', 'b', 'c')
+
+# handlers wrapped by `MotionHistory.attach`
+HISTORY_HANDLERS = ('handle_feed', 'handle_spindle')
+
+
+class MotionHistory:
+    """
+    The most recent status reports (time, machine position, feed and spindle) in a
+    fixed-size ring. Each value is stored in a preallocated `array` column, so recording a
+    report creates no objects that outlive it and memory use is fixed by `capacity`.
+    Attach with `FluidNC.enable_history`.
+
+    Samples are numbered from `0` (the oldest kept) to `len(history) - 1` (the latest).
+    Times are in nanoseconds, positions in machine units, velocities in units per second
+    and accelerations in units per second squared.
+
+    ```python
+    history = fnc.enable_history(capacity=512)
+    ...
+    if history.speed(window_ms=500) < 0.01 and state == 'Run':
+        print("stalled?")
+    ```
+    """
+
+    def __init__(self, capacity: int = 256, axes: int = 3) -> None:
+        """
+        Parameters:
+            capacity: number of samples kept
+            axes: number of axes recorded, from `x`
+        """
+        self.capacity = capacity
+        self.axes = axes
+        self.times = array('q', [0] * capacity)
+        """time (ns) of each sample"""
+        self.positions = [array('d', [0.0] * capacity) for _ in range(axes)]
+        """one column of positions per axis"""
+        self.feeds = array('d', [0.0] * capacity)
+        self.spindles = array('d', [0.0] * capacity)
+        self._next = 0
+        self._count = 0
+        self._feed = 0.0
+        self._spindle = 0.0
+        self._wrapped = dict()
+
+    def __len__(self) -> int:
+        return self._count
+
+    def clear(self) -> None:
+        self._next = 0
+        self._count = 0
+
+    def index(self, sample: int) -> int:
+        """
+        Position in the columns of `sample` (`0` is the oldest, `-1` the latest).
+        """
+        if sample < 0:
+            sample += self._count
+        if not 0 <= sample < self._count:
+            raise IndexError("sample out of range")
+        return (self._next - self._count + sample) % self.capacity
+
+    def append(self, time_ns: int, position, feed: float, spindle: float) -> None:
+        """
+        Record a sample, replacing the oldest once the history is full.
+
+        Parameters:
+            time_ns: when the report was received
+            position: `Position`, or a sequence of floats with a value per axis
+            feed: feed rate
+            spindle: spindle speed
+        """
+        i = self._next
+        self.times[i] = time_ns
+        axis = 0
+        if isinstance(position, (list, tuple, array)):
+            while axis < self.axes:
+                self.positions[axis][i] = position[axis]
+                axis += 1
+        else:
+            while axis < self.axes:
+                self.positions[axis][i] = getattr(position, AXES[axis]).to_float()
+                axis += 1
+        self.feeds[i] = feed
+        self.spindles[i] = spindle
+        self._next = (i + 1) % self.capacity
+        if self._count < self.capacity:
+            self._count += 1
+
+    def window(self, window_ms: float | None = None, now_ns: int | None = None) -> int:
+        """
+        Oldest sample taken within `window_ms` of `now_ns` (default: the latest sample), found
+        by binary search.
+
+        Returns:
+            sample number, `len(history)` if there are none
+        """
+        if window_ms is None or not self._count:
+            return 0
+        if now_ns is None:
+            now_ns = self.times[self.index(-1)]
+        since = now_ns - int(window_ms * 1_000_000)
+        low, high = 0, self._count
+        while low < high:
+            middle = (low + high) // 2
+            if self.times[self.index(middle)] < since:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def column(self, values: array, window_ms: float | None = None, out: array | None = None) -> array:
+        """
+        Copy the samples in the window from one of the columns (eg. `history.positions[0]`
+        or `history.feeds`), oldest first.
+
+        Parameters:
+            values: column to copy from
+            window_ms: only samples taken this recently, `None` for all of them
+            out: array to copy into, reused when it is the right size
+        """
+        first = self.window(window_ms)
+        count = self._count - first
+        if out is None or len(out) != count:
+            out = array(values.typecode, [0] * count)
+        i = 0
+        while i < count:
+            out[i] = values[self.index(first + i)]
+            i += 1
+        return out
+
+    def _slope(self, values: array, first: int, last: int) -> float:
+        # least squares slope of `values` against time (s) over samples first..last
+        count = last - first + 1
+        if count < 2:
+            return 0.0
+        origin = self.times[self.index(first)]
+        sum_t = sum_v = sum_tt = sum_tv = 0.0
+        sample = first
+        while sample <= last:
+            i = self.index(sample)
+            t = (self.times[i] - origin) / 1_000_000_000
+            v = values[i]
+            sum_t += t
+            sum_v += v
+            sum_tt += t * t
+            sum_tv += t * v
+            sample += 1
+        denominator = count * sum_tt - sum_t * sum_t
+        if not denominator:
+            return 0.0
+        return (count * sum_tv - sum_t * sum_v) / denominator
+
+    def velocity(self, axis: int, window_ms: float | None = None) -> float:
+        """
+        Velocity of an axis (`0` for x) over the window, fitted to all of its samples.
+        """
+        return self._slope(self.positions[axis], self.window(window_ms), self._count - 1)
+
+    def speed(self, window_ms: float | None = None) -> float:
+        """
+        Speed along the path over the window, from the velocity of each axis.
+        """
+        first = self.window(window_ms)
+        total = 0.0
+        axis = 0
+        while axis < self.axes:
+            velocity = self._slope(self.positions[axis], first, self._count - 1)
+            total += velocity * velocity
+            axis += 1
+        return total ** 0.5
+
+    def acceleration(self, axis: int, window_ms: float | None = None) -> float:
+        """
+        Acceleration of an axis over the window: the change in velocity between its first
+        and second half.
+        """
+        first = self.window(window_ms)
+        last = self._count - 1
+        if last - first < 3:
+            return 0.0
+        middle = (first + last) // 2
+        values = self.positions[axis]
+        early = self._slope(values, first, middle)
+        late = self._slope(values, middle + 1, last)
+        early_t = (self.times[self.index(first)] + self.times[self.index(middle)]) / 2
+        late_t = (self.times[self.index(middle + 1)] + self.times[self.index(last)]) / 2
+        if late_t == early_t:
+            return 0.0
+        return (late - early) / ((late_t - early_t) / 1_000_000_000)
+
+    def attach(self, fluidnc) -> None:
+        history = self
+        dispatched = fluidnc.require_handlers(HISTORY_HANDLERS)
+
+        def record(name, handler):
+            call = handler if name in dispatched else None
+            def handle(value):
+                if name == 'handle_feed':
+                    history._feed = value.to_float()
+                else:
+                    history._spindle = value.to_float()
+                if call:
+                    call(value)
+            return handle
+
+        def sampling(name, process):
+            def process_message(message):
+                kind = process(message)
+                if kind == "status":
+                    position = fluidnc.machine_position
+                    if position is not None:
+                        history.append(ticks_ns(), position, history._feed, history._spindle)
+                return kind
+            return process_message
+
+        self._wrapped = wrap_methods(fluidnc, HISTORY_HANDLERS, record)
+        self._wrapped.update(wrap_methods(fluidnc, ["process_message"], sampling))
+
+    def detach(self, fluidnc) -> None:
+        restore_methods(fluidnc, self._wrapped)
+        self._wrapped = dict()
+        fluidnc.release_handlers(HISTORY_HANDLERS)
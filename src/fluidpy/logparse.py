@@ -0,0 +1,195 @@
+"""
+Parses recorded channel logs (one message per line, as received from the controller)
+through `FluidNC.process_message`, splitting large files into chunks that are parsed in
+parallel by a process pool.
+
+    python -m fluidpy.logparse machine1/*.log --processes 8
+"""
+import os
+
+from fluidpy.fluidnc import BufferInterface, FluidNC, MESSAGE_KINDS
+
+
+class NullInterface(BufferInterface):
+    """
+    Connection that discards everything written and never has anything to read.
+    """
+
+    def write(self, data: bytes) -> int:
+        return len(data)
+
+    def readline(self) -> bytes:
+        return b""
+
+    def read(self, n: int) -> bytes:
+        return b""
+
+
+class LogParser(FluidNC):
+    """
+    Parses one chunk of a log and summarises it: the kinds of message seen, state changes,
+    alarms, errors and lines that couldn't be parsed, each with its line number within the
+    chunk. Chunks are parsed independently, each by its own instance, so a parser must only
+    keep what `result` returns and `merge` can combine in order.
+
+    Subclass to collect something else, overriding `handle_*` methods, `result` and
+    `merge` as needed. The subclass must be importable by the worker processes (defined at
+    module level, not in `__main__` on platforms that spawn).
+    """
+
+    def __init__(self) -> None:
+        super().__init__(NullInterface(), report_interval=0)
+        self.line_number = 0
+        """line being parsed, from `0` for the first line of the chunk"""
+        self.lines = 0
+        self.kinds = dict.fromkeys(MESSAGE_KINDS, 0)
+        self.states = []
+        self.alarms = []
+        self.errors = []
+        self.unparsed = []
+        self._state = None
+
+    def parse_line(self, line: str) -> None:
+        line = line.strip()
+        if line:
+            try:
+                self.kinds[self.process_message(line)] += 1
+            except Exception as e:
+                # logs can hold lines garbled in transmission, which can fail in a handler's
+                # conversion (`ValueError`, `IndexError`, ...) as well as in the parse
+                self.unparsed.append((self.line_number, str(e)))
+        self.line_number += 1
+        self.lines += 1
+
+    def handle_machine_state(self, state: str) -> None:
+        if state != self._state:
+            self._state = state
+            self.states.append((self.line_number, state))
+
+    def handle_alarm(self, alarm: str) -> None:
+        self.alarms.append((self.line_number, alarm))
+
+    def handle_error(self, error: str) -> None:
+        self.errors.append((self.line_number, error))
+
+    def result(self) -> dict:
+        """
+        What the chunk contained, sent back from the worker process: must be picklable and
+        include `lines`, the number of lines in the chunk.
+        """
+        return {
+            "lines": self.lines,
+            "kinds": self.kinds,
+            "states": self.states,
+            "alarms": self.alarms,
+            "errors": self.errors,
+            "unparsed": self.unparsed,
+        }
+
+    @classmethod
+    def merge(cls, results: list) -> dict:
+        """
+        Combine the `result` of every chunk, in the order of the chunks in the file(s).
+        Line numbers are made relative to the start of the first chunk.
+        """
+        merged = {"lines": 0, "kinds": dict.fromkeys(MESSAGE_KINDS, 0),
+                  "states": [], "alarms": [], "errors": [], "unparsed": []}
+        for result in results:
+            offset = merged["lines"]
+            merged["lines"] += result["lines"]
+            for kind, count in result["kinds"].items():
+                merged["kinds"][kind] += count
+            for name in ("alarms", "errors", "unparsed"):
+                merged[name].extend((offset + line, value) for line, value in result[name])
+            for line, state in result["states"]:
+                # each chunk starts without knowing the state the previous one ended in
+                if not merged["states"] or merged["states"][-1][1] != state:
+                    merged["states"].append((offset + line, state))
+        return merged
+
+
+def split_chunks(path: str, chunk_bytes: int) -> list:
+    """
+    Split a file into `(start, end)` byte ranges of about `chunk_bytes`, ending on line
+    boundaries.
+    """
+    size = os.path.getsize(path)
+    chunks = []
+    with open(path, "rb") as file:
+        start = 0
+        while start < size:
+            file.seek(min(start + chunk_bytes, size))
+            file.readline()
+            end = min(file.tell(), size)
+            chunks.append((start, end))
+            start = end
+    return chunks
+
+
+def parse_chunk(task: tuple):
+    """
+    Parse the lines in one byte range of a file with a new instance of `parser`.
+
+    Parameters:
+        task: `(parser, path, start, end)`
+    """
+    parser_class, path, start, end = task
+    parser = parser_class()
+    with open(path, "rb") as file:
+        file.seek(start)
+        data = file.read(end - start)
+    text = data.decode(errors="replace")
+    if text.endswith("\n"):
+        text = text[:-1]
+    for line in text.split("\n"):
+        parser.parse_line(line)
+    return parser.result()
+
+
+def parse_logs(paths, parser=LogParser, processes: int | None = None,
+               chunk_bytes: int = 8 * 1024 * 1024):
+    """
+    Parse log files in parallel and merge the results in file and line order.
+
+    Parameters:
+        paths: a log file, or a list of them parsed as one continuous log
+        parser: `LogParser` subclass to parse each chunk with
+        processes: worker processes, `None` for one per core, `1` to parse in this process
+        chunk_bytes: approximate size of the chunks handed to each worker
+
+    Returns:
+        `parser.merge` of the results of every chunk
+    """
+    if isinstance(paths, str):
+        paths = [paths]
+    tasks = [(parser, path, start, end) for path in paths for start, end in split_chunks(path, chunk_bytes)]
+    if processes == 1 or len(tasks) < 2:
+        return parser.merge([parse_chunk(task) for task in tasks])
+
+    from multiprocessing import Pool
+    with Pool(processes) as pool:
+        return parser.merge(pool.map(parse_chunk, tasks, chunksize=1))
+
+
+def main(argv: list | None = None) -> None:
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Summarise recorded FluidNC channel logs")
+    parser.add_argument("paths", nargs="+", help="log files, parsed in order as one log")
+    parser.add_argument("--processes", type=int, default=None, help="worker processes, default one per core")
+    parser.add_argument("--chunk-mb", type=float, default=8.0, help="size of the chunks parsed by each worker")
+    args = parser.parse_args(argv)
+
+    summary = parse_logs(args.paths, processes=args.processes, chunk_bytes=int(args.chunk_mb * 1024 * 1024))
+    print(f"{summary['lines']} lines")
+    for kind, count in summary["kinds"].items():
+        if count:
+            print(f"  {kind:<14} {count}")
+    print(f"{len(summary['states'])} state changes, {len(summary['alarms'])} alarms, "
+          f"{len(summary['errors'])} errors, {len(summary['unparsed'])} unparsed lines")
+    for line, alarm in summary["alarms"]:
+        print(f"  line {line + 1}: ALARM:{alarm}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,321 @@
+import asyncio
+import os
+
+from fluidpy.fluidnc import BufferInterface, FluidNC, FluidParseError, logging
+
+logger = logging.getLogger(__name__)
+
+
+class FdInterface(BufferInterface):
+    """
+    Non-blocking connection over a file descriptor (a serial device or pseudo-terminal),
+    for many controllers on one event loop: `readline` only returns complete lines and
+    never waits for one. Raises `ConnectionError` once the other end has closed.
+    """
+
+    def __init__(self, fd: int) -> None:
+        os.set_blocking(fd, False)
+        self.fd = fd
+        self._buffer = bytearray()
+
+    @classmethod
+    def open(cls, path: str, baudrate: int = 115200) -> 'FdInterface':
+        """
+        Open a serial device or pseudo-terminal in raw mode.
+        """
+        import termios
+        import tty
+
+        fd = os.open(path, os.O_RDWR | os.O_NOCTTY | os.O_NONBLOCK)
+        try:
+            tty.setraw(fd, termios.TCSANOW)
+            speed = getattr(termios, f"B{baudrate}", None)
+            if speed is not None:
+                attributes = termios.tcgetattr(fd)
+                attributes[4] = attributes[5] = speed
+                termios.tcsetattr(fd, termios.TCSANOW, attributes)
+        except termios.error:
+            os.close(fd)
+            raise
+        return cls(fd)
+
+    def fileno(self) -> int:
+        return self.fd
+
+    @property
+    def in_waiting(self) -> int:
+        """bytes received but not yet returned by `readline`"""
+        return len(self._buffer)
+
+    def _fill(self) -> None:
+        try:
+            data = os.read(self.fd, 4096)
+        except BlockingIOError:
+            return
+        if not data:
+            raise ConnectionError("connection closed")
+        self._buffer += data
+
+    def readline(self) -> bytes:
+        end = self._buffer.find(b"\n")
+        if end < 0:
+            self._fill()
+            end = self._buffer.find(b"\n")
+            if end < 0:
+                return b""
+        line = bytes(self._buffer[:end + 1])
+        del self._buffer[:end + 1]
+        return line
+
+    def read(self, n: int) -> bytes:
+        if not self._buffer:
+            self._fill()
+        data = bytes(self._buffer[:n])
+        del self._buffer[:n]
+        return data
+
+    def write(self, data: bytes) -> int:
+        import select
+
+        view = memoryview(data)
+        while view:
+            try:
+                view = view[os.write(self.fd, view):]
+            except BlockingIOError:
+                # the device's transmit buffer is full, give it a moment to drain
+                select.select([], [self.fd], [], 0.1)
+        return len(data)
+
+    def close(self) -> None:
+        os.close(self.fd)
+
+
+class ManagedController:
+    """
+    One controller run by a `ControllerManager`: its `FluidNC` instance, kept across
+    reconnects, and the state of its connection.
+    """
+
+    def __init__(self, name: str, connect, fluidnc: FluidNC) -> None:
+        self.name = name
+        self.connect = connect
+        """called with no arguments to open the connection, returning the io"""
+        self.fluidnc = fluidnc
+        self.connected = False
+        self.connects = 0
+        """number of times the connection was opened"""
+        self.messages = 0
+        """number of messages read, over every connection"""
+        self.last_error = None
+        """why the connection was last lost or couldn't be opened"""
+        self._task = None
+
+    def status(self) -> dict:
+        status = {
+            "connected": self.connected,
+            "connects": self.connects,
+            "messages": self.messages,
+            "last_error": self.last_error,
+        }
+        stats = self.fluidnc.stats()
+        if stats is not None:
+            status["stats"] = stats
+        return status
+
+
+class ControllerManager:
+    """
+    Runs many controllers concurrently on one asyncio event loop. Each has its own
+    `FluidNC` instance (state, handlers, stats) and is reconnected whenever its connection
+    fails. Connections with a file descriptor (`FdInterface`, used for device paths) are
+    read when the loop's selector reports data waiting; others are polled every `poll_ms`
+    and must not block in `readline`.
+
+    Handlers run on the loop, so a slow one holds up every controller: hand heavy work to
+    the shared worker threads with `offload`.
+
+    ```python
+    manager = ControllerManager(workers=2)
+    for name, path in (("mill", "/dev/ttyUSB0"), ("lathe", "/dev/ttyUSB1")):
+        manager.add(name, path, MyFluidNC(None))
+    asyncio.run(manager.run())
+    ```
+    """
+
+    def __init__(self, workers: int = 2, reconnect_s: float = 1.0, poll_ms: float = 10.0,
+                 batch: int = 64, stats: bool = False, catch_exc: bool = True) -> None:
+        """
+        Parameters:
+            workers: threads shared by all controllers for `offload`
+            reconnect_s: delay before reopening a connection that failed
+            poll_ms: longest wait between polls of each controller, which also writes anything
+                waiting in its write buffer
+            batch: messages processed from one controller before letting the others run
+            stats: call `FluidNC.enable_stats` on every controller added
+            catch_exc: log parse errors instead of dropping the connection
+        """
+        self.workers = workers
+        self.reconnect_s = reconnect_s
+        self.poll_ms = poll_ms
+        self.batch = batch
+        self.stats = stats
+        self.catch_exc = catch_exc
+        self.controllers = dict()
+        """`ManagedController` for each name"""
+        self._running = False
+        self._stopped = None
+        self._executor = None
+        self._loop = None
+
+    def add(self, name: str, connect, fluidnc: FluidNC | None = None) -> ManagedController:
+        """
+        Add a controller, connecting to it straight away if the manager is running.
+
+        Parameters:
+            name: unique name of the controller
+            connect: path of a serial device or pseudo-terminal, or a function returning a
+                connected io
+            fluidnc: instance to process its messages (its `io` is replaced on every
+                connection), or `None` for a plain `FluidNC`
+        """
+        if name in self.controllers:
+            raise ValueError(f"controller already added: {name}")
+        if isinstance(connect, str):
+            path = connect
+            connect = lambda: FdInterface.open(path)    # noqa: E731
+        if fluidnc is None:
+            fluidnc = FluidNC(None)
+        if self.stats:
+            fluidnc.enable_stats()
+        controller = ManagedController(name, connect, fluidnc)
+        self.controllers[name] = controller
+        if self._running:
+            controller._task = self._loop.create_task(self._serve(controller))
+        return controller
+
+    async def remove(self, name: str) -> None:
+        """
+        Disconnect a controller and stop managing it.
+        """
+        controller = self.controllers.pop(name)
+        if controller._task is not None:
+            controller._task.cancel()
+            try:
+                await controller._task
+            except asyncio.CancelledError:
+                pass
+
+    def status(self) -> dict:
+        """
+        Connection state, message count and (with `stats`) `FluidNC.stats` of each controller.
+        """
+        return {name: controller.status() for name, controller in self.controllers.items()}
+
+    def offload(self, function, *args):
+        """
+        Call `function(*args)` on one of the shared worker threads.
+
+        Returns:
+            `concurrent.futures.Future` of the result
+        """
+        if self._executor is None:
+            from concurrent.futures import ThreadPoolExecutor
+            self._executor = ThreadPoolExecutor(self.workers, thread_name_prefix="fluidpy")
+        return self._executor.submit(function, *args)
+
+    async def run(self) -> None:
+        """
+        Serve every controller until `stop` is called.
+        """
+        self._loop = asyncio.get_running_loop()
+        self._running = True
+        self._stopped = asyncio.Event()
+        for controller in self.controllers.values():
+            controller._task = self._loop.create_task(self._serve(controller))
+        try:
+            await self._stopped.wait()
+        finally:
+            self._running = False
+            tasks = [controller._task for controller in self.controllers.values()]
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            if self._executor is not None:
+                self._executor.shutdown(wait=False)
+                self._executor = None
+
+    def stop(self) -> None:
+        """
+        Stop serving, closing every connection. Call from the event loop's thread.
+        """
+        if self._stopped is not None:
+            self._stopped.set()
+
+    # ------------------------------------------
+
+    async def _serve(self, controller: ManagedController) -> None:
+        while self._running:
+            try:
+                io = controller.connect()
+            except OSError as e:
+                controller.last_error = str(e)
+                logger.warning(f"{controller.name}: can't connect: {e}")
+                await asyncio.sleep(self.reconnect_s)
+                continue
+            fluidnc = controller.fluidnc
+            fluidnc.io = io
+            controller.connected = True
+            controller.connects += 1
+            try:
+                await self._read(controller, io)
+            except (OSError, FluidParseError) as e:
+                controller.last_error = str(e)
+                logger.warning(f"{controller.name}: connection lost: {e}")
+            finally:
+                controller.connected = False
+                # anything waiting for a response won't get one on this connection
+                fluidnc._reset_lines()
+                close = getattr(io, "close", None)
+                if close is not None:
+                    try:
+                        close()
+                    except OSError:
+                        pass
+            if self._running:
+                await asyncio.sleep(self.reconnect_s)
+
+    async def _read(self, controller: ManagedController, io) -> None:
+        loop = self._loop
+        fluidnc = controller.fluidnc
+        fileno = getattr(io, "fileno", None)
+        fd = fileno() if fileno is not None else None
+        ready = asyncio.Event()
+        if fd is not None:
+            loop.add_reader(fd, ready.set)
+        try:
+            while self._running:
+                count = 0
+                while count < self.batch:
+                    try:
+                        if not fluidnc.poll(self.catch_exc):
+                            break
+                    except (OSError, FluidParseError):
+                        raise
+                    except Exception as e:
+                        # a garbled field can fail its conversion rather than the parse, eg. `Ln:abc`
+                        if not self.catch_exc:
+                            raise FluidParseError(f"can't process message: {e!r}") from e
+                        logger.warning(f"{controller.name}: can't process message: {e!r}")
+                    count += 1
+                controller.messages += count
+                if count == self.batch:
+                    # more waiting, let the other controllers have a turn first
+                    await asyncio.sleep(0)
+                    continue
+                ready.clear()
+                timer = loop.call_later(self.poll_ms / 1000, ready.set)
+                await ready.wait()
+                timer.cancel()
+        finally:
+            if fd is not None:
+                loop.remove_reader(fd)
@@ -0,0 +1,234 @@
+from collections import deque
+try:
+    from threading import Condition
+except ImportError:
+    # micropython: no blocking `get`, poll with `get_nowait` instead
+    Condition = None
+
+from fluidpy.fluidnc import Position, ticks_ns, wake_waiter
+from fluidpy.state import copy_position
+from fluidpy.chain import wrap_methods, restore_methods
+from fluidpy.throttle import KIND_HANDLERS
+
+
+def event_handlers(fluidnc, events) -> set:
+    """
+    Handlers publishing `events`: event names (a handler without `handle_`, eg. `position`),
+    kinds of message (eg. `status`, see `fluidpy.throttle.KIND_HANDLERS`) or `None` for all.
+    """
+    if events is None:
+        return {name for name in dir(fluidnc) if name.startswith("handle_")}
+    if isinstance(events, str):
+        events = (events,)
+    handlers = set()
+    for event in events:
+        if event in KIND_HANDLERS:
+            handlers.update(KIND_HANDLERS[event])
+        elif callable(getattr(fluidnc, "handle_" + event, None)):
+            handlers.add("handle_" + event)
+        else:
+            raise ValueError(f"unknown event: {event}")
+    return handlers
+
+
+class Event:
+    """
+    A call to one of the `handle_*` methods: `name` is the handler without `handle_` and
+    `args` its arguments. The same event is delivered to every subscriber, don't change it.
+    """
+
+    __slots__ = ("name", "args", "time_ns")
+    def __init__(self, name: str, args: tuple, time_ns: int):
+        self.name = name
+        self.args = args
+        self.time_ns = time_ns
+        """`ticks_ns` when the message was processed"""
+
+    def __repr__(self) -> str:
+        return f"Event({self.name}, {self.args})"
+
+
+class Subscription:
+    """
+    Bounded queue of the events a subscriber registered for, filled by the listener and
+    read from any thread. When the subscriber falls `maxsize` events behind, the oldest
+    are dropped and counted in `dropped`: the listener never waits for a subscriber.
+    Create with `FluidNC.subscribe`.
+    """
+
+    def __init__(self, handlers: set, maxsize: int = 64) -> None:
+        self.handlers = frozenset(handlers)
+        """handlers whose calls are queued"""
+        self.maxsize = maxsize
+        self.dropped = 0
+        """events dropped because the queue was full"""
+        self._queue = deque((), maxsize)
+        self._ready = Condition() if Condition else None
+
+    def __len__(self) -> int:
+        return len(self._queue)
+
+    def put(self, event: Event) -> None:
+        if self._ready is None:
+            self._append(event)
+            return
+        with self._ready:
+            self._append(event)
+            self._ready.notify()
+
+    def _append(self, event: Event) -> None:
+        queue = self._queue
+        if len(queue) >= self.maxsize:
+            queue.popleft()
+            self.dropped += 1
+        queue.append(event)
+
+    def get_nowait(self) -> Event | None:
+        """
+        The oldest event queued, `None` if there are none.
+        """
+        try:
+            return self._queue.popleft()
+        except IndexError:
+            return None
+
+    def get(self, timeout: float | None = None) -> Event | None:
+        """
+        The oldest event queued, waiting up to `timeout` seconds (forever if `None`) for one
+        while `listen` runs in another thread.
+
+        Returns:
+            the event, `None` if none arrived in time
+        """
+        if self._ready is None:
+            return self.get_nowait()
+        with self._ready:
+            if not self._queue and not self._ready.wait_for(lambda: self._queue, timeout):
+                return None
+            return self._queue.popleft()
+
+    def drain(self) -> list:
+        """
+        All the events queued, oldest first.
+        """
+        events = []
+        event = self.get_nowait()
+        while event is not None:
+            events.append(event)
+            event = self.get_nowait()
+        return events
+
+
+class AsyncSubscription(Subscription):
+    """
+    `Subscription` read from a task, while `alisten` (or `listen` in another thread)
+    processes messages. Create with `FluidNC.subscribe_async`.
+
+    ```python
+    async for event in fnc.subscribe_async(['position', 'machine_state']):
+        display.show(event.name, *event.args)
+    ```
+    """
+
+    def __init__(self, handlers: set, maxsize: int = 64) -> None:
+        super().__init__(handlers, maxsize)
+        self._waiting = None    # loop and `asyncio.Event` of the `get` waiting for an event
+
+    def put(self, event: Event) -> None:
+        self._append(event)
+        wake_waiter(self._waiting)
+
+    async def get(self, timeout: float | None = None) -> Event | None:
+        """
+        The oldest event queued, waiting up to `timeout` seconds (forever if `None`) for one.
+
+        Returns:
+            the event, `None` if none arrived in time
+        """
+        import asyncio
+        queue = self._queue
+        if queue:
+            return queue.popleft()
+        deadline = None if timeout is None else ticks_ns() + int(timeout * 1_000_000_000)
+        ready = asyncio.Event()
+        self._waiting = (asyncio.get_event_loop(), ready)
+        try:
+            while not queue:
+                if deadline is None:
+                    await ready.wait()
+                else:
+                    remaining = (deadline - ticks_ns()) / 1_000_000_000
+                    if remaining <= 0:
+                        return None
+                    try:
+                        await asyncio.wait_for(ready.wait(), remaining)
+                    except asyncio.TimeoutError:
+                        return None
+                ready.clear()
+            return queue.popleft()
+        finally:
+            self._waiting = None
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> Event:
+        return await self.get()
+
+
+class EventBus:
+    """
+    Publishes every call to the handlers some subscriber registered for as an `Event`, to
+    the queue of each of those subscribers. Messages are parsed once however many
+    subscribers there are, and handlers nobody subscribed to are left alone. Created by
+    `FluidNC.subscribe`.
+    """
+
+    def __init__(self) -> None:
+        self.subscriptions = []
+        self._subscribers = dict()
+        self._copy_values = False
+        self._wrapped = dict()
+
+    def publish(self, name: str, args: tuple) -> None:
+        subscribers = self._subscribers.get(name)
+        if not subscribers:
+            return
+        if self._copy_values:
+            args = tuple(copy_position(arg) if isinstance(arg, Position) else
+                         arg.clone() if hasattr(arg, "clone") else arg for arg in args)
+        event = Event(name[7:], args, ticks_ns())
+        for subscription in subscribers:
+            subscription.put(event)
+
+    def add(self, fluidnc, subscription: Subscription) -> None:
+        bus = self
+        # with `reuse_objects` positions and decimals are updated in place, so they are copied
+        self._copy_values = fluidnc.reuse_objects
+        self.subscriptions.append(subscription)
+        names = [name for name in subscription.handlers if name not in self._subscribers]
+        for name in subscription.handlers:
+            self._subscribers.setdefault(name, []).append(subscription)
+        dispatched = fluidnc.require_handlers(names)
+
+        def publishing(name, handler):
+            call = handler if name in dispatched else None
+            def handle(*args):
+                bus.publish(name, args)
+                if call:
+                    return call(*args)
+            return handle
+
+        self._wrapped.update(wrap_methods(fluidnc, names, publishing))
+
+    def remove(self, fluidnc, subscription: Subscription) -> None:
+        self.subscriptions.remove(subscription)
+        unused = []
+        for name in subscription.handlers:
+            subscribers = self._subscribers[name]
+            subscribers.remove(subscription)
+            if not subscribers:
+                del self._subscribers[name]
+                unused.append(name)
+        restore_methods(fluidnc, {name: self._wrapped.pop(name) for name in unused})
+        fluidnc.release_handlers(unused)
@@ -0,0 +1,192 @@
+import time
+
+from fluidpy.fluidnc import BufferInterface, ticks_ns
+
+INBOUND = "<"
+"""record of data read from the controller"""
+OUTBOUND = ">"
+"""record of data written to the controller"""
+
+HEADER = "# fluidpy session v1\n"
+
+
+def escape(data: bytes) -> str:
+    """
+    Encode bytes as a single line of printable text, escaping `\\`, line endings and any
+    non-printable byte (eg. realtime commands) as `\\n`, `\\r` or `\\xHH`.
+    """
+    out = []
+    for byte in data:
+        if byte == 0x5C:
+            out.append("\\\\")
+        elif 0x20 <= byte < 0x7F:
+            out.append(chr(byte))
+        elif byte == 0x0A:
+            out.append("\\n")
+        elif byte == 0x0D:
+            out.append("\\r")
+        else:
+            out.append("\\x%02x" % byte)
+    return "".join(out)
+
+
+def unescape(text: str) -> bytes:
+    """
+    Decode a line encoded with `escape`.
+    """
+    out = bytearray()
+    i = 0
+    while i < len(text):
+        char = text[i]
+        if char != "\\":
+            out.append(ord(char))
+            i += 1
+            continue
+        code = text[i + 1]
+        if code == "x":
+            out.append(int(text[i + 2:i + 4], 16))
+            i += 4
+            continue
+        out.append({"n": 0x0A, "r": 0x0D, "\\": 0x5C}[code])
+        i += 2
+    return bytes(out)
+
+
+class RecorderInterface(BufferInterface):
+    """
+    Wraps another `BufferInterface`, writing everything read from and written to the
+    controller to a session file. Each record is a line of
+    `<microseconds since previous record> <direction> <escaped data>`, with direction `<`
+    for data read and `>` for data written.
+
+    ```python
+    with RecorderInterface(UARTInterface(), "shop.session") as io:
+        MyFluidExpander(io).listen()
+    ```
+    """
+
+    def __init__(self, io: BufferInterface, file, flush: bool = False) -> None:
+        """
+        Parameters:
+            io: interface to the controller
+            file: path or text file object to record to
+            flush: flush the file after every record, so nothing is lost if the
+                process is killed
+        """
+        self.io = io
+        self._owns_file = isinstance(file, str)
+        self._file = open(file, "w") if self._owns_file else file
+        self._flush = flush
+        self._last_us = ticks_ns() // 1000
+        self._file.write(HEADER)
+
+    def _record(self, direction: str, data: bytes) -> None:
+        now = ticks_ns() // 1000
+        self._file.write(f"{now - self._last_us} {direction} {escape(data)}\n")
+        self._last_us = now
+        if self._flush:
+            self._file.flush()
+
+    def read(self, n: int) -> bytes:
+        data = self.io.read(n)
+        if data:
+            self._record(INBOUND, data)
+        return data
+
+    def readline(self) -> bytes:
+        data = self.io.readline()
+        if data:
+            self._record(INBOUND, data)
+        return data
+
+    def write(self, data: bytes) -> int:
+        self._record(OUTBOUND, data)
+        return self.io.write(data)
+
+    def close(self) -> None:
+        if self._owns_file:
+            self._file.close()
+        else:
+            self._file.flush()
+
+    def __enter__(self) -> 'RecorderInterface':
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+
+class ReplayInterface(BufferInterface):
+    """
+    Feeds a session recorded with `RecorderInterface` back to a `FluidNC` instance, at the
+    recorded pace (`speed=1`), faster or slower (`speed=N`), or as fast as possible
+    (`speed=None`). Data written by the library is collected in `written` rather than
+    compared with the recording, since handlers under test may legitimately differ.
+
+    ```python
+    io = ReplayInterface("shop.session", speed=10)
+    fnc = MyFluidExpander(io)
+    while not io.finished:
+        fnc.poll()
+    ```
+    """
+
+    def __init__(self, file, speed: float | None = 1.0) -> None:
+        """
+        Parameters:
+            file: path or text file object of a recorded session
+            speed: multiple of the recorded pace, `None` to replay without waiting
+        """
+        self._owns_file = isinstance(file, str)
+        self._file = open(file) if self._owns_file else file
+        self.speed = speed
+        self.finished = False
+        """`True` once every recorded message has been read"""
+        self.written = []
+        """data written by the library during the replay"""
+        self._recorded_us = 0
+        self._start_ns = None
+        self._pending = b""
+
+    def _next_inbound(self) -> bytes:
+        for line in self._file:
+            line = line.rstrip("\n")
+            if not line or line.startswith("#"):
+                continue
+            delta, direction, data = line.split(" ", 2)
+            self._recorded_us += int(delta)
+            if direction == INBOUND:
+                self._wait()
+                return unescape(data)
+        self.finished = True
+        if self._owns_file:
+            self._file.close()
+        return b""
+
+    def _wait(self) -> None:
+        if not self.speed:
+            return
+        if self._start_ns is None:
+            self._start_ns = ticks_ns() - int(self._recorded_us * 1000 / self.speed)
+        due = self._start_ns + int(self._recorded_us * 1000 / self.speed)
+        delay = due - ticks_ns()
+        if delay > 0:
+            time.sleep(delay / 1_000_000_000)
+
+    def readline(self) -> bytes:
+        if self._pending:
+            data, self._pending = self._pending, b""
+            return data
+        if self.finished:
+            return b""
+        return self._next_inbound()
+
+    def read(self, n: int) -> bytes:
+        data = self.readline()
+        if len(data) > n:
+            data, self._pending = data[:n], data[n:]
+        return data
+
+    def write(self, data: bytes) -> int:
+        self.written.append(bytes(data))
+        return len(data)
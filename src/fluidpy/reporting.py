@@ -0,0 +1,126 @@
+from fluidpy.fluidnc import ticks_ns, logging
+from fluidpy.chain import wrap_methods, restore_methods
+
+logger = logging.getLogger(__name__)
+
+# machine states in which the faster `active_ms` interval is used
+ACTIVE_STATES = ('Run', 'Jog')
+
+
+def bytes_waiting(io) -> int:
+    """
+    Bytes received but not yet read from `io`, for interfaces that can tell (pyserial and
+    CircuitPython's `in_waiting`, MicroPython's `UART.any()`), otherwise `0`.
+    """
+    waiting = getattr(io, "in_waiting", None)
+    if waiting is None:
+        any_waiting = getattr(io, "any", None)
+        waiting = any_waiting() if callable(any_waiting) else 0
+    return waiting or 0
+
+
+class AdaptiveReportInterval:
+    """
+    Picks the status report interval to request from the controller: `active_ms` while
+    the machine is running or jogging, `idle_ms` otherwise, backing off (doubling, up to
+    `max_ms`) while the listener can't keep up and returning once it has caught up. Attach
+    with `FluidNC.enable_adaptive_reporting`.
+
+    The listener is behind when parsing and dispatching a report takes longer than
+    `budget_fraction` of the current interval, or when more than `max_waiting` bytes are
+    waiting to be read from the io. It has caught up once `recover_after` reports in a row
+    would have been within budget at twice the rate.
+    """
+
+    def __init__(self, idle_ms: int = 200, active_ms: int | None = None, max_ms: int = 2000,
+                 budget_fraction: float = 0.25, max_waiting: int = 256, recover_after: int = 20) -> None:
+        """
+        Parameters:
+            idle_ms: interval while the machine isn't moving
+            active_ms: interval during `Run` and `Jog`, `None` for `idle_ms`
+            max_ms: longest interval to back off to
+            budget_fraction: fraction of the interval a report may take to process
+            max_waiting: bytes waiting to be read before the listener counts as behind
+            recover_after: reports within budget at twice the rate before halving the backoff
+        """
+        self.idle_ms = idle_ms
+        self.active_ms = active_ms if active_ms is not None else idle_ms
+        self.max_ms = max_ms
+        self.budget_fraction = budget_fraction
+        self.max_waiting = max_waiting
+        self.recover_after = recover_after
+
+        self.state = 'Idle'
+        """machine state from the latest status report"""
+        self.backoff = 1
+        """multiple of the base interval currently requested"""
+        self.backoffs = 0
+        """number of times the interval was backed off"""
+        self._in_budget = 0
+        self._wrapped = dict()
+
+    def interval(self) -> int:
+        base = self.active_ms if self.state in ACTIVE_STATES else self.idle_ms
+        return max(base, min(base * self.backoff, self.max_ms))
+
+    def update(self, fluidnc, elapsed_ns: int) -> None:
+        """
+        Account for a status report that took `elapsed_ns` to process, and request a new
+        interval from the controller if it should change.
+        """
+        current = fluidnc.report_interval
+        if not current:
+            return
+        budget_ns = current * self.budget_fraction * 1_000_000
+        if elapsed_ns > budget_ns or bytes_waiting(fluidnc.io) > self.max_waiting:
+            self._in_budget = 0
+            if self.interval() < self.max_ms:
+                self.backoff *= 2
+                self.backoffs += 1
+                logger.warning(f"listener behind, backing off status reports to {self.interval()} ms")
+        elif self.backoff > 1 and elapsed_ns <= budget_ns / 2:
+            # would also be within budget at twice the rate
+            self._in_budget += 1
+            if self._in_budget >= self.recover_after:
+                self.backoff //= 2
+                self._in_budget = 0
+        else:
+            self._in_budget = 0
+
+        interval = self.interval()
+        if interval != current:
+            fluidnc.set_report_interval(interval)
+
+    def attach(self, fluidnc) -> None:
+        policy = self
+        dispatched = "handle_machine_state" in fluidnc.require_handlers(["handle_machine_state"])
+
+        def watch_state(name, handler):
+            def handle_machine_state(state):
+                policy.state = state
+                if dispatched:
+                    handler(state)
+            return handle_machine_state
+
+        def timed_process(name, process):
+            def process_message(message):
+                start = ticks_ns()
+                kind = process(message)
+                if kind == "status":
+                    policy.update(fluidnc, ticks_ns() - start)
+                elif kind == "version":
+                    # the controller restarted, start again without any backoff
+                    policy.backoff = 1
+                    policy._in_budget = 0
+                return kind
+            return process_message
+
+        self._wrapped = wrap_methods(fluidnc, ["handle_machine_state"], watch_state)
+        self._wrapped.update(wrap_methods(fluidnc, ["process_message"], timed_process))
+        if self.interval() != fluidnc.report_interval:
+            fluidnc.set_report_interval(self.interval())
+
+    def detach(self, fluidnc) -> None:
+        restore_methods(fluidnc, self._wrapped)
+        self._wrapped = dict()
+        fluidnc.release_handlers(["handle_machine_state"])
@@ -0,0 +1,212 @@
+from fluidpy.fluidnc import ticks_ns, logging
+from fluidpy.chain import wrap_methods, restore_methods
+
+logger = logging.getLogger(__name__)
+
+# words of boolean settings, eg. `$Sta/SSID/Hidden=Off`
+_BOOLEANS = {
+    "ON": True, "TRUE": True,
+    "OFF": False, "FALSE": False,
+}
+
+
+def setting_key(name: str) -> str:
+    """
+    Key of a setting in a `SettingsCache`: its name without the `$`, in lower case, as
+    the controller doesn't tell `$Report/Interval` from `$report/interval`.
+    """
+    return name.strip().lstrip("$").lower()
+
+
+def typed_value(raw: str):
+    """
+    Value of a setting as an `int`, `float` or `bool` when it reads as one, otherwise the
+    string as sent.
+    """
+    text = raw.strip()
+    if not text:
+        return raw
+    try:
+        return int(text)
+    except ValueError:
+        pass
+    if text[:1] in "+-.0123456789":
+        try:
+            return float(text)
+        except ValueError:
+            pass
+    return _BOOLEANS.get(text.upper(), raw)
+
+
+class SettingsCache:
+    """
+    The controller's `$` settings, kept from every `$x=val` line it sends, so a settings
+    page can be drawn without a round trip per value. Attach with `FluidNC.enable_settings`.
+
+    - `load` sends `$S` (or `$$`) and the whole dump is taken in as it arrives
+    - values are kept as sent and only converted (see `typed_value`) when first read
+    - `set` writes a setting and reads it back, the setting being `stale` until then;
+      `refresh` reads back only the stale settings, eg. after a reconnect
+
+    ```python
+    settings = fnc.enable_settings()
+    settings.load()
+    ...
+    interval = settings.get("Report/Interval")
+    ```
+    """
+
+    def __init__(self) -> None:
+        self._names = dict()        # key -> name as sent by the controller
+        self._raw = dict()          # key -> value as sent
+        self._typed = dict()        # key -> value converted on first read
+        self._updated_ns = dict()   # key -> when the value was last received
+        self.stale = set()
+        """keys of settings written or invalidated and not yet read back"""
+        self.version = 0
+        """incremented whenever a value changes, to redraw only when needed"""
+        self._fluidnc = None
+        self._wrapped = dict()
+
+    def update(self, name: str, raw: str, now: int | None = None) -> None:
+        """
+        Set the value of a setting as received from the controller.
+        """
+        key = name.lower()
+        if self._raw.get(key) != raw:
+            self._raw[key] = raw
+            self._typed.pop(key, None)
+            self.version += 1
+        self._names[key] = name
+        self._updated_ns[key] = ticks_ns() if now is None else now
+        self.stale.discard(key)
+
+    def ingest(self, lines) -> int:
+        """
+        Take in the `$x=val` lines of a dump, eg. the `Response.lines` of `$S`, skipping any
+        other lines.
+
+        Returns:
+            number of settings read
+        """
+        now = ticks_ns()
+        count = 0
+        for line in lines:
+            if line.startswith("$"):
+                name, sep, raw = line[1:].partition("=")
+                if sep and name:
+                    self.update(name, raw, now)
+                    count += 1
+        return count
+
+    def get(self, name: str, default=None):
+        """
+        Value of a setting, converted with `typed_value`, or `default` if it isn't known.
+        """
+        key = setting_key(name)
+        if key in self._typed:
+            return self._typed[key]
+        raw = self._raw.get(key)
+        if raw is None:
+            return default
+        value = self._typed[key] = typed_value(raw)
+        return value
+
+    def raw(self, name: str) -> str | None:
+        """
+        Value of a setting as sent by the controller, `None` if it isn't known.
+        """
+        return self._raw.get(setting_key(name))
+
+    def age_ms(self, name: str) -> float | None:
+        """
+        Time since the value of a setting was received, `None` if it never was.
+        """
+        updated_ns = self._updated_ns.get(setting_key(name))
+        return None if updated_ns is None else (ticks_ns() - updated_ns) / 1_000_000
+
+    def is_stale(self, name: str) -> bool:
+        return setting_key(name) in self.stale
+
+    def invalidate(self, name: str | None = None) -> None:
+        """
+        Mark a setting, or every setting, as stale, to be read again by `refresh`.
+        """
+        if name is None:
+            self.stale.update(self._raw)
+        else:
+            self.stale.add(setting_key(name))
+
+    def items(self):
+        """
+        `(name, value)` of every setting, names as sent by the controller.
+        """
+        for key in self._raw:
+            yield self._names[key], self.get(key)
+
+    def __contains__(self, name: str) -> bool:
+        return setting_key(name) in self._raw
+
+    def __len__(self) -> int:
+        return len(self._raw)
+
+    def _send(self, command: str):
+        if self._fluidnc is None:
+            raise RuntimeError("settings cache isn't attached, see FluidNC.enable_settings")
+        return self._fluidnc.send_command(command)
+
+    def load(self, command: str = "$S") -> 'CommandFuture':
+        """
+        Ask the controller for every setting, `$S` for the named ones or `$$` for the
+        numbered ones.
+
+        Returns:
+            `CommandFuture` of the dump, resolved once every setting is in the cache
+        """
+        return self._send(command)
+
+    def set(self, name: str, value) -> 'CommandFuture':
+        """
+        Write a setting, then read it back so the cache holds the value the controller
+        actually kept. The setting is stale until it is read back.
+
+        Returns:
+            `CommandFuture` of the write
+        """
+        name = name.strip().lstrip("$")
+        key = name.lower()
+        self._names.setdefault(key, name)
+        self.stale.add(key)
+        future = self._send(f"${name}={value}")
+        self._send(f"${name}")
+        return future
+
+    def refresh(self, names=None) -> list:
+        """
+        Read back `names`, or every stale setting, leaving the rest of the cache as is.
+
+        Returns:
+            `CommandFuture` of each setting read
+        """
+        keys = self.stale if names is None else [setting_key(name) for name in names]
+        return [self._send("$" + self._names.get(key, key)) for key in list(keys)]
+
+    def attach(self, fluidnc) -> None:
+        cache = self
+        self._fluidnc = fluidnc
+        dispatched = "handle_variable" in fluidnc.require_handlers(["handle_variable"])
+
+        def caching(name, handler):
+            def handle_variable(variable, value):
+                cache.update(variable, value)
+                if dispatched:
+                    handler(variable, value)
+            return handle_variable
+
+        self._wrapped = wrap_methods(fluidnc, ['handle_variable'], caching)
+
+    def detach(self, fluidnc) -> None:
+        restore_methods(fluidnc, self._wrapped)
+        self._wrapped = dict()
+        self._fluidnc = None
+        fluidnc.release_handlers(["handle_variable"])
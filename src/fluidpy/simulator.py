@@ -0,0 +1,553 @@
+"""
+A simulated FluidNC controller, for exercising `fluidpy` without hardware.
+
+In-process, connect through `SimulatorInterface`:
+
+```python
+io = SimulatorInterface(report_interval=200)
+fnc = MyFluidExpander(io)
+fnc.listen()
+```
+
+Or run it on a pseudo-terminal and point a serial interface at the printed device:
+
+    python -m fluidpy.simulator --link /tmp/fluidnc --pin io.1=out --pin io.2=in,pu
+"""
+from fluidpy.fluidnc import BufferInterface, RealtimeCommand, ticks_ns
+
+BANNER = "Grbl 4.0 [FluidNC v4.0.0 (sim) '$' for help]"
+VERSION = "[VER:4.0.0 FluidNC sim:]"
+HELP = "[HLP:$$ $+ $# $S $L $G $I $N $x=val $Nx=line $J=line $SLP $C $X $H $F $E=err ~ ! ? ctrl-x]"
+
+DEFAULT_SETTINGS = {
+    "Report/Interval": "0",
+    "Config/Filename": "config.yaml",
+    "Message/Level": "Info",
+    "Hostname": "fluidnc-sim",
+    "N0": "",
+    "N1": "",
+}
+
+AXES = "XYZABC"
+# words accepted on a g-code line
+GCODE_LETTERS = "GMXYZABCFSTPNIJKLRHDEQ"
+
+# error and alarm codes, as numbered by GRBL
+ERROR_NO_LETTER = 1
+ERROR_BAD_NUMBER = 2
+ERROR_INVALID_STATEMENT = 3
+ERROR_ALARM_LOCK = 9
+ERROR_UNSUPPORTED = 20
+ALARM_RESET_WHILE_MOVING = 3
+
+
+class Block:
+
+    __slots__ = ("start", "target", "duration_ns", "finish_ns", "feed", "jog")
+    def __init__(self, start: list, target: list, duration_ns: int, finish_ns: int, feed: float, jog: bool):
+        self.start = start
+        self.target = target
+        self.duration_ns = duration_ns
+        self.finish_ns = finish_ns
+        self.feed = feed
+        self.jog = jog
+
+
+class SimulatedController:
+    """
+    Models enough of a FluidNC controller to test a channel client end to end:
+
+    - the start-up banner, followed by the expander handshake: `[EXP:ID]`, answered with
+      `(EXP,<name>)`, then an `[INI:<pin>=<mode>]` line for each configured pin, which the
+      client acknowledges with `PIN_ACK` or `PIN_NAK`; outputs set with `set_output` and
+      input changes reported by the client, recorded in `inputs` and `pin_changes`
+    - a receive buffer of `rx_buffer_size` bytes (anything sent while it is full is lost
+      and counted in `rx_overflows`), from which lines are taken once the planner has room
+    - `ok` once a line is accepted and the planner has room for the next one, so the line
+      filling the planner is answered when a block finishes; `error:N` for lines it can't parse
+    - a planner of `planner_blocks` blocks, each motion line taking `block_ms` to execute
+    - status reports every `$Report/Interval` ms and on `?`, feed hold, cycle start, soft
+      reset and jog cancel
+    - `$$`, `$I`, `$G`, `$X`, `$H`, `$J=`, setting queries and changes
+    - alarms, raised with `alarm` or by resetting while moving, which lock out g-code
+      until `$X` or `$H`
+
+    Time is read from `clock` (nanoseconds), so tests can run it in virtual time.
+    """
+
+    def __init__(self, rx_buffer_size: int = 128, planner_blocks: int = 16, block_ms: float = 2.0,
+                 report_interval: int = 0, pins: dict | None = None, settings: dict | None = None,
+                 clock=ticks_ns) -> None:
+        """
+        Parameters:
+            rx_buffer_size: size of the receive buffer in bytes
+            planner_blocks: number of motion lines the planner holds
+            block_ms: time taken to execute each motion line
+            report_interval: initial `$Report/Interval` in ms, `0` for no automatic reports
+            pins: expander pins to initialize, eg. `{"io.1": "out", "io.2": "in,pu"}`
+            settings: extra `$` settings, added to `DEFAULT_SETTINGS`
+            clock: function returning the current time in nanoseconds
+        """
+        self.rx_buffer_size = rx_buffer_size
+        self.planner_blocks = planner_blocks
+        self.block_ns = int(block_ms * 1_000_000)
+        self.pins = dict(pins or {})
+        self.settings = dict(DEFAULT_SETTINGS)
+        self.settings.update(settings or {})
+        self.settings["Report/Interval"] = str(report_interval)
+        self.clock = clock
+
+        self.expander_id = None
+        """name sent by the client in reply to `[EXP:ID]`"""
+        self.pin_acks = []
+        """`PIN_ACK` / `PIN_NAK` bytes received, in order"""
+        self.inputs = dict()
+        """level of each expander input, as last reported by the client"""
+        self.pin_changes = []
+        """`(pin, level)` for every expander input change received, in order"""
+        self.received = []
+        """lines taken from the receive buffer, in order"""
+        self.rx_overflows = 0
+        """bytes lost because the receive buffer was full"""
+        self.reports = 0
+        """status reports sent"""
+        self.last_emitted_ns = 0
+        """time at which the line most recently read by the client was sent"""
+
+        self.position = [0.0] * len(AXES)
+        self.wco = [0.0] * len(AXES)
+        self.overrides = [100, 100, 100]
+        self._output = []
+        self._utf8_lead = None
+        self.start()
+
+    # ------------------------------------------
+
+    def start(self) -> None:
+        """
+        (Re)start the controller, as at power on or after a soft reset.
+        """
+        now = self.clock()
+        self._rx = bytearray()
+        self._planner = []
+        self._hold_ns = None
+        self._alarm = None
+        self._door = False
+        self._relative = False
+        self._feed = 0.0
+        self._spindle = 0.0
+        self._line_number = 0
+        self._last_report_ns = now
+        self._pending_report = False
+        self._overrides_changed = True
+        self._handshake = False
+        self._ok_held = False   # `ok` of the line that filled the planner, sent when a slot frees
+        self.emit(BANNER)
+        self.emit("[MSG:INFO: FluidNC simulator]")
+        self.emit("[EXP:ID]")
+
+    def receive(self, data: bytes) -> None:
+        """
+        Bytes sent by the client. Realtime commands are acted on as they arrive, anything
+        else goes into the receive buffer.
+        """
+        for byte in data:
+            if self._utf8_lead is not None:
+                self._pin_change(((self._utf8_lead & 0x1F) << 6) | (byte & 0x3F))
+                self._utf8_lead = None
+            elif byte in (0xC4, 0xC5):
+                # first byte of an expander pin change, see `fluidpy.expander`
+                self._utf8_lead = byte
+            elif byte in (RealtimeCommand.PIN_ACK, RealtimeCommand.PIN_NAK):
+                self.pin_acks.append(byte)
+            elif byte == RealtimeCommand.STATUS_REPORT:
+                self._pending_report = True
+            elif byte == RealtimeCommand.FEED_HOLD:
+                self.feed_hold()
+            elif byte == RealtimeCommand.CYCLE_START:
+                self.cycle_start()
+            elif byte == RealtimeCommand.SOFT_RESET:
+                self.soft_reset()
+            elif byte == RealtimeCommand.SAFETY_DOOR:
+                self._door = True
+                self.feed_hold()
+            elif byte == RealtimeCommand.JOG_CANCEL:
+                self._jog_cancel()
+            elif byte >= 0x80:
+                self._override(byte)
+            elif len(self._rx) >= self.rx_buffer_size:
+                self.rx_overflows += 1
+            else:
+                self._rx.append(byte)
+
+    def _pin_change(self, code: int) -> None:
+        level = code >= 0x140
+        pin = code - (0x140 if level else 0x100)
+        self.inputs[pin] = level
+        self.pin_changes.append((pin, level))
+
+    def set_output(self, name: str, value) -> None:
+        """
+        Set an expander output, eg. `set_output("io.1", 1)`.
+        """
+        self.emit(f"[MSG:SET: {name}={value}]")
+
+    def run(self) -> None:
+        """
+        Advance the simulation to the current time: finish planned blocks, take lines from
+        the receive buffer and send status reports that are due.
+        """
+        now = self.clock()
+        if self._hold_ns is None:
+            while self._planner and self._planner[0].finish_ns <= now:
+                self.position = list(self._planner.pop(0).target)
+        self._release_ok()
+        self._read_lines(now)
+
+        interval_ns = int(self.settings.get("Report/Interval", "0") or 0) * 1_000_000
+        if self._pending_report or (interval_ns and now - self._last_report_ns >= interval_ns):
+            self._pending_report = False
+            self._last_report_ns = now
+            self.emit(self.status_report(now))
+
+    def read_line(self) -> bytes:
+        """
+        Next line sent to the client, or `b""` if there is none.
+        """
+        if not self._output:
+            return b""
+        emitted_ns, line = self._output.pop(0)
+        self.last_emitted_ns = emitted_ns
+        return line
+
+    def emit(self, line: str) -> None:
+        self._output.append((self.clock(), line.encode() + b"\r\n"))
+
+    # ------------------------------------------
+
+    def alarm(self, code: int) -> None:
+        """
+        Raise an alarm: motion stops, queued lines are discarded and g-code is refused
+        until the alarm is cleared with `$X` or `$H`.
+        """
+        self._planner = []
+        self._release_ok()
+        self._rx = bytearray()
+        self._hold_ns = None
+        self._alarm = code
+        self.emit(f"ALARM:{code}")
+
+    def feed_hold(self) -> None:
+        if self._hold_ns is None and self._planner:
+            self._hold_ns = self.clock()
+        self._pending_report = True
+
+    def cycle_start(self) -> None:
+        if self._hold_ns is not None:
+            paused = self.clock() - self._hold_ns
+            for block in self._planner:
+                block.finish_ns += paused
+            self._hold_ns = None
+        self._door = False
+        self._pending_report = True
+
+    def soft_reset(self) -> None:
+        moving = bool(self._planner)
+        if moving:
+            self.position = self.current_position(self.clock())
+        self.start()
+        if moving:
+            self.alarm(ALARM_RESET_WHILE_MOVING)
+        self._pending_report = True
+
+    def state(self, now: int) -> str:
+        if self._alarm is not None:
+            return "Alarm"
+        if self._door:
+            return "Door:0"
+        if self._hold_ns is not None:
+            return "Hold:0"
+        if self._planner:
+            return "Jog" if self._planner[0].jog else "Run"
+        return "Idle"
+
+    def current_position(self, now: int) -> list:
+        if not self._planner:
+            return list(self.position)
+        block = self._planner[0]
+        if self._hold_ns is not None:
+            now = self._hold_ns
+        remaining = (block.finish_ns - now) / block.duration_ns if block.duration_ns else 0
+        done = 1 - min(max(remaining, 0), 1)
+        return [start + (target - start) * done for start, target in zip(block.start, block.target)]
+
+    def status_report(self, now: int) -> str:
+        state = self.state(now)
+        moving = state in ("Run", "Jog")
+        fields = [
+            state,
+            "MPos:" + ",".join(f"{value:.3f}" for value in self.current_position(now)[:3]),
+            f"FS:{self._planner[0].feed if moving else 0:g},{self._spindle:g}",
+            f"Bf:{self.planner_blocks - len(self._planner)},{self.rx_buffer_size - len(self._rx)}",
+        ]
+        if self._line_number:
+            fields.append(f"Ln:{self._line_number}")
+        if self.reports % 10 == 0:
+            fields.append("WCO:" + ",".join(f"{value:.3f}" for value in self.wco[:3]))
+        if self._overrides_changed:
+            fields.append("Ov:{},{},{}".format(*self.overrides))
+            self._overrides_changed = False
+        self.reports += 1
+        return "<" + "|".join(fields) + ">"
+
+    # ------------------------------------------
+
+    def _read_lines(self, now: int) -> None:
+        if not self._handshake and self._rx.startswith(b"(EXP,"):
+            end = self._rx.find(b")")
+            if end < 0:
+                return
+            self.expander_id = self._rx[5:end].decode()
+            del self._rx[:end + 1]
+            self._handshake = True
+            for name, mode in self.pins.items():
+                self.emit(f"[INI:{name}={mode}]")
+
+        while len(self._planner) < self.planner_blocks:
+            end = self._rx.find(b"\n")
+            if end < 0:
+                return
+            line = self._rx[:end].decode().strip()
+            del self._rx[:end + 1]
+            if line:
+                self.received.append(line)
+                self._execute(line, now)
+
+    def _execute(self, line: str, now: int) -> None:
+        if line.startswith("$") and not line.startswith("$J="):
+            self._system_command(line[1:])
+            return
+        if self._alarm is not None:
+            self.emit(f"error:{ERROR_ALARM_LOCK}")
+            return
+        jog = line.startswith("$J=")
+        words = self._parse_words(line[3:] if jog else line)
+        if isinstance(words, int):
+            self.emit(f"error:{words}")
+            return
+        self._plan(words, now, jog)
+        if len(self._planner) < self.planner_blocks:
+            self.emit("ok")
+        else:
+            self._ok_held = True
+
+    def _release_ok(self) -> None:
+        if self._ok_held and len(self._planner) < self.planner_blocks:
+            self._ok_held = False
+            self.emit("ok")
+
+    def _system_command(self, command: str) -> None:
+        if command == "":
+            self.emit(HELP)
+        elif command in ("$", "S"):
+            for name, value in self.settings.items():
+                self.emit(f"${name}={value}")
+        elif command == "I":
+            self.emit(VERSION)
+        elif command == "G":
+            motion = "G91" if self._relative else "G90"
+            self.emit(f"[GC:G0 G54 G17 G21 {motion} G94 M5 M9 T0 F{self._feed:g} S{self._spindle:g}]")
+        elif command == "X":
+            if self._alarm is not None:
+                self._alarm = None
+                self.emit("[MSG:Caution: Unlocked]")
+        elif command == "H":
+            self._alarm = None
+            self.position = [0.0] * len(AXES)
+        elif "=" in command:
+            name, value = command.split("=", 1)
+            if name not in self.settings:
+                self.emit(f"error:{ERROR_INVALID_STATEMENT}")
+                return
+            self.settings[name] = value
+        elif command in self.settings:
+            self.emit(f"${command}={self.settings[command]}")
+        else:
+            self.emit(f"error:{ERROR_INVALID_STATEMENT}")
+            return
+        self.emit("ok")
+
+    @staticmethod
+    def _parse_words(line: str):
+        # (letter, value) pairs of a g-code line, or an error code
+        if ";" in line:
+            line = line[:line.index(";")]
+        while "(" in line and ")" in line:
+            line = line[:line.index("(")] + line[line.index(")") + 1:]
+        line = line.replace(" ", "").upper()
+        words = []
+        i = 0
+        while i < len(line):
+            letter = line[i]
+            if not letter.isalpha():
+                return ERROR_NO_LETTER
+            if letter not in GCODE_LETTERS:
+                return ERROR_UNSUPPORTED
+            end = i + 1
+            while end < len(line) and (line[end].isdigit() or line[end] in ".-+"):
+                end += 1
+            try:
+                words.append((letter, float(line[i + 1:end])))
+            except ValueError:
+                return ERROR_BAD_NUMBER
+            i = end
+        return words
+
+    def _plan(self, words: list, now: int, jog: bool) -> None:
+        start = list(self._planner[-1].target if self._planner else self.position)
+        target = list(start)
+        relative = self._relative
+        feed = self._feed
+        moves = False
+        for letter, value in words:
+            if letter == "G" and value in (90, 91):
+                relative = value == 91
+                if not jog:
+                    self._relative = relative
+            elif letter == "F":
+                feed = value
+                if not jog:
+                    self._feed = value
+            elif letter == "S":
+                self._spindle = value
+            elif letter == "N":
+                self._line_number = int(value)
+            elif letter in AXES:
+                axis = AXES.index(letter)
+                target[axis] = target[axis] + value if relative else value
+                moves = True
+        if not moves:
+            return
+        begin = self._planner[-1].finish_ns if self._planner else now
+        self._planner.append(Block(start, target, self.block_ns, max(begin, now) + self.block_ns, feed, jog))
+
+    def _jog_cancel(self) -> None:
+        if self._planner and self._planner[0].jog:
+            self.position = self.current_position(self.clock())
+            self._planner = [block for block in self._planner if not block.jog]
+            self._pending_report = True
+
+    def _override(self, byte: int) -> None:
+        feed, rapid, spindle = self.overrides
+        if byte == RealtimeCommand.FEED_OVR_RESET:
+            feed = 100
+        elif byte in (RealtimeCommand.FEED_OVR_COARSE_PLUS, RealtimeCommand.FEED_OVR_COARSE_MINUS,
+                      RealtimeCommand.FEED_OVR_FINE_PLUS, RealtimeCommand.FEED_OVR_FINE_MINUS):
+            step = {RealtimeCommand.FEED_OVR_COARSE_PLUS: 10, RealtimeCommand.FEED_OVR_COARSE_MINUS: -10,
+                    RealtimeCommand.FEED_OVR_FINE_PLUS: 1, RealtimeCommand.FEED_OVR_FINE_MINUS: -1}[byte]
+            feed = min(max(feed + step, 10), 200)
+        elif byte == RealtimeCommand.RAPID_OVR_RESET:
+            rapid = 100
+        elif byte == RealtimeCommand.RAPID_OVR_MEDIUM:
+            rapid = 50
+        elif byte == RealtimeCommand.RAPID_OVR_LOW:
+            rapid = 25
+        elif byte == RealtimeCommand.SPINDLE_OVR_RESET:
+            spindle = 100
+        elif byte in (RealtimeCommand.SPINDLE_OVR_COARSE_PLUS, RealtimeCommand.SPINDLE_OVR_COARSE_MINUS,
+                      RealtimeCommand.SPINDLE_OVR_FINE_PLUS, RealtimeCommand.SPINDLE_OVR_FINE_MINUS):
+            step = {RealtimeCommand.SPINDLE_OVR_COARSE_PLUS: 10, RealtimeCommand.SPINDLE_OVR_COARSE_MINUS: -10,
+                    RealtimeCommand.SPINDLE_OVR_FINE_PLUS: 1, RealtimeCommand.SPINDLE_OVR_FINE_MINUS: -1}[byte]
+            spindle = min(max(spindle + step, 10), 200)
+        else:
+            return
+        if [feed, rapid, spindle] != self.overrides:
+            self.overrides = [feed, rapid, spindle]
+            self._overrides_changed = True
+
+
+class SimulatorInterface(BufferInterface):
+    """
+    In-memory connection to a `SimulatedController`. The controller is advanced every
+    time the client reads.
+    """
+
+    def __init__(self, controller: SimulatedController | None = None, **kwargs) -> None:
+        """
+        Parameters:
+            controller: controller to connect to, or `None` to create one with `kwargs`
+        """
+        self.controller = controller or SimulatedController(**kwargs)
+
+    def write(self, data: bytes) -> int:
+        self.controller.receive(bytes(data))
+        return len(data)
+
+    def readline(self) -> bytes:
+        self.controller.run()
+        return self.controller.read_line()
+
+    def read(self, n: int) -> bytes:
+        return self.readline()[:n]
+
+
+def serve_pty(controller: SimulatedController, link: str | None = None, poll_ms: float = 1.0,
+              stop=None) -> None:
+    """
+    Run the controller on a pseudo-terminal until interrupted.
+
+    Parameters:
+        controller: the simulated controller
+        link: path of a symlink to create to the terminal device
+        poll_ms: how often the controller is advanced when nothing is received
+        stop: `threading.Event` to stop serving (closing the terminal) from another thread
+    """
+    import os
+    import select
+    import tty
+
+    master, slave = os.openpty()
+    tty.setraw(slave)
+    device = os.ttyname(slave)
+    if link:
+        if os.path.lexists(link):
+            os.remove(link)
+        os.symlink(device, link)
+    print(f"FluidNC simulator on {link or device}")
+    try:
+        while stop is None or not stop.is_set():
+            readable, _, _ = select.select([master], [], [], poll_ms / 1000)
+            if readable:
+                controller.receive(os.read(master, 1024))
+            controller.run()
+            while line := controller.read_line():
+                os.write(master, line)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if link and os.path.islink(link):
+            os.remove(link)
+        os.close(master)
+        os.close(slave)
+
+
+def main(argv: list | None = None) -> None:
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Simulated FluidNC controller on a pseudo-terminal")
+    parser.add_argument("--link", help="create a symlink to the terminal device at this path")
+    parser.add_argument("--rx-buffer", type=int, default=128, help="receive buffer size in bytes")
+    parser.add_argument("--planner-blocks", type=int, default=16)
+    parser.add_argument("--block-ms", type=float, default=2.0, help="execution time of each motion line")
+    parser.add_argument("--report-interval", type=int, default=0, help="initial $Report/Interval in ms")
+    parser.add_argument("--pin", action="append", default=[], help="expander pin, eg. io.1=out (repeatable)")
+    args = parser.parse_args(argv)
+
+    pins = dict(pin.split("=", 1) for pin in args.pin)
+    controller = SimulatedController(args.rx_buffer, args.planner_blocks, args.block_ms,
+                                     args.report_interval, pins)
+    serve_pty(controller, args.link)
+
+
+if __name__ == "__main__":
+    main()
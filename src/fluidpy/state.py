@@ -0,0 +1,187 @@
+from fluidpy.fluidnc import Position, ticks_ns
+from fluidpy.chain import wrap_methods, restore_methods
+
+# handlers whose arguments are kept in the machine state
+STATE_HANDLERS = (
+    'handle_machine_state', 'handle_position', 'handle_work_position', 'handle_feed', 'handle_spindle',
+    'handle_overrides', 'handle_triggers', 'handle_accessory_state', 'handle_line_number',
+    'handle_buffer_size', 'handle_mode', 'handle_alarm',
+)
+
+
+def copy_position(position: Position) -> Position:
+    return Position(position.x.clone(), position.y.clone(), position.z.clone(),
+                    position.a.clone(), position.b.clone(), position.c.clone())
+
+
+class MachineSnapshot:
+    """
+    Everything known about the machine after a message from the controller. Snapshots
+    are never changed once published, so they can be read from any thread.
+    """
+
+    __slots__ = ("version", "updated_ns", "state", "mpos", "wpos", "wco", "feed", "spindle", "overrides",
+                 "pins", "accessories", "line_number", "buffer", "mode", "alarm")
+    def __init__(self, version: int = 0, updated_ns: int = 0, state: str | None = None,
+                 mpos: Position | None = None, wpos: Position | None = None, wco: Position | None = None,
+                 feed=None, spindle=None,
+                 overrides: tuple | None = None, pins: str = "", accessories: str = "",
+                 line_number: int | None = None, buffer: tuple | None = None, mode=None,
+                 alarm: str | None = None):
+        self.version = version
+        """incremented for every snapshot published"""
+        self.updated_ns = updated_ns
+        """`ticks_ns` when the snapshot was published"""
+        self.state = state
+        """machine state, eg. `Idle` or `Hold:0`"""
+        self.mpos = mpos
+        """machine position"""
+        self.wpos = wpos
+        """work position, once the work coordinate offset is known"""
+        self.wco = wco
+        """work coordinate offset, from the latest report that included one"""
+        self.feed = feed
+        self.spindle = spindle
+        self.overrides = overrides
+        """(feed, rapid, spindle) override percentages, from the latest report that included them"""
+        self.pins = pins
+        """pins triggered in the latest report, eg. `XP`"""
+        self.accessories = accessories
+        """accessory state in the latest report, eg. `SF`"""
+        self.line_number = line_number
+        self.buffer = buffer
+        """(planner blocks, receive buffer bytes) free in the latest report"""
+        self.mode = mode
+        """`Mode` from the latest `[GC:]` report"""
+        self.alarm = alarm
+        """code of the alarm raised, until the machine leaves the `Alarm` state"""
+
+    def __repr__(self) -> str:
+        return f"MachineSnapshot(version={self.version}, state={self.state}, mpos={self.mpos})"
+
+
+class MachineState:
+    """
+    Machine state kept up to date from the messages processed by a `FluidNC` instance.
+    Attach with `FluidNC.enable_machine_state`.
+
+    The parser fills in a working copy field by field; once a message has been processed
+    a new `MachineSnapshot` is built from it and published by replacing a single
+    reference. `snapshot()` therefore never returns a half-updated report and needs no
+    lock, and `version` tells a reader whether anything changed since it last looked.
+    """
+
+    def __init__(self) -> None:
+        self._working = dict()
+        self._dirty = False
+        self._copy_values = False
+        self._published = MachineSnapshot()
+        self._wrapped = dict()
+
+    @property
+    def version(self) -> int:
+        return self._published.version
+
+    def snapshot(self) -> MachineSnapshot:
+        """
+        The state as of the latest message processed.
+        """
+        return self._published
+
+    def set(self, field: str, value) -> None:
+        self._working[field] = value
+        self._dirty = True
+
+    def publish(self) -> None:
+        if not self._dirty:
+            return
+        self._dirty = False
+        working = self._working
+        previous = self._published
+        snapshot = MachineSnapshot(previous.version + 1, ticks_ns())
+        for field in MachineSnapshot.__slots__[2:]:
+            setattr(snapshot, field, working.get(field, getattr(previous, field)))
+        self._published = snapshot
+
+    def begin_report(self) -> None:
+        # fields left out of a status report when nothing is active
+        self._working["pins"] = ""
+        self._working["accessories"] = ""
+
+    def attach(self, fluidnc) -> None:
+        machine = self
+        dispatched = fluidnc.require_handlers(STATE_HANDLERS)
+        # with `reuse_objects` positions and decimals are updated in place, so they are copied
+        self._copy_values = fluidnc.reuse_objects
+
+        def record(name, handler):
+            call = handler if name in dispatched else None
+
+            if name == 'handle_position':
+                def handle(kind, position):
+                    if kind != 'WPos':
+                        field = 'mpos' if kind == 'MPos' else 'wco'
+                        machine.set(field, copy_position(position) if machine._copy_values else position)
+                    if call:
+                        call(kind, position)
+            elif name == 'handle_work_position':
+                def handle(position):
+                    # derived from the work position when the controller reports `WPos`
+                    mpos = fluidnc.machine_position
+                    if machine._copy_values:
+                        position = copy_position(position)
+                        mpos = None if mpos is None else copy_position(mpos)
+                    machine.set('wpos', position)
+                    machine.set('mpos', mpos)
+                    if call:
+                        call(position)
+            elif name == 'handle_overrides':
+                def handle(feed, rapid, spindle):
+                    if machine._copy_values:
+                        feed, rapid, spindle = feed.clone(), rapid.clone(), spindle.clone()
+                    machine.set('overrides', (feed, rapid, spindle))
+                    if call:
+                        call(feed, rapid, spindle)
+            elif name == 'handle_machine_state':
+                def handle(state):
+                    if machine._working.get('state') == 'Alarm' and state != 'Alarm':
+                        machine.set('alarm', None)
+                    machine.set('state', state)
+                    if call:
+                        call(state)
+            elif name == 'handle_buffer_size':
+                def handle(*sizes):
+                    machine.set('buffer', sizes)
+                    if call:
+                        call(*sizes)
+            else:
+                field = {
+                    'handle_feed': 'feed', 'handle_spindle': 'spindle',
+                    'handle_triggers': 'pins', 'handle_accessory_state': 'accessories',
+                    'handle_line_number': 'line_number', 'handle_mode': 'mode', 'handle_alarm': 'alarm',
+                }[name]
+                copy = machine._copy_values and name in ('handle_feed', 'handle_spindle')
+
+                def handle(value):
+                    machine.set(field, value.clone() if copy else value)
+                    if call:
+                        call(value)
+            return handle
+
+        def publishing(name, process):
+            def process_message(message):
+                if message.startswith("<"):
+                    machine.begin_report()
+                try:
+                    return process(message)
+                finally:
+                    machine.publish()
+            return process_message
+
+        self._wrapped = wrap_methods(fluidnc, STATE_HANDLERS, record)
+        self._wrapped.update(wrap_methods(fluidnc, ["process_message"], publishing))
+
+    def detach(self, fluidnc) -> None:
+        restore_methods(fluidnc, self._wrapped)
+        self._wrapped = dict()
+        fluidnc.release_handlers(STATE_HANDLERS)
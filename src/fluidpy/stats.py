@@ -0,0 +1,354 @@
+from fluidpy.chain import wrap_methods, restore_methods
+from fluidpy.fluidnc import ticks_ns, logging, MESSAGE_KINDS
+
+logger = logging.getLogger(__name__)
+
+
+def handler_names(fluidnc) -> list:
+    # only the handlers `process_message` will call, see `FluidNC.update_dispatch_plan`
+    dispatch = fluidnc._current_dispatch()
+    return [name for name in dir(fluidnc) if name.startswith("handle_") and name in dispatch]
+
+
+class Histogram:
+    """
+    Fixed-bucket latency histogram. Recording a value only bumps a counter, so it can be
+    left running on a microcontroller.
+    """
+
+    # upper edge of each bucket in nanoseconds (1-2-5 steps from 1us to 100ms), the last
+    # bucket counts everything slower
+    EDGES_NS = (
+        1_000, 2_000, 5_000, 10_000, 20_000, 50_000, 100_000, 200_000, 500_000,
+        1_000_000, 2_000_000, 5_000_000, 10_000_000, 20_000_000, 50_000_000, 100_000_000,
+    )
+
+    def __init__(self) -> None:
+        self.counts = [0] * (len(self.EDGES_NS) + 1)
+        self.count = 0
+        self.total_ns = 0
+        self.max_ns = 0
+
+    def record(self, ns: int) -> None:
+        index = 0
+        for edge in self.EDGES_NS:
+            if ns <= edge:
+                break
+            index += 1
+        self.counts[index] += 1
+        self.count += 1
+        self.total_ns += ns
+        if ns > self.max_ns:
+            self.max_ns = ns
+
+    def percentile(self, percent: float) -> int:
+        """
+        Upper bucket edge (in ns) below which `percent` of the recorded values fall, or
+        `max_ns` when that lands in the last bucket.
+        """
+        if not self.count:
+            return 0
+        target = self.count * percent / 100
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= target:
+                return self.EDGES_NS[index] if index < len(self.EDGES_NS) else self.max_ns
+        return self.max_ns
+
+    def snapshot(self) -> dict:
+        return {
+            "count": self.count,
+            "mean_ns": self.total_ns // self.count if self.count else 0,
+            "max_ns": self.max_ns,
+            "p50_ns": self.percentile(50),
+            "p99_ns": self.percentile(99),
+            "edges_ns": self.EDGES_NS,
+            "counts": list(self.counts),
+        }
+
+
+class KindStats:
+
+    __slots__ = ("count", "parse", "dispatch")
+    def __init__(self) -> None:
+        self.count = 0
+        self.parse = Histogram()
+        """time spent parsing, excluding the `handle_*` methods"""
+        self.dispatch = Histogram()
+        """time spent in `handle_*` methods"""
+
+
+class MessageStats:
+    """
+    Counts messages per kind and records how long each takes to parse and dispatch. Attach
+    with `FluidNC.enable_stats`, which swaps in timed versions of `process_message` and the
+    `handle_*` methods on the instance; nothing is timed (or slowed down) while detached.
+    """
+
+    def __init__(self) -> None:
+        self.kinds = {kind: KindStats() for kind in MESSAGE_KINDS}
+        self.started_ns = ticks_ns()
+        self._dispatch_ns = 0
+        self._wrapped = dict()
+
+    def reset(self) -> None:
+        for kind in MESSAGE_KINDS:
+            self.kinds[kind] = KindStats()
+        self.started_ns = ticks_ns()
+
+    def attach(self, fluidnc) -> None:
+        stats = self
+        handlers = handler_names(fluidnc)
+
+        def timed(name, handler):
+            def timed_handler(*args):
+                start = ticks_ns()
+                try:
+                    return handler(*args)
+                finally:
+                    stats._dispatch_ns += ticks_ns() - start
+            return timed_handler
+
+        def timed_process(name, process):
+            def process_message(message):
+                stats._dispatch_ns = 0
+                kind = "unknown"
+                start = ticks_ns()
+                try:
+                    kind = process(message)
+                    return kind
+                finally:
+                    elapsed = ticks_ns() - start
+                    kind_stats = stats.kinds[kind]
+                    kind_stats.count += 1
+                    kind_stats.parse.record(elapsed - stats._dispatch_ns)
+                    kind_stats.dispatch.record(stats._dispatch_ns)
+            return process_message
+
+        self._wrapped = wrap_methods(fluidnc, handlers, timed)
+        self._wrapped.update(wrap_methods(fluidnc, ["process_message"], timed_process))
+
+    def detach(self, fluidnc) -> None:
+        restore_methods(fluidnc, self._wrapped)
+        self._wrapped = dict()
+
+    def snapshot(self) -> dict:
+        elapsed = (ticks_ns() - self.started_ns) / 1_000_000_000
+        kinds = dict()
+        for kind, kind_stats in self.kinds.items():
+            if kind_stats.count:
+                kinds[kind] = {
+                    "count": kind_stats.count,
+                    "rate": kind_stats.count / elapsed if elapsed else 0,
+                    "parse": kind_stats.parse.snapshot(),
+                    "dispatch": kind_stats.dispatch.snapshot(),
+                }
+        return {
+            "elapsed_s": elapsed,
+            "messages": sum(kind_stats.count for kind_stats in self.kinds.values()),
+            "kinds": kinds,
+        }
+
+
+class HandlerTiming:
+
+    __slots__ = ("calls", "total_ns", "max_ns", "slow_calls")
+    def __init__(self) -> None:
+        self.calls = 0
+        self.total_ns = 0
+        self.max_ns = 0
+        self.slow_calls = 0
+
+
+# handler budget while status reports are off (`report_interval` of `0`) and no `budget_ms`
+# is given, a quarter of the default report interval
+DEFAULT_BUDGET_MS = 50.0
+
+
+class HandlerTimer:
+    """
+    Times every call to the `handle_*` methods, keeping per-handler totals and maxima and
+    warning when a call takes longer than the budget. Attach with
+    `FluidNC.enable_handler_timing`; nothing is timed while detached.
+    """
+
+    def __init__(self, budget_ms: float | None = None, budget_fraction: float = 0.25) -> None:
+        """
+        Parameters:
+            budget_ms: longest a handler may take, `None` to use a fraction of the
+                connection's `report_interval`, or `DEFAULT_BUDGET_MS` while reports are off
+            budget_fraction: fraction of the report interval used when `budget_ms` is `None`
+        """
+        self.budget_ms = budget_ms
+        self.budget_fraction = budget_fraction
+        self.timings = dict()
+        self._wrapped = dict()
+
+    def budget_ns(self, fluidnc) -> int:
+        if self.budget_ms is not None:
+            return int(self.budget_ms * 1_000_000)
+        if not fluidnc.report_interval:
+            return int(DEFAULT_BUDGET_MS * 1_000_000)
+        return int(fluidnc.report_interval * self.budget_fraction * 1_000_000)
+
+    def reset(self) -> None:
+        for name in self.timings:
+            self.timings[name] = HandlerTiming()
+
+    def attach(self, fluidnc) -> None:
+        timer = self
+
+        def timed(name, handler):
+            timer.timings[name] = HandlerTiming()
+            def timed_handler(*args):
+                start = ticks_ns()
+                try:
+                    return handler(*args)
+                finally:
+                    elapsed = ticks_ns() - start
+                    timing = timer.timings[name]
+                    timing.calls += 1
+                    timing.total_ns += elapsed
+                    budget = timer.budget_ns(fluidnc)
+                    if elapsed > budget:
+                        timing.slow_calls += 1
+                        if elapsed > timing.max_ns:
+                            logger.warning(f"slow handler {name}: {elapsed / 1_000_000:.1f} ms "
+                                           f"(budget {budget / 1_000_000:.1f} ms)")
+                    if elapsed > timing.max_ns:
+                        timing.max_ns = elapsed
+            return timed_handler
+
+        self._wrapped = wrap_methods(fluidnc, handler_names(fluidnc), timed)
+
+    def detach(self, fluidnc) -> None:
+        restore_methods(fluidnc, self._wrapped)
+        self._wrapped = dict()
+
+    def snapshot(self) -> dict:
+        return {
+            name: {
+                "calls": timing.calls,
+                "total_ms": timing.total_ns / 1_000_000,
+                "mean_ms": timing.total_ns / timing.calls / 1_000_000,
+                "max_ms": timing.max_ns / 1_000_000,
+                "slow_calls": timing.slow_calls,
+            }
+            for name, timing in self.timings.items() if timing.calls
+        }
+
+
+class ReportMetrics:
+    """
+    Timestamps every status report and keeps running statistics of the time between reports,
+    compared with the `report_interval` requested from the controller, and of how long each
+    report waits between being read and its handlers finishing. Attach with
+    `FluidNC.enable_report_metrics`, which swaps in timed versions of `read_message` and
+    `process_message` on the instance.
+
+    A report is timestamped when `read_message` returns it (or when `process_message` is
+    called directly); time spent in the OS or UART buffers before that can't be seen here.
+    """
+
+    # smoothing of the running jitter estimate, as for interarrival jitter in RFC 3550
+    JITTER_GAIN = 16
+    # an interval this many times the expected one counts as a late (or missed) report
+    LATE_FACTOR = 1.5
+
+    def __init__(self) -> None:
+        self.reset()
+        self._read_ns = None
+        self._wrapped = dict()
+
+    def reset(self) -> None:
+        self.reports = 0
+        self.last_arrival_ns = None
+        """when the most recent status report was read"""
+        self.intervals = 0
+        self.interval_min_ns = 0
+        self.interval_max_ns = 0
+        self._interval_mean = 0.0
+        self._interval_m2 = 0.0
+        self.jitter_ns = 0.0
+        """running estimate of how far intervals stray from the expected interval"""
+        self.max_deviation_ns = 0
+        self.late = 0
+        self.queueing = Histogram()
+        """time from a report being read to its handlers finishing"""
+
+    def record(self, arrival_ns: int, done_ns: int, expected_ns: int) -> None:
+        self.reports += 1
+        self.queueing.record(done_ns - arrival_ns)
+        last, self.last_arrival_ns = self.last_arrival_ns, arrival_ns
+        if last is None:
+            return
+
+        interval = arrival_ns - last
+        self.intervals += 1
+        if self.intervals == 1 or interval < self.interval_min_ns:
+            self.interval_min_ns = interval
+        if interval > self.interval_max_ns:
+            self.interval_max_ns = interval
+        # Welford's running mean and variance
+        delta = interval - self._interval_mean
+        self._interval_mean += delta / self.intervals
+        self._interval_m2 += delta * (interval - self._interval_mean)
+
+        if expected_ns:
+            deviation = abs(interval - expected_ns)
+            self.jitter_ns += (deviation - self.jitter_ns) / self.JITTER_GAIN
+            if deviation > self.max_deviation_ns:
+                self.max_deviation_ns = deviation
+            if interval > expected_ns * self.LATE_FACTOR:
+                self.late += 1
+
+    def attach(self, fluidnc) -> None:
+        metrics = self
+
+        def timed_read(name, read):
+            def read_message():
+                message = read()
+                metrics._read_ns = ticks_ns()
+                return message
+            return read_message
+
+        def timed_process(name, process):
+            def process_message(message):
+                arrival = metrics._read_ns
+                metrics._read_ns = None
+                if arrival is None:
+                    arrival = ticks_ns()
+                kind = process(message)
+                if kind == "status":
+                    metrics.record(arrival, ticks_ns(), fluidnc.report_interval * 1_000_000)
+                elif kind == "version":
+                    # the controller restarted, the gap since the last report isn't jitter
+                    metrics.last_arrival_ns = None
+                return kind
+            return process_message
+
+        self._wrapped = wrap_methods(fluidnc, ["read_message"], timed_read)
+        self._wrapped.update(wrap_methods(fluidnc, ["process_message"], timed_process))
+
+    def detach(self, fluidnc) -> None:
+        restore_methods(fluidnc, self._wrapped)
+        self._wrapped = dict()
+
+    def snapshot(self, expected_ms: float) -> dict:
+        variance = self._interval_m2 / (self.intervals - 1) if self.intervals > 1 else 0.0
+        return {
+            "reports": self.reports,
+            "expected_interval_ms": expected_ms,
+            "age_ms": (ticks_ns() - self.last_arrival_ns) / 1_000_000 if self.last_arrival_ns is not None else None,
+            "interval_ms": {
+                "mean": self._interval_mean / 1_000_000,
+                "min": self.interval_min_ns / 1_000_000,
+                "max": self.interval_max_ns / 1_000_000,
+                "stddev": variance ** 0.5 / 1_000_000,
+            },
+            "jitter_ms": self.jitter_ns / 1_000_000,
+            "max_deviation_ms": self.max_deviation_ns / 1_000_000,
+            "late": self.late,
+            "queueing": self.queueing.snapshot(),
+        }
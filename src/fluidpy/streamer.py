@@ -0,0 +1,123 @@
+from fluidpy.fluidnc import FluidNC, logging
+
+logger = logging.getLogger(__name__)
+
+
+class Streamer:
+    """
+    Streams a g-code job to the controller using GRBL's character counting protocol: lines
+    are sent as long as they fit in the controller's receive buffer, and each `ok` or `error`
+    frees the bytes of the line it answers. This keeps the controller's planner full instead
+    of waiting for a response before every line.
+
+    Lines are pulled from `lines` only as room is made for them, so a job can be streamed
+    straight from a file without reading it into memory.
+    """
+
+    def __init__(self, fluidnc: FluidNC, lines) -> None:
+        """
+        Parameters:
+            fluidnc: connection to stream the job over
+            lines: iterable of g-code lines
+        """
+        self.fluidnc = fluidnc
+        self._lines = iter(lines)
+        self._line_number = 0
+        self._sent = []             # (line_number, line) waiting for a response
+        self._callback = self._on_response
+        self._exhausted = False
+
+        self.lines_sent = 0
+        """number of lines handed to the connection for sending"""
+        self.lines_completed = 0
+        """number of lines answered with `ok` or `error`"""
+        self.errors = []
+        """`(line_number, line, response)` for every line answered with an error"""
+        self.aborted = False
+        """the controller restarted before the job completed"""
+
+    @staticmethod
+    def clean_line(line: str) -> str:
+        """
+        Strip whitespace and `;` comments from a line so it takes up less of the receive buffer.
+        """
+        index = line.find(";")
+        if index >= 0:
+            line = line[:index]
+        return line.strip()
+
+    @property
+    def done(self) -> bool:
+        """`True` once every line has been answered, or the job was aborted"""
+        return self.aborted or (self._exhausted and not self._sent)
+
+    def start(self) -> None:
+        """
+        Send the first lines of the job. Responses read by the connection's `listen`,
+        `alisten` or `poll` will keep the job flowing.
+        """
+        self._fill()
+
+    def run(self) -> None:
+        """
+        Stream the whole job, reading responses until every line has been answered.
+        """
+        self.start()
+        while not self.done:
+            self.fluidnc.poll()
+
+    async def arun(self) -> None:
+        """
+        Stream the whole job, reading responses until every line has been answered.
+        """
+        import asyncio
+        self.start()
+        while not self.done:
+            if not self.fluidnc.poll():
+                await asyncio.sleep(0)
+
+    def handle_result(self, line_number: int, line: str, response: str) -> None:
+        """
+        Called as each line of the job is answered. Override to surface per-line results.
+
+        Parameters:
+            line_number: 1-based position of the line in the job, excluding blank lines
+            line: line as it was sent
+            response: `'ok'` or `'error:N'`
+        """
+        if not response.startswith("ok"):
+            self.errors.append((line_number, line, response))
+
+    # ------------------------------------------
+
+    def _waiting(self) -> bool:
+        # a line of the job is last in the connection's queue, waiting for room. Lines
+        # queued by others (eg. `send_command`) don't count, as their responses don't
+        # come back here to keep the job flowing.
+        queued = self.fluidnc._queued_lines
+        return bool(queued) and queued[-1][1] is self._callback
+
+    def _fill(self) -> None:
+        # only hand the connection one line at a time, it sends them as room is made
+        while not self._exhausted and not self.aborted and not self._waiting():
+            try:
+                line = self.clean_line(next(self._lines))
+            except StopIteration:
+                self._exhausted = True
+                break
+            if not line:
+                continue
+            self._line_number += 1
+            self._sent.append((self._line_number, line))
+            self.lines_sent += 1
+            self.fluidnc.queue_line(line, self._callback)
+
+    def _on_response(self, response: str | None) -> None:
+        line_number, line = self._sent.pop(0)
+        if response is None:
+            self.aborted = True
+            logger.warning(f"job aborted at line {line_number}: controller restarted")
+            return
+        self.lines_completed += 1
+        self.handle_result(line_number, line, response)
+        self._fill()
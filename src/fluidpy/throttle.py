@@ -0,0 +1,132 @@
+from fluidpy.fluidnc import ticks_ns
+from fluidpy.chain import wrap_methods, restore_methods
+
+# handlers of each kind of message that can be throttled
+KIND_HANDLERS = {
+    'status': ('handle_machine_state', 'handle_position', 'handle_work_position', 'handle_feed',
+               'handle_spindle', 'handle_triggers', 'handle_overrides', 'handle_line_number',
+               'handle_buffer_size', 'handle_accessory_state'),
+    'msg': ('handle_log',),
+    'gc': ('handle_mode',),
+    'mode_command': ('handle_mode_command',),
+    'variable': ('handle_variable',),
+}
+
+# delivered as soon as their value changes, holding back only repeats
+EDGE_HANDLERS = ('handle_machine_state', 'handle_triggers', 'handle_accessory_state')
+
+# always delivered immediately
+UNTHROTTLED_HANDLERS = ('handle_alarm', 'handle_error', 'handle_ok', 'handle_version',
+                        'handle_exp_id', 'handle_exp_io', 'handle_exp_set')
+
+
+def throttle_targets(target: str) -> tuple:
+    """
+    Handlers named by `target`, either a handler name or a kind of message in `KIND_HANDLERS`.
+    """
+    if target in KIND_HANDLERS:
+        return KIND_HANDLERS[target]
+    if target in UNTHROTTLED_HANDLERS:
+        raise ValueError(f"{target} is always delivered immediately")
+    if not target.startswith("handle_"):
+        raise ValueError(f"not a handler or kind of message: {target}")
+    return (target,)
+
+
+class Throttle:
+    """
+    Limits how often throttled handlers are called while every message is still parsed:
+    a call that comes too soon after the last one is held back, replacing any value
+    already held back, and delivered once the handler is due again (the next `poll`
+    after that). `handle_position` holds back a value per kind (`MPos`, `WCO`, ...).
+
+    Changes of state, triggered pins and accessories are delivered immediately, after
+    any values held back for other handlers, so a consumer never sees a new state with
+    an older position. Alarms, errors and the other `UNTHROTTLED_HANDLERS` are never
+    throttled. Attach with `FluidNC.enable_throttle`.
+    """
+
+    def __init__(self) -> None:
+        self.periods = dict()
+        """minimum time (ns) between calls, for each throttled handler"""
+        self.held_back = 0
+        """number of calls replaced by a later value before being delivered"""
+        self._last = dict()
+        self._edges = dict()
+        self._pending = dict()
+        self._wrapped = dict()
+
+    def flush(self, now: int | None = None, force: bool = False) -> None:
+        """
+        Deliver the values held back for handlers that are due again, or all of them with
+        `force`.
+        """
+        if not self._pending:
+            return
+        if now is None:
+            now = ticks_ns()
+        last = self._last
+        periods = self.periods
+        due = [key for key, (name, _, _) in self._pending.items()
+               if force or now - last.get(name, now - periods[name]) >= periods[name]]
+        for key in due:
+            name, handler, args = self._pending.pop(key)
+            last[name] = now
+            handler(*args)
+
+    def add(self, fluidnc, names, max_hz: float) -> None:
+        throttle = self
+        period = int(1_000_000_000 / max_hz)
+        dispatch = fluidnc._current_dispatch()
+        names = [name for name in names if name in dispatch and name not in UNTHROTTLED_HANDLERS]
+        for name in names:
+            self.periods[name] = period
+        names = [name for name in names if name not in self._wrapped]
+
+        def throttled(name, handler):
+            edge = name in EDGE_HANDLERS
+            keyed = name == 'handle_position'
+
+            def deliver(*args):
+                now = ticks_ns()
+                if edge and args != throttle._edges.get(name):
+                    throttle._edges[name] = args
+                    throttle._pending.pop(name, None)
+                    throttle.flush(now, force=True)
+                    throttle._last[name] = now
+                    return handler(*args)
+                key = (name, args[0]) if keyed else name
+                period = throttle.periods[name]
+                if now - throttle._last.get(name, now - period) >= period:
+                    throttle._pending.pop(key, None)
+                    throttle._last[name] = now
+                    return handler(*args)
+                if key in throttle._pending:
+                    throttle.held_back += 1
+                throttle._pending[key] = (name, handler, args)
+            return deliver
+
+        def flushing(name, poll):
+            def poll_and_flush(*args, **kwargs):
+                result = poll(*args, **kwargs)
+                throttle.flush()
+                return result
+            return poll_and_flush
+
+        self._wrapped.update(wrap_methods(fluidnc, names, throttled))
+        if "poll" not in self._wrapped:
+            self._wrapped.update(wrap_methods(fluidnc, ["poll"], flushing))
+
+    def remove(self, fluidnc, names=None) -> None:
+        """
+        Stop throttling `names` (all handlers if `None`), delivering any values held back.
+        """
+        self.flush(force=True)
+        if names is None:
+            names = list(self.periods)
+        saved = {name: self._wrapped.pop(name) for name in names if name in self._wrapped}
+        for name in saved:
+            del self.periods[name]
+        if not self.periods and "poll" in self._wrapped:
+            saved["poll"] = self._wrapped.pop("poll")
+        restore_methods(fluidnc, saved)
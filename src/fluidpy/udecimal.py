@@ -1,10 +1,3 @@
-import sys
-
-if sys.implementation.name == "cpython":        # micropython does not include 'typing' module
-    from typing import Tuple
-if sys.implementation.name == "micropython":    # Just in case...
-    pass
-
 
 class DecimalNumber:
     """DecimalNumber is a class for decimal floating point arithmetic with arbitrary precision."""
@@ -14,12 +7,15 @@ class DecimalNumber:
     DECIMAL_SEP: str = "."
     THOUSANDS_SEP: str = ","
     USE_THOUSANDS_SEP: bool = False
-    PI_NUMBER: int = 31415926535897932384626433832795028841971693993751058209749445923078164062862089986280348253421170679
-    PI_SCALE: int = 100
-    E_NUMBER: int = 27182818284590452353602874713526624977572470936999595749669676277240766303535475945713821785251664274
-    E_SCALE: int = 100
-    LN2_NUMBER: int = 6931471805599453094172321214581765680755001343602552541206800094933936219696947156058633269964186875
-    LN2_SCALE: int = 100
+    # precalculated PI, E and LN2 are loaded from `udecimal_constants` the first time one is
+    # needed, so their (100 digit) integers don't take up memory until then
+    PI_NUMBER: int = 0
+    PI_SCALE: int = 0
+    E_NUMBER: int = 0
+    E_SCALE: int = 0
+    LN2_NUMBER: int = 0
+    LN2_SCALE: int = 0
+    _constants_loaded: bool = False
     _scale: int = DEFAULT_SCALE
 
     def __init__(self, number=0, decimals: int = 0) -> None:
@@ -45,12 +41,31 @@ class DecimalNumber:
             raise DecimalNumberExceptionBadInit(
                 "Only 'int' or 'str' instances are allowed for initialization")
 
+    @staticmethod
+    def _load_constants() -> None:
+        """Loads the precalculated values of PI, E and LN2, unless they have
+        already been calculated to a larger scale."""
+        if DecimalNumber._constants_loaded:
+            return
+        from fluidpy import udecimal_constants as constants
+        if constants.PI_SCALE > DecimalNumber.PI_SCALE:
+            DecimalNumber.PI_NUMBER = constants.PI_NUMBER
+            DecimalNumber.PI_SCALE = constants.PI_SCALE
+        if constants.E_SCALE > DecimalNumber.E_SCALE:
+            DecimalNumber.E_NUMBER = constants.E_NUMBER
+            DecimalNumber.E_SCALE = constants.E_SCALE
+        if constants.LN2_SCALE > DecimalNumber.LN2_SCALE:
+            DecimalNumber.LN2_NUMBER = constants.LN2_NUMBER
+            DecimalNumber.LN2_SCALE = constants.LN2_SCALE
+        DecimalNumber._constants_loaded = True
+
     @classmethod
     def pi(cls) -> "DecimalNumber":
         """Calculation of PI using the very fast algorithm present on the
         documentation of the module "decimal" of the Python Standard Library:
         https://docs.python.org/3/library/decimal.html#recipes
         """
+        DecimalNumber._load_constants()
         # If it is precalculated
         if DecimalNumber.PI_SCALE >= DecimalNumber.get_scale():
             s: DecimalNumber = DecimalNumber(DecimalNumber.PI_NUMBER, DecimalNumber.PI_SCALE)
@@ -88,6 +103,7 @@ class DecimalNumber:
         It uses the Taylor series:
             e = 1/0! + 1/1! + 1/2! + 1/3! + ... + 1/n!
         """
+        DecimalNumber._load_constants()
         # If it is precalculated
         if DecimalNumber.E_SCALE >= DecimalNumber.get_scale():
             e: DecimalNumber = DecimalNumber(DecimalNumber.E_NUMBER, DecimalNumber.E_SCALE)
@@ -122,6 +138,7 @@ class DecimalNumber:
             ln(1-x) = -x -x²/2 - x³/3 ...
             ln(2) = x + x²/2 + x³/3 ... for x = 1/2
         """
+        DecimalNumber._load_constants()
         # If it is precalculated
         if DecimalNumber.LN2_SCALE >= DecimalNumber.get_scale():
             e: DecimalNumber =  DecimalNumber(DecimalNumber.LN2_NUMBER, DecimalNumber.LN2_SCALE)
@@ -526,7 +543,7 @@ class DecimalNumber:
         return DecimalNumber._scale
 
     @staticmethod
-    def _parse_number(number: str) -> Tuple[bool, int, int]:
+    def _parse_number(number: str) -> "tuple[bool, int, int]":
         """This is a static and auxiliary method to parse a string containing
         a number. If the string is parsed as a number, it returns three values:
             True --> string correctly parsed as number.
@@ -598,7 +615,7 @@ class DecimalNumber:
         return n
 
     @staticmethod
-    def _make_integer_comparable(n1: "DecimalNumber", n2: "DecimalNumber") -> Tuple[int]:
+    def _make_integer_comparable(n1: "DecimalNumber", n2: "DecimalNumber") -> "tuple[int]":
         """Static and auxiliary method to creates two integers from two DecimalNumber,
         without decimals, that can be compared (or sum) by taking into account their decimals.
         Examples:
@@ -962,6 +979,10 @@ class DecimalNumber:
         DecimalNumber.set_scale(s)
         return n._number
 
+    def to_float(self) -> float:
+        f = self._number / (10 ** self._num_decimals)
+        return f if self._is_positive else -f
+
     def to_string_thousands(self) -> str:
         return self.__str__(True)
 
@@ -0,0 +1,8 @@
+# Precalculated constants for `DecimalNumber`, imported the first time one is needed.
+
+PI_NUMBER = 31415926535897932384626433832795028841971693993751058209749445923078164062862089986280348253421170679
+PI_SCALE = 100
+E_NUMBER = 27182818284590452353602874713526624977572470936999595749669676277240766303535475945713821785251664274
+E_SCALE = 100
+LN2_NUMBER = 6931471805599453094172321214581765680755001343602552541206800094933936219696947156058633269964186875
+LN2_SCALE = 100
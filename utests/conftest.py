@@ -24,6 +24,42 @@ class TestFluidExpander(FluidNC):
             setattr(self, handler, self.mocks[handler])
 
 
+class RecordingInterface(BufferInterface):
+
+    def __init__(self):
+        self.writes = []
+
+    def write(self, data: bytes) -> int:
+        self.writes.append(data if isinstance(data, bytes) else bytes(data))
+        return len(data)
+
+    def readline(self) -> bytes:
+        return b""
+
+
+class Clock:
+    # time in nanoseconds for the simulator and `ticks_ns`, moved on by the test
+
+    def __init__(self):
+        self.now = 0
+
+    def __call__(self) -> int:
+        return self.now
+
+    def advance(self, ms: float) -> None:
+        self.now += int(ms * 1_000_000)
+
+
+@pytest.fixture
+def io() -> RecordingInterface:
+    return RecordingInterface()
+
+
+@pytest.fixture
+def clock() -> Clock:
+    return Clock()
+
+
 @pytest.fixture
 def fnc() -> FluidNC:
     class TestInterface(BufferInterface):
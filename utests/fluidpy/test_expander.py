@@ -0,0 +1,93 @@
+import pytest
+
+import fluidpy.expander
+from fluidpy.expander import ExpanderIO, SimulatedPins, pin_number
+from fluidpy.fluidnc import FluidNC, RealtimeCommand
+from fluidpy.simulator import SimulatorInterface
+
+
+@pytest.fixture
+def clock(clock, monkeypatch):
+    clock.now = 1_000_000_000
+    monkeypatch.setattr(fluidpy.expander, "ticks_ns", clock)
+    return clock
+
+
+def run_for(fnc: FluidNC, clock, ms: int, step_ms: float = 1) -> None:
+    for _ in range(int(ms / step_ms)):
+        clock.advance(step_ms)
+        while fnc.poll(catch_exc=False):
+            pass
+
+
+PINS = {"io.1": "out", "io.2": "in,pu", "io.3": "in,low", "io.4": "out,pwm", "io.70": "in", "io.5": "in,out"}
+
+
+def test_expander_with_simulated_pins(clock):
+    io = SimulatorInterface(pins=PINS, clock=clock)
+    controller = io.controller
+    pins = SimulatedPins()
+    fnc = FluidNC(io)
+    expander = fnc.enable_expander(pins.read_inputs, pins.write_output, debounce_ms=5, batch_ms=10)
+    run_for(fnc, clock, 20)
+
+    ack, nak = RealtimeCommand.PIN_ACK, RealtimeCommand.PIN_NAK
+    assert controller.pin_acks == [ack, ack, ack, ack, nak, nak]
+    assert expander.inputs == 0b1100 and expander.outputs == 0b10010 and expander.active_low == 0b1000
+    # the level of every input is reported once configured, active low inputs inverted
+    assert controller.inputs == {2: False, 3: True}
+
+    controller.set_output("io.1", 1)
+    controller.set_output("io.4", 0.25)
+    controller.set_output("io.2", 1)
+    run_for(fnc, clock, 2)
+    assert pins.writes == [(1, True), (4, 0.25)]
+    assert expander.output_levels == 0b10010
+
+    # a chattering input is only reported once it settles
+    changes = len(controller.pin_changes)
+    for i in range(20):
+        pins.set_input(2, i % 2 == 0)
+        run_for(fnc, clock, 1)
+    assert len(controller.pin_changes) == changes
+    pins.set_input(2, True)
+    run_for(fnc, clock, 10)
+    assert controller.pin_changes[changes:] == [(2, True)]
+    assert expander.transitions >= 20
+
+    # changes within a batch go in one write
+    reports = expander.reports
+    pins.set_input(2, False)
+    pins.set_input(3, True)
+    run_for(fnc, clock, 20)
+    assert expander.reports == reports + 1
+    assert controller.inputs == {2: False, 3: False}
+
+    fnc.disable_expander()
+    assert "handle_exp_io" not in vars(fnc) and "poll" not in vars(fnc)
+
+
+def test_sampled_without_read_inputs(io, clock):
+    fnc = FluidNC(io)
+    expander = fnc.enable_expander(debounce_ms=0, batch_ms=0)
+    fnc.process_message("[MSG:INI: io.7=in]")
+    expander.sample(1 << 7)
+    assert io.writes == [bytes((RealtimeCommand.PIN_ACK,)), chr(0x140 + 7).encode()]
+
+    # the controller restarting forgets the pin table
+    fnc.process_message("[EXP:ID]")
+    assert expander.inputs == 0
+
+
+def test_ini_routed_to_handle_exp_io(fnc):
+    fnc.process_message("[INI: io.1=in,low,pu]")
+    fnc.handle_exp_io.assert_called_once_with("io.1", "in,low,pu")
+    fnc.process_message("[MSG:SET: io.2=1]")
+    fnc.handle_exp_set.assert_called_once_with("io.2", "1")
+
+
+def test_pin_names():
+    assert pin_number("io.12") == 12
+    with pytest.raises(ValueError):
+        pin_number("gpio.12")
+    assert not ExpanderIO(pins=8).configure("io.8", "in")
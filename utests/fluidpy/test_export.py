@@ -0,0 +1,65 @@
+import ast
+import struct
+from array import array
+
+import pytest
+
+from fluidpy.export import ColumnExporter, HEADER_BYTES, UNKNOWN_STATE, load_columns, state_code
+from fluidpy.fluidnc import FluidNC
+
+
+def read_npy(path) -> tuple:
+    # header and values of a `.npy` file, read without NumPy
+    with open(path, "rb") as file:
+        data = file.read()
+    assert data[:8] == b"\x93NUMPY\x01\x00"
+    length, = struct.unpack("<H", data[8:10])
+    assert 10 + length == HEADER_BYTES
+    header = ast.literal_eval(data[10:10 + length].decode())
+    typecode = {"i8": "q", "f8": "d", "u1": "B"}[header["descr"][1:]]
+    values = array(typecode)
+    values.frombytes(data[HEADER_BYTES:])
+    assert header["shape"] == (len(values),)
+    return header, values
+
+
+def test_status_reports_exported(io, tmp_path):
+    fnc = FluidNC(io)
+    exporter = fnc.enable_export(str(tmp_path), axes=2, chunk_rows=4)
+    for i in range(10):
+        line = f"|Ln:{i}" if i % 2 else ""
+        fnc.process_message(f"<{'Run' if i < 6 else 'Hold:0'}|MPos:{i}.500,-{i}.000,0.000|FS:{100 * i},24000{line}>")
+        fnc.process_message("ok")
+    # two full chunks written, two rows waiting
+    assert read_npy(tmp_path / "x.npy")[0]["shape"] == (8,)
+    fnc.disable_export()
+    assert exporter.rows == 10
+
+    _, x = read_npy(tmp_path / "x.npy")
+    assert list(x) == [i + 0.5 for i in range(10)]
+    assert list(read_npy(tmp_path / "y.npy")[1]) == [-float(i) for i in range(10)]
+    assert list(read_npy(tmp_path / "feed.npy")[1]) == [100.0 * i for i in range(10)]
+    assert list(read_npy(tmp_path / "line.npy")[1]) == [i if i % 2 else -1 for i in range(10)]
+    assert list(read_npy(tmp_path / "state.npy")[1]) == [state_code("Run")] * 6 + [state_code("Hold")] * 4
+    times = read_npy(tmp_path / "time.npy")[1]
+    assert list(times) == sorted(times)
+    assert not (tmp_path / "z.npy").exists()
+    assert "process_message" not in vars(fnc)
+
+
+def test_state_codes():
+    assert state_code("Idle") == 0
+    assert state_code("Door:1") == state_code("Door")
+    assert state_code("Bogus") == UNKNOWN_STATE
+
+
+def test_loads_memory_mapped(tmp_path):
+    np = pytest.importorskip("numpy")
+    exporter = ColumnExporter(str(tmp_path), axes=3, chunk_rows=3)
+    for i in range(7):
+        exporter.append(i, state_code("Jog"), [i, 2.0 * i, 0.0], 500.0, 0.0)
+    exporter.close()
+    columns = load_columns(str(tmp_path))
+    assert isinstance(columns["y"], np.memmap)
+    assert columns["y"].tolist() == [2.0 * i for i in range(7)]
+    assert columns["time"].dtype == np.int64 and columns["state"].dtype == np.uint8
@@ -0,0 +1,66 @@
+import tracemalloc
+
+import pytest
+
+from fluidpy.fluidnc import FluidNC
+from fluidpy.history import MotionHistory
+
+
+def test_ring_keeps_latest_samples():
+    history = MotionHistory(capacity=4, axes=2)
+    for i in range(6):
+        history.append(i * 1_000_000, [float(i), -float(i)], 100.0, 0.0)
+    assert len(history) == 4
+    assert history.times[history.index(0)] == 2_000_000
+    assert history.positions[0][history.index(-1)] == 5.0
+    assert list(history.column(history.positions[1])) == [-2.0, -3.0, -4.0, -5.0]
+    with pytest.raises(IndexError):
+        history.index(4)
+
+
+def test_windowed_velocity_and_acceleration():
+    history = MotionHistory(capacity=100, axes=2)
+    # x moves at 10 units/s, y accelerates at 4 units/s^2, sampled every 100 ms
+    for i in range(50):
+        t = i / 10
+        history.append(i * 100_000_000, [10 * t, 2 * t * t], 600.0, 0.0)
+
+    assert history.window(window_ms=1000) == 39
+    assert history.velocity(0, window_ms=1000) == pytest.approx(10)
+    assert history.velocity(1, window_ms=1000) == pytest.approx(4 * 4.4)
+    assert history.acceleration(1, window_ms=2000) == pytest.approx(4)
+    assert history.speed(window_ms=200) == pytest.approx((10 ** 2 + (4 * 4.8) ** 2) ** 0.5)
+
+
+def test_queries_reuse_output_array():
+    history = MotionHistory(capacity=64)
+    for i in range(64):
+        history.append(i * 10_000_000, [float(i), 0.0, 0.0], 0.0, 0.0)
+    out = history.column(history.feeds, window_ms=100)
+    assert history.column(history.feeds, window_ms=100, out=out) is out
+
+    history.velocity(0)
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        history.append(640_000_000, [64.0, 0.0, 0.0], 0.0, 0.0)
+        history.velocity(0)
+        history.column(history.feeds, window_ms=100, out=out)
+        assert tracemalloc.get_traced_memory()[0] - before == 0
+    finally:
+        tracemalloc.stop()
+
+
+def test_history_from_status_reports(io):
+    fnc = FluidNC(io)
+    history = fnc.enable_history(capacity=8)
+    fnc.process_message("<Run|MPos:1.000,2.000,-3.500|FS:600,12000>")
+    fnc.process_message("[MSG:INFO: hello]")
+    fnc.process_message("<Run|WPos:1.500,2.000,-3.500|FS:300,12000|WCO:1.000,0.000,0.000>")
+    assert len(history) == 2
+    latest = history.index(-1)
+    assert [history.positions[axis][latest] for axis in range(3)] == [2.5, 2.0, -3.5]
+    assert (history.feeds[latest], history.spindles[latest]) == (300.0, 12000.0)
+
+    fnc.disable_history()
+    assert "process_message" not in fnc.__dict__
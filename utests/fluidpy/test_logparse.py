@@ -0,0 +1,80 @@
+from fluidpy.logparse import LogParser, parse_logs, split_chunks
+
+
+def write_log(path, repeats: int = 20) -> list:
+    lines = []
+    for i in range(repeats):
+        lines += [
+            "Grbl 3.7 [FluidNC v3.7.10 (wifi) '$' for help]",
+            "[MSG:INFO: Probe gpio.2:pu]",
+            f"<Idle|MPos:{i}.000,0.000,0.000|FS:0,0>",
+            "ok",
+            f"<Run|MPos:{i}.500,1.000,0.000|FS:500,0|Ln:{i}>",
+            "error:20" if i % 3 == 0 else "ok",
+            "",
+            "ALARM:1" if i % 5 == 0 else "ok",
+            "<Alarm|MPos:0.000,0.000,0.000|FS:0,0>" if i % 5 == 0 else "[GC:G0 G54 G17 G21 G90 G94 M5 M9 T0 F0 S0]",
+            "<Bogus|MPos:0.000,0.000,0.000|FS:0,0>" if i == 7 else "ok",
+        ]
+    path.write_text("\n".join(lines) + "\n")
+    return lines
+
+
+def test_chunks_end_on_line_boundaries(tmp_path):
+    path = tmp_path / "session.log"
+    write_log(path)
+    data = path.read_bytes()
+    chunks = split_chunks(str(path), 100)
+    assert chunks[0][0] == 0 and chunks[-1][1] == len(data)
+    for (_, end), (start, _) in zip(chunks, chunks[1:]):
+        assert end == start and data[end - 1:end] == b"\n"
+
+
+def test_parallel_matches_sequential(tmp_path):
+    path = tmp_path / "session.log"
+    lines = write_log(path)
+    sequential = parse_logs(str(path), processes=1, chunk_bytes=1 << 20)
+    parallel = parse_logs(str(path), processes=2, chunk_bytes=150)
+    assert parallel == sequential
+
+    assert sequential["lines"] == len(lines)
+    assert sequential["kinds"]["status"] == 20 * 2 + 4
+    assert [line for line, _ in sequential["alarms"]] == [i for i, line in enumerate(lines) if line == "ALARM:1"]
+    assert len(sequential["errors"]) == 7
+    assert sequential["states"][:3] == [(2, "Idle"), (4, "Run"), (8, "Alarm")]
+    assert [line for line, _ in sequential["unparsed"]] == [79]
+
+
+def test_several_files_in_order(tmp_path):
+    first, second = tmp_path / "1.log", tmp_path / "2.log"
+    lines = write_log(first, 2)
+    write_log(second, 2)
+    merged = parse_logs([str(first), str(second)], processes=1)
+    assert merged["lines"] == 2 * len(lines)
+    assert [line for line, _ in merged["alarms"]] == [7, 7 + len(lines)]
+    assert LogParser.merge([])["lines"] == 0
+
+
+class Positions(LogParser):
+    # converts the fields a plain `LogParser` skips
+
+    def handle_position(self, kind, position):
+        pass
+
+    def handle_feed(self, feed):
+        pass
+
+    def handle_spindle(self, spindle):
+        pass
+
+    def handle_line_number(self, line_number):
+        pass
+
+
+def test_garbled_fields_counted_as_unparsed():
+    parser = Positions()
+    for line in ["[EXP:io.1]", "<Idle|MPos:1x,0.000,0.000|FS:0,0>", "<Idle|FS:1>",
+                 "<Idle|Ln:abc>", "<Idle|MPos:1.000,0.000,0.000|FS:0,0>"]:
+        parser.parse_line(line)
+    assert [line for line, _ in parser.unparsed] == [0, 1, 2, 3]
+    assert parser.kinds["status"] == 1
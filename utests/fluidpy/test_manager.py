@@ -0,0 +1,147 @@
+import asyncio
+import os
+import sys
+import threading
+
+import pytest
+
+from fluidpy.fluidnc import FluidNC
+from fluidpy.manager import ControllerManager
+from fluidpy.simulator import SimulatedController, SimulatorInterface, serve_pty
+
+pytestmark = pytest.mark.skipif(sys.platform == "win32", reason="needs pseudo-terminals")
+
+
+class Counter(FluidNC):
+
+    def __init__(self):
+        self.states = []
+        super().__init__(None, report_interval=20)
+
+    def handle_machine_state(self, state):
+        self.states.append(state)
+
+
+class Simulator:
+    # simulated controller served on a pty from a thread, reachable through a symlink
+
+    def __init__(self, link: str):
+        self.link = link
+        self.stop = threading.Event()
+        self.thread = threading.Thread(target=serve_pty, args=(SimulatedController(), link),
+                                       kwargs=dict(stop=self.stop), daemon=True)
+        self.thread.start()
+
+    def close(self):
+        self.stop.set()
+        self.thread.join()
+
+
+async def wait_until(condition, timeout: float = 5.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not condition():
+        assert asyncio.get_running_loop().time() < deadline, "timed out"
+        await asyncio.sleep(0.01)
+
+
+def test_controllers_on_ptys(tmp_path):
+    links = [str(tmp_path / f"cnc{i}") for i in range(3)]
+    simulators = [Simulator(link) for link in links]
+    manager = ControllerManager(reconnect_s=0.05, stats=True)
+    controllers = [manager.add(f"cnc{i}", link, Counter()) for i, link in enumerate(links)]
+
+    async def scenario():
+        runner = asyncio.ensure_future(manager.run())
+        await wait_until(lambda: all(len(c.fluidnc.states) >= 3 for c in controllers))
+        response = await controllers[1].fluidnc.send_command("$I", timeout=5)
+        assert response.ok
+
+        # the controller goes away, and comes back on the same device
+        simulators[0].close()
+        await wait_until(lambda: not controllers[0].connected)
+        simulators[0] = Simulator(links[0])
+        await wait_until(lambda: controllers[0].connects == 2 and controllers[0].connected)
+        seen = len(controllers[0].fluidnc.states)
+        await wait_until(lambda: len(controllers[0].fluidnc.states) > seen)
+
+        offloaded = manager.offload(lambda: threading.current_thread().name)
+        assert (await asyncio.wrap_future(offloaded)).startswith("fluidpy")
+        manager.stop()
+        await runner
+
+    try:
+        asyncio.run(asyncio.wait_for(scenario(), 20))
+    finally:
+        for simulator in simulators:
+            simulator.close()
+
+    status = manager.status()
+    assert status["cnc1"]["connects"] == 1
+    assert status["cnc1"]["stats"]["kinds"]["status"]["count"] >= 3
+    assert status["cnc0"]["last_error"]
+    assert not any(os.path.exists(link) for link in links)
+
+
+def test_polled_connection():
+    manager = ControllerManager(poll_ms=1)
+    controller = manager.add("sim", lambda: SimulatorInterface(), Counter())
+
+    async def scenario():
+        runner = asyncio.ensure_future(manager.run())
+        await wait_until(lambda: len(controller.fluidnc.states) >= 2)
+        manager.stop()
+        await runner
+
+    asyncio.run(asyncio.wait_for(scenario(), 10))
+    assert controller.messages > 2
+
+
+def test_garbled_state_doesnt_stop_controller():
+    def connect():
+        io = SimulatorInterface()
+        io.controller.emit("<Bogus|MPos:0.000,0.000,0.000|FS:0,0>")
+        return io
+
+    # caught and logged by `poll`, or ending the connection, which is made again
+    lenient = ControllerManager(poll_ms=1)
+    kept = lenient.add("sim", connect, Counter())
+    strict = ControllerManager(poll_ms=1, reconnect_s=0.01, catch_exc=False)
+    reconnected = strict.add("sim", connect, Counter())
+
+    async def scenario():
+        runners = [asyncio.ensure_future(manager.run()) for manager in (lenient, strict)]
+        await wait_until(lambda: len(kept.fluidnc.states) >= 2 and reconnected.connects >= 2)
+        lenient.stop()
+        strict.stop()
+        await asyncio.gather(*runners)
+
+    asyncio.run(asyncio.wait_for(scenario(), 10))
+    assert kept.connects == 1 and kept.last_error is None
+    assert "Bogus" in reconnected.last_error
+
+
+def test_unconvertible_field_doesnt_stop_controller():
+    class Lines(Counter):
+        def handle_line_number(self, line_number):
+            self.line_number = line_number
+
+    def connect():
+        io = SimulatorInterface()
+        io.controller.emit("<Idle|Ln:abc>")
+        return io
+
+    lenient = ControllerManager(poll_ms=1)
+    kept = lenient.add("sim", connect, Lines())
+    strict = ControllerManager(poll_ms=1, reconnect_s=0.01, catch_exc=False)
+    reconnected = strict.add("sim", connect, Lines())
+
+    async def scenario():
+        runners = [asyncio.ensure_future(manager.run()) for manager in (lenient, strict)]
+        await wait_until(lambda: len(kept.fluidnc.states) >= 2 and reconnected.connects >= 2)
+        lenient.stop()
+        strict.stop()
+        await asyncio.gather(*runners)
+
+    asyncio.run(asyncio.wait_for(scenario(), 10))
+    assert kept.connects == 1 and kept.last_error is None
+    assert "abc" in reconnected.last_error
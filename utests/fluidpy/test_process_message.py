@@ -1,13 +1,18 @@
-from fluidpy.fluidnc import FluidNC
+import logging
+from unittest.mock import MagicMock
+
+from fluidpy.fluidnc import FluidNC, _Pattern
 
 MESSAGES = {
     'idle': "<Idle|MPos:3.000,0.000,0.000|FS:0,0|Pn:PT|Bf:15,128>",
     'jog': "<Jog|MPos:2.932,0.000,0.000|FS:7,0|Pn:PT|Ln:99999>",
     'alarm': "<Alarm|MPos:3.000,0.000,0.000|FS:0,100|Pn:PT|Ov:100,100,100|A:S>",
+    'wco': "<Idle|MPos:3.000,0.000,0.000|FS:0,0|WCO:1.000,0.000,0.000>",
     'log': "[MSG:DBG: ModbusVFD: setState:3 SpindleSpeed:100]",
     'mode': "[GC:G0 G54 G17 G21 G90 G94 M5 M9 T0 F0 S100]",
     'exp_id': "[EXP:ID]",
     'exp_io': "[EXP:io.2=out]",
+    'exp_set': "[MSG:SET: io.2=1]",
     'version': "Grbl 4.0 [FluidNC v4.0.0-pre2 (v4_plus-40f72c3d) (wifi) '$' for help]",
     'error': 'error:x',
     'ok': 'ok',
@@ -84,6 +89,10 @@ def test_alarm_message(fnc: FluidNC):
     fnc.handle_overrides.assert_called_once()
     fnc.handle_accessory_state.assert_called_once()
 
+def test_hold_substate_message(fnc: FluidNC):
+    fnc.process_message("<Hold:0|MPos:3.000,0.000,0.000|FS:0,0>")
+    fnc.handle_machine_state.assert_called_once_with("Hold:0")
+
 def test_log_message(fnc: FluidNC):
     fnc.process_message(MESSAGES['log'])
     fnc.handle_log.assert_called_once()
@@ -113,3 +122,101 @@ def test_all_messages(fnc: FluidNC):
             mock.assert_called()
         except AssertionError as a:
             raise AssertionError(f"'{name}' was not called") from a
+
+
+def test_dispatch_plan_skips_unused_fields(caplog):
+    caplog.set_level(logging.INFO, logger="fluidpy.fluidnc")
+
+    class Pendant(FluidNC):
+        def __init__(self, io):
+            self.positions = []
+            super().__init__(io)
+
+        def handle_position(self, kind, position):
+            self.positions.append((kind, position))
+
+    pendant = Pendant(None)
+    pendant.handle_machine_state = MagicMock()
+    assert "Ov" in pendant._skip_fields
+    assert "MPos" not in pendant._skip_fields
+
+    pendant.process_message(MESSAGES['alarm'])
+    pendant.process_message(MESSAGES['mode'])
+    assert [kind for kind, _ in pendant.positions] == ['MPos']
+    pendant.handle_machine_state.assert_called_once_with('Alarm')
+
+
+def test_handler_set_on_instance(caplog):
+    caplog.set_level(logging.INFO, logger="fluidpy.fluidnc")
+    fnc = FluidNC(None)
+    fnc.handle_position = MagicMock()
+    fnc.process_message(MESSAGES['alarm'])
+    fnc.handle_position.assert_called_once()
+
+    # a handler replaced while wrapped by a feature stays once the feature is disabled
+    fnc.enable_stats()
+    fnc.handle_position = replacement = MagicMock()
+    fnc.process_message(MESSAGES['alarm'])
+    replacement.assert_called_once()
+    fnc.disable_stats()
+    assert fnc.handle_position is replacement
+
+    del fnc.handle_position
+    fnc.process_message(MESSAGES['alarm'])
+    assert "handle_position" not in fnc._dispatch
+
+
+def test_patterns_compiled_on_first_match(monkeypatch):
+    pattern = FluidNC.status_re.pattern
+    monkeypatch.setattr(FluidNC, "status_re", _Pattern("status_re", pattern))
+    fnc = FluidNC(None)
+    # nothing relies on the descriptor protocol, which some CircuitPython builds leave out
+    assert isinstance(fnc.status_re, _Pattern) and not hasattr(_Pattern, "__get__")
+    assert fnc.process_message(MESSAGES['alarm']) == "status"
+    assert FluidNC.status_re.match(MESSAGES['alarm'])
+    assert not isinstance(FluidNC.status_re, _Pattern)
+
+
+def test_dispatch_all_with_debug_logging(caplog):
+    caplog.set_level(logging.DEBUG, logger="fluidpy.fluidnc")
+    fnc = FluidNC(None)
+    assert "handle_overrides" in fnc._dispatch
+    assert not fnc._skip_fields
+
+
+def test_work_position_from_sparse_wco(io):
+    work_positions = []
+
+    class Pendant(FluidNC):
+        def handle_work_position(self, position):
+            work_positions.append(position)
+
+    pendant = Pendant(io)
+    pendant.process_message("<Idle|MPos:3.000,2.000,0.000|FS:0,0>")
+    assert pendant.work_position is None
+    pendant.process_message("<Idle|MPos:3.000,2.000,0.000|FS:0,0|WCO:1.000,0.500,-5.000>")
+    pendant.process_message("<Idle|MPos:3.000,2.000,0.000|FS:0,0>")
+    pendant.process_message("<Jog|MPos:4.000,2.000,0.000|FS:100,0>")
+
+    first, unchanged, moved = work_positions
+    assert (str(first.x), str(first.y), str(first.z)) == ("2", "1.5", "5")
+    assert unchanged is first
+    assert str(moved.x) == "3"
+    assert str(pendant.work_offset.y) == "0.5"
+
+
+def test_wpos_reports(io):
+    class Pendant(FluidNC):
+        def __init__(self, io):
+            self.reported = []
+            super().__init__(io)
+
+        def handle_position(self, kind, position):
+            self.reported.append(kind)
+
+    pendant = Pendant(io)
+    pendant.process_message("<Idle|WPos:2.000,1.500,5.000|FS:0,0|WCO:1.000,0.500,-5.000>")
+    assert pendant.reported == ['WPos', 'WCO']
+    assert str(pendant.work_position.z) == "5"
+    position = pendant.machine_position
+    assert (str(position.x), str(position.y), str(position.z)) == ("3", "2", "0")
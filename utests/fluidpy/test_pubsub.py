@@ -0,0 +1,100 @@
+import asyncio
+import logging
+import threading
+
+import pytest
+
+from fluidpy.fluidnc import FluidNC
+from fluidpy.simulator import SimulatorInterface
+
+
+REPORTS = [f"<Run|MPos:{i}.000,0.000,0.000|FS:100,0|Pn:X>" for i in range(10)]
+
+
+def test_parsed_once_for_every_subscriber(io):
+    fnc = FluidNC(io)
+    display = fnc.subscribe(['position', 'machine_state'])
+    logger = fnc.subscribe('status')
+
+    fnc.process_message(REPORTS[0])
+    events = display.drain()
+    assert [event.name for event in events] == ["machine_state", "position"]
+    # the same event, with the same parsed position, goes to both queues
+    assert logger.drain()[1] is events[1]
+    assert "handle_feed" not in display.handlers
+
+
+def test_slow_subscriber_drops_only_its_own_events(io):
+    fnc = FluidNC(io)
+    slow = fnc.subscribe('position', maxsize=3)
+    fast = fnc.subscribe('position', maxsize=64)
+    for report in REPORTS:
+        fnc.process_message(report)
+        fast.drain()
+    assert len(slow) == 3 and slow.dropped == 7 and fast.dropped == 0
+    assert [str(event.args[1].x) for event in slow.drain()] == ["7", "8", "9"]
+
+
+def test_unsubscribe_restores_dispatch_plan(io, caplog):
+    caplog.set_level(logging.INFO, logger="fluidpy.fluidnc")
+    fnc = FluidNC(io)
+    subscription = fnc.subscribe('alarm')
+    assert "handle_alarm" in fnc._dispatch
+    fnc.unsubscribe(subscription)
+    assert "handle_alarm" not in fnc._dispatch
+    assert "handle_alarm" not in vars(fnc)
+    assert fnc._events is None
+
+
+def test_reused_objects_are_copied(io):
+    fnc = FluidNC(io, reuse_objects=True)
+    positions = fnc.subscribe('position')
+    fnc.process_message(REPORTS[1])
+    fnc.process_message(REPORTS[2])
+    first, second = positions.drain()
+    assert (str(first.args[1].x), str(second.args[1].x)) == ("1", "2")
+
+
+def test_blocking_get_while_listening_in_thread(io):
+    fnc = FluidNC(io)
+    alarms = fnc.subscribe('alarm')
+    assert alarms.get(timeout=0.01) is None
+    thread = threading.Thread(target=fnc.process_message, args=("ALARM:3",))
+    thread.start()
+    event = alarms.get(timeout=5)
+    thread.join()
+    assert (event.name, event.args) == ("alarm", ("3",))
+
+
+def test_async_subscription():
+    fnc = FluidNC(SimulatorInterface())
+
+    async def first_state():
+        listener = asyncio.ensure_future(fnc.alisten())
+        try:
+            async for event in fnc.subscribe_async('machine_state'):
+                return event.args[0]
+        finally:
+            listener.cancel()
+
+    fnc.query_status()
+    assert asyncio.run(asyncio.wait_for(first_state(), 5)) == "Idle"
+
+
+def test_async_subscription_fed_from_thread(io):
+    fnc = FluidNC(io)
+    alarms = fnc.subscribe_async('alarm')
+
+    async def next_alarm():
+        assert await alarms.get(timeout=0.01) is None
+        loop = asyncio.get_running_loop()
+        loop.call_later(0.01, threading.Thread(target=fnc.process_message, args=("ALARM:3",)).start)
+        return await alarms.get(timeout=5)
+
+    event = asyncio.run(asyncio.wait_for(next_alarm(), 10))
+    assert (event.name, event.args) == ("alarm", ("3",))
+
+
+def test_unknown_event(io):
+    with pytest.raises(ValueError):
+        FluidNC(io).subscribe('positions')
@@ -0,0 +1,63 @@
+import io as _io
+import time
+
+from fluidpy.fluidnc import BufferInterface, FluidNC
+from fluidpy.recorder import RecorderInterface, ReplayInterface, escape, unescape
+
+
+class ScriptedInterface(BufferInterface):
+
+    def __init__(self, lines):
+        self.lines = list(lines)
+        self.writes = []
+
+    def readline(self) -> bytes:
+        return self.lines.pop(0) if self.lines else b""
+
+    def write(self, data: bytes) -> int:
+        self.writes.append(bytes(data))
+        return len(data)
+
+
+SESSION = [
+    b"[EXP:ID]\r\n",
+    b"[EXP:io.1=out]\r\n",
+    b"<Idle|MPos:3.000,0.000,0.000|FS:0,0|Pn:PT>\r\n",
+    b"[MSG:INFO: path \\ with backslash]\r\n",
+]
+
+
+def test_escape_round_trip():
+    data = bytes(range(256))
+    assert "\n" not in escape(data)
+    assert unescape(escape(data)) == data
+
+
+def test_record_and_replay():
+    session = _io.StringIO()
+    recorder = RecorderInterface(ScriptedInterface(SESSION), session)
+    fnc = FluidNC(recorder)
+    while fnc.poll():
+        pass
+    recorder.close()
+
+    records = session.getvalue().splitlines()
+    assert records[0].startswith("#")
+    assert [record.split(" ", 2)[1] for record in records[1:]] == ["<", ">", "<", ">", "<", "<"]
+
+    replay = ReplayInterface(_io.StringIO(session.getvalue()), speed=None)
+    fnc = FluidNC(replay)
+    while not replay.finished:
+        fnc.poll()
+    assert replay.written == [b"(EXP,fluidpy)", b"\xb2"]
+
+
+def test_replay_keeps_recorded_pace():
+    session = _io.StringIO("# fluidpy session v1\n0 < ok\\r\\n\n40000 < ok\\r\\n\n")
+    replay = ReplayInterface(session, speed=2)
+    assert replay.readline() == b"ok\r\n"
+    start = time.monotonic()
+    assert replay.readline() == b"ok\r\n"
+    assert time.monotonic() - start >= 0.015
+    assert replay.readline() == b""
+    assert replay.finished
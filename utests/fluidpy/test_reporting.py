@@ -0,0 +1,79 @@
+import logging
+
+import fluidpy.reporting
+from fluidpy.fluidnc import FluidNC
+from fluidpy.simulator import SimulatorInterface
+from fluidpy.streamer import Streamer
+
+
+def run_for(fnc: FluidNC, clock, ms: int, step_ms: int = 10) -> None:
+    for _ in range(ms // step_ms):
+        clock.advance(step_ms)
+        while fnc.poll(catch_exc=False):
+            pass
+
+
+def test_configured_report_interval(clock):
+    io = SimulatorInterface(clock=clock)
+    fnc = FluidNC(io, report_interval=1000)
+    while fnc.poll():
+        pass
+    assert io.controller.settings["Report/Interval"] == "1000"
+
+
+def test_faster_reports_while_jogging(caplog, clock):
+    caplog.set_level(logging.INFO, logger="fluidpy.fluidnc")
+    io = SimulatorInterface(block_ms=3000, clock=clock)
+    fnc = FluidNC(io, report_interval=1000)
+    fnc.enable_adaptive_reporting(active_ms=50)
+    run_for(fnc, clock, 1000)
+
+    fnc.queue_line("$J=G91 X10 F1000")
+    run_for(fnc, clock, 1100)
+    assert io.controller.received[-1] == "$Report/Interval=50"
+    run_for(fnc, clock, 2000)
+    assert io.controller.received[-1] == "$Report/Interval=1000"
+
+    fnc.disable_adaptive_reporting()
+    assert "process_message" not in fnc.__dict__
+    assert "handle_machine_state" not in fnc._dispatch
+
+
+def test_interval_changed_while_streaming(caplog, clock):
+    caplog.set_level(logging.INFO, logger="fluidpy.fluidnc")
+    io = SimulatorInterface(planner_blocks=4, block_ms=100, clock=clock)
+    fnc = FluidNC(io, rx_buffer_size=32, report_interval=1000)
+    fnc.enable_adaptive_reporting(active_ms=50)
+    run_for(fnc, clock, 1000)
+
+    streamer = Streamer(fnc, [f"G1 X{i} F1000" for i in range(1, 21)])
+    streamer.start()
+    run_for(fnc, clock, 1500)
+    # the interval is changed in the middle of the job
+    assert not streamer.done
+    assert "$Report/Interval=50" in io.controller.received
+    run_for(fnc, clock, 2500)
+    assert streamer.done and streamer.lines_completed == 20
+    assert io.controller.received[-1] == "$Report/Interval=1000"
+    assert fnc.lines_in_flight == 0 and fnc.lines_queued == 0
+
+
+def test_backoff_when_listener_falls_behind(monkeypatch, clock):
+    handler_ns = [0]
+    monkeypatch.setattr(fluidpy.reporting, "ticks_ns", lambda: handler_ns[0])
+
+    class SlowPendant(FluidNC):
+        slow = True
+        def handle_position(self, kind, position):
+            handler_ns[0] += (150 if self.slow else 1) * 1_000_000
+
+    io = SimulatorInterface(clock=clock)
+    fnc = SlowPendant(io)
+    fnc.enable_adaptive_reporting(max_ms=800, recover_after=2)
+    run_for(fnc, clock, 2000)
+    assert fnc.report_interval == 800
+    assert io.controller.settings["Report/Interval"] == "800"
+
+    fnc.slow = False
+    run_for(fnc, clock, 4000)
+    assert fnc.report_interval == 200
@@ -0,0 +1,124 @@
+import logging
+import tracemalloc
+
+from fluidpy.fluidnc import FluidNC
+
+
+REPORTS = [
+    "<Idle|MPos:3.000,0.000,0.000|FS:0,0|Pn:PT|Bf:15,128>",
+    "<Jog|MPos:2.932,-0.050,10.000|FS:7,0|Pn:PT|Ln:99999>",
+    "<Alarm|MPos:3.000,0.000,0.000|FS:0,100|Pn:PT|Ov:100,100,100|A:S>",
+    "<Hold:0|MPos:1.000,2.000,3.000,4.000,5.000,6.000|F:500|WCO:-1.5,0,0.25>",
+]
+
+
+class Recorder(FluidNC):
+
+    def __init__(self, io, **kwargs):
+        self.calls = []
+        super().__init__(io, **kwargs)
+
+    def handle_machine_state(self, state):
+        self.calls.append(("state", state))
+
+    def handle_position(self, kind, position):
+        self.calls.append((kind, repr(position)))
+
+    def handle_feed(self, feed_rate):
+        self.calls.append(("feed", str(feed_rate)))
+
+    def handle_spindle(self, spindle_speed):
+        self.calls.append(("spindle", str(spindle_speed)))
+
+    def handle_triggers(self, triggers):
+        self.calls.append(("triggers", triggers))
+
+    def handle_overrides(self, feed, rapid, spindle):
+        self.calls.append(("overrides", str(feed), str(rapid), str(spindle)))
+
+    def handle_line_number(self, line_number):
+        self.calls.append(("line", line_number))
+
+    def handle_buffer_size(self, *sizes):
+        self.calls.append(("buffer", sizes))
+
+    def handle_accessory_state(self, state):
+        self.calls.append(("accessory", state))
+
+
+def test_reused_objects_match_regular_parse(io):
+    regular = Recorder(io)
+    reused = Recorder(io, reuse_objects=True)
+    for report in REPORTS:
+        assert reused.process_message(report) == regular.process_message(report) == "status"
+    assert reused.calls == regular.calls
+
+
+def test_positions_updated_in_place(io):
+    positions = []
+
+    class Pendant(FluidNC):
+        def handle_position(self, kind, position):
+            positions.append((position, str(position.x)))
+
+    pendant = Pendant(io, reuse_objects=True)
+    pendant.process_message(REPORTS[0])
+    pendant.process_message(REPORTS[1])
+    (first, first_x), (second, second_x) = positions
+    assert first is second
+    assert (first_x, second_x) == ("3", "2.932")
+
+
+def test_position_properties_reused(io):
+    regular = FluidNC(io)
+    reused = FluidNC(io, reuse_objects=True)
+    positions = []
+    for report in ("<Run|MPos:1.000,2.000,3.000|FS:0,0|WCO:0.500,0.000,1.000>",
+                   "<Run|MPos:2.000,2.000,3.000|FS:0,0>",
+                   "<Run|WPos:2.000,2.000,2.000|FS:0,0>",
+                   "<Run|WPos:3.000,2.000,2.000|FS:0,0>"):
+        regular.process_message(report)
+        reused.process_message(report)
+        assert repr(reused.machine_position) == repr(regular.machine_position)
+        assert repr(reused.work_position) == repr(regular.work_position)
+        positions.append((reused.machine_position, reused.work_position))
+    # updated in place, whether reported or worked out from the offset
+    assert positions[0][0] is positions[1][0] and positions[0][1] is positions[1][1]
+    assert positions[2][0] is positions[3][0] and positions[2][1] is positions[3][1]
+    assert str(positions[3][0].x) == "3.5"
+
+
+class Quiet(FluidNC):
+    def handle_machine_state(self, state): pass
+    def handle_position(self, kind, position): pass
+    def handle_feed(self, feed_rate): pass
+    def handle_spindle(self, spindle_speed): pass
+    def handle_triggers(self, triggers): pass
+    def handle_line_number(self, line_number): pass
+
+
+def peak_allocation(fnc, reports) -> int:
+    # largest amount of memory allocated while processing any one report
+    for report in reports:
+        fnc.process_message(report)     # warm up
+    tracemalloc.start()
+    try:
+        peak = 0
+        for report in reports:
+            tracemalloc.reset_peak()
+            before = tracemalloc.get_traced_memory()[0]
+            fnc.process_message(report)
+            peak = max(peak, tracemalloc.get_traced_memory()[1] - before)
+        return peak
+    finally:
+        tracemalloc.stop()
+
+
+def test_steady_state_allocation(io, caplog):
+    # the default handlers only log, and aren't called unless debug logging is enabled
+    caplog.set_level(logging.INFO, logger="fluidpy.fluidnc")
+    reports = [f"<Run|MPos:{i}.{i % 1000:03d},-12.500,3.000|FS:1500,12000|Ln:{i}|Pn:XP>" for i in range(100)]
+    reused = peak_allocation(Quiet(io, reuse_objects=True), reports)
+    regular = peak_allocation(Quiet(io), reports)
+    assert reused <= 256
+    assert reused * 4 < regular
@@ -0,0 +1,153 @@
+import asyncio
+import threading
+
+import pytest
+
+from fluidpy.fluidnc import FluidNC, RealtimeCommand, CommandCancelledError
+
+
+def test_realtime_commands(io):
+    fnc = FluidNC(io)
+    fnc.feed_hold()
+    fnc.cycle_start()
+    fnc.jog_cancel()
+    fnc.realtime(RealtimeCommand.FEED_OVR_COARSE_PLUS)
+    assert io.writes == [b"!", b"~", b"\x85", b"\x91"]
+    assert fnc.realtime_latency_max_ns >= fnc.realtime_latency_ns >= 0
+
+
+def test_realtime_rejects_unknown_command(io):
+    fnc = FluidNC(io)
+    with pytest.raises(ValueError):
+        fnc.realtime(ord("G"))
+    assert io.writes == []
+
+
+def test_send_command_responses(io):
+    fnc = FluidNC(io)
+    settings = fnc.send_command("$$")
+    unlock = fnc.send_command("$X")
+    bad = fnc.send_command("$Foo")
+    assert io.writes == [b"$$\n", b"$X\n", b"$Foo\n"]
+    assert not settings.done()
+
+    for message in ("$0=10", "<Idle|MPos:0.000,0.000,0.000|FS:0,0>", "$1=25", "ok",
+                    "[MSG:Caution: Unlocked]", "ok", "error:3"):
+        fnc.process_message(message)
+
+    assert settings.result().lines == ["$0=10", "$1=25"]
+    assert unlock.result().ok
+    assert unlock.result().lines == ["[MSG:Caution: Unlocked]"]
+    response = bad.result()
+    assert not response.ok
+    assert response.error == "3"
+
+
+def test_send_command_timeout(io):
+    fnc = FluidNC(io)
+    first = fnc.send_command("$I", timeout=0)
+    second = fnc.send_command("$G")
+    with pytest.raises(TimeoutError):
+        first.result()
+
+    # a late response still belongs to the command it answers
+    fnc.process_message("ok")
+    assert not second.done()
+    fnc.process_message("[GC:G0 G54 G17 G21 G90 G94 M5 M9 T0 F0 S0]")
+    fnc.process_message("ok")
+    assert second.result().lines == ["[GC:G0 G54 G17 G21 G90 G94 M5 M9 T0 F0 S0]"]
+
+
+def test_send_command_cancelled_by_restart(io):
+    fnc = FluidNC(io)
+    future = fnc.send_command("$H")
+    fnc.process_message("Grbl 4.0 [FluidNC v4.0.0 (wifi) '$' for help]")
+    with pytest.raises(CommandCancelledError):
+        future.result()
+
+
+def test_await_command(io):
+    fnc = FluidNC(io)
+
+    async def query():
+        future = fnc.send_command("$Report/Interval")
+        fnc.process_message("$Report/Interval=200")
+        fnc.process_message("ok")
+        return await future
+
+    response = asyncio.run(query())
+    assert response.lines == ["$Report/Interval=200"]
+
+
+def test_await_response_from_thread(io):
+    fnc = FluidNC(io)
+
+    async def query():
+        with pytest.raises(TimeoutError):
+            await fnc.send_command("$I", timeout=0.01)
+        future = fnc.send_command("$G", timeout=5)
+        # `listen` in another thread answers both while the task waits
+        answer = threading.Thread(target=lambda: [fnc.process_message("ok") for _ in range(2)])
+        asyncio.get_running_loop().call_later(0.01, answer.start)
+        return await future
+
+    assert asyncio.run(asyncio.wait_for(query(), 10)).ok
+
+
+def test_write_coalescing(io):
+    fnc = FluidNC(io, write_buffer_size=32)
+    fnc.send_message("(EXP,fluidpy)")
+    fnc.queue_line("G0 X1")
+    fnc.feed_hold()
+    assert io.writes == [b"!"]
+
+    # buffered bytes go out once the threshold is reached...
+    fnc.queue_line("G1 X2 Y2 F100")
+    assert io.writes == [b"!", b"(EXP,fluidpy)G0 X1\nG1 X2 Y2 F100\n"]
+
+    # ...or on the next poll
+    fnc.queue_line("G0 X0")
+    fnc.poll()
+    assert io.writes[-1] == b"G0 X0\n"
+    assert fnc.writes_requested == 4
+    assert fnc.writes_issued == 3
+    assert fnc.bytes_sent == 1 + 33 + 6
+
+
+def test_write_buffer_locked(io):
+    fnc = FluidNC(io, write_buffer_size=8)
+    fnc.send_message("(a)")
+
+    # a send from another thread waits while the buffer is being written out
+    sender = threading.Thread(target=fnc.send_message, args=("(bcdef)",))
+    with fnc._write_lock:
+        sender.start()
+        sender.join(0.05)
+        assert sender.is_alive()
+        assert io.writes == []
+    sender.join()
+    fnc.flush()
+    assert io.writes == [b"(a)(bcdef)"]
+
+
+def test_registered_messages_are_not_reencoded(io):
+    fnc = FluidNC(io)
+    jog = fnc.register_line("$J=G91 X1 F1000")
+    status = fnc.register_message("$G")
+    fnc.queue_line("$J=G91 X1 F1000")
+    fnc.send_message("$G")
+    fnc.process_message("[EXP:ID]")
+    assert io.writes[0] is jog
+    assert io.writes[1] is status
+    assert io.writes[2] is FluidNC.encoded_messages["(EXP,fluidpy)"]
+
+
+def test_bytes_like_messages(io):
+    fnc = FluidNC(io)
+    line = bytearray(b"G0 X1\n")
+    fnc.queue_line(memoryview(line))
+    fnc.queue_line(b"G0 X2")
+    fnc.send_message(b"(EXP,fluidpy)")
+    fnc.process_message("[EXP:io.1=out]")
+    assert io.writes == [b"G0 X1\n", b"G0 X2\n", b"(EXP,fluidpy)", b"\xb2"]
+    assert fnc.bytes_in_flight == 12
@@ -0,0 +1,78 @@
+import logging
+
+import pytest
+
+from fluidpy.fluidnc import FluidNC
+from fluidpy.settings import SettingsCache, typed_value
+from fluidpy.simulator import SimulatorInterface
+
+
+def drain(fnc: FluidNC) -> None:
+    while fnc.poll(catch_exc=False):
+        pass
+
+
+def test_loaded_and_refreshed_from_simulator():
+    io = SimulatorInterface(settings={"Spindle/Max": "24000.5", "Sta/Hidden": "Off"})
+    fnc = FluidNC(io)
+    drain(fnc)
+    settings = fnc.enable_settings()
+    dump = settings.load()
+    drain(fnc)
+    assert dump.result().ok
+    assert len(settings) == len(io.controller.settings)
+    assert settings.get("$report/interval") == 200
+    assert settings.get("Spindle/Max") == 24000.5
+    assert settings.get("Sta/Hidden") is False
+    assert settings.get("Hostname") == "fluidnc-sim"
+    assert settings.get("Missing", 7) == 7
+    assert settings.age_ms("Hostname") >= 0 and settings.age_ms("Missing") is None
+
+    # only the written setting is read again
+    received = len(io.controller.received)
+    version = settings.version
+    write = settings.set("Report/Interval", 50)
+    assert settings.is_stale("report/interval")
+    drain(fnc)
+    assert write.result().ok
+    assert io.controller.received[received:] == ["$Report/Interval=50", "$Report/Interval"]
+    assert settings.get("Report/Interval") == 50 and not settings.stale
+    assert settings.version == version + 1
+
+    settings.invalidate("hostname")
+    futures = settings.refresh()
+    drain(fnc)
+    assert [future.result().command for future in futures] == ["$Hostname"]
+    assert not settings.stale
+
+    fnc.disable_settings()
+    assert "handle_variable" not in vars(fnc)
+
+
+def test_bulk_ingest():
+    settings = SettingsCache()
+    lines = ["$0=10", "$Config/Filename=config.yaml", "[MSG:INFO: not a setting]", "$N0=", "$1=2.5"]
+    assert settings.ingest(lines) == 4
+    assert settings.raw("config/filename") == "config.yaml"
+    assert dict(settings.items()) == {"0": 10, "Config/Filename": "config.yaml", "N0": "", "1": 2.5}
+    with pytest.raises(RuntimeError):
+        settings.load()
+
+
+def test_variables_skip_other_patterns(io, caplog):
+    caplog.set_level(logging.INFO, logger="fluidpy.fluidnc")
+    fnc = FluidNC(io)
+    assert "handle_variable" not in fnc._dispatch
+    settings = fnc.enable_settings()
+    assert fnc.process_message("$Message/Level=Info") == "variable"
+    assert settings.get("message/level") == "Info"
+    fnc.disable_settings()
+    assert "handle_variable" not in fnc._dispatch
+
+
+def test_typed_values():
+    assert typed_value("200") == 200
+    assert typed_value("-0.5") == -0.5
+    assert typed_value("ON") is True
+    assert typed_value("inf") == "inf"
+    assert typed_value("Info") == "Info"
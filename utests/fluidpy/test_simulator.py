@@ -0,0 +1,141 @@
+from fluidpy.fluidnc import FluidNC, RealtimeCommand
+from fluidpy.simulator import SimulatedController, SimulatorInterface
+from fluidpy.streamer import Streamer
+
+
+class Client(FluidNC):
+
+    def __init__(self, io, **kwargs):
+        self.states = []
+        self.alarms = []
+        super().__init__(io, **kwargs)
+
+    def handle_machine_state(self, state):
+        self.states.append(state)
+
+    def handle_alarm(self, alarm):
+        self.alarms.append(alarm)
+
+
+def drain(fnc: FluidNC) -> None:
+    while fnc.poll(catch_exc=False):
+        pass
+
+
+def test_handshake_and_report_interval(clock):
+    io = SimulatorInterface(pins={"io.1": "out"}, clock=clock)
+    fnc = Client(io)
+    drain(fnc)
+    assert io.controller.expander_id == "fluidpy"
+    assert io.controller.received == ["$Report/Interval=200"]
+    assert io.controller.settings["Report/Interval"] == "200"
+
+    clock.advance(200)
+    drain(fnc)
+    clock.advance(200)
+    drain(fnc)
+    assert fnc.states == ["Idle", "Idle"]
+
+
+def test_setting_queries(clock):
+    io = SimulatorInterface(clock=clock)
+    fnc = Client(io)
+    drain(fnc)
+    hostname = fnc.send_command("$Hostname")
+    missing = fnc.send_command("$Nope")
+    changed = fnc.send_command("$Message/Level=Debug")
+    drain(fnc)
+    assert hostname.result().lines == ["$Hostname=fluidnc-sim"]
+    assert missing.result().error == "3"
+    assert changed.result().ok
+    assert io.controller.settings["Message/Level"] == "Debug"
+
+
+def test_stream_limited_by_planner(clock):
+    io = SimulatorInterface(planner_blocks=4, block_ms=10, clock=clock)
+    fnc = Client(io)
+    drain(fnc)
+    streamer = Streamer(fnc, [f"G1 X{i} F1000" for i in range(1, 11)])
+    start_ns = clock.now
+    streamer.start()
+    drain(fnc)
+    # the line filling the planner is answered once a block finishes
+    assert streamer.lines_completed == 3
+    assert io.controller.rx_overflows == 0
+
+    while not streamer.done:
+        clock.advance(10)
+        drain(fnc)
+        # never more lines answered than blocks executed and room left in the planner
+        blocks_done = (clock.now - start_ns) // 10_000_000
+        assert streamer.lines_completed <= blocks_done + 3
+    assert streamer.errors == []
+    clock.advance(30)
+    io.controller.run()
+    assert io.controller.position[0] == 10
+
+
+def test_stream_starts_behind_queued_commands(clock):
+    io = SimulatorInterface(clock=clock)
+    fnc = Client(io)
+    drain(fnc)
+    queries = [fnc.send_command("$Hostname") for _ in range(18)]
+    assert fnc.lines_queued
+    streamer = Streamer(fnc, [f"G1 X{i} F1000" for i in range(1, 11)])
+    streamer.start()
+    while not streamer.done:
+        clock.advance(10)
+        drain(fnc)
+    assert all(query.result().ok for query in queries)
+    assert streamer.lines_completed == 10 and streamer.errors == []
+
+
+def test_command_sent_mid_stream(clock):
+    io = SimulatorInterface(clock=clock)
+    fnc = Client(io, rx_buffer_size=16)
+    drain(fnc)
+    streamer = Streamer(fnc, [f"G1 X{i} F1000" for i in range(1, 11)])
+    streamer.start()
+    clock.advance(10)
+    drain(fnc)
+    hostname = fnc.send_command("$Hostname")
+    while not streamer.done:
+        clock.advance(10)
+        drain(fnc)
+    assert hostname.result().lines == ["$Hostname=fluidnc-sim"]
+    assert streamer.lines_completed == 10
+    assert fnc.lines_in_flight == 0 and fnc.lines_queued == 0
+
+
+def test_alarm_locks_out_gcode(clock):
+    io = SimulatorInterface(clock=clock)
+    fnc = Client(io)
+    drain(fnc)
+    io.controller.alarm(1)
+    locked = fnc.send_command("G0 X1")
+    drain(fnc)
+    assert fnc.alarms == ["1"]
+    assert locked.result().error == "9"
+
+    unlock = fnc.send_command("$X")
+    drain(fnc)
+    assert unlock.result().lines == ["[MSG:Caution: Unlocked]"]
+
+
+def test_feed_hold_and_resume(clock):
+    controller = SimulatedController(block_ms=100, clock=clock)
+    fnc = Client(SimulatorInterface(controller))
+    drain(fnc)
+    fnc.queue_line("G1 X10 F600")
+    drain(fnc)
+    clock.advance(50)
+    fnc.feed_hold()
+    drain(fnc)
+    clock.advance(500)
+    fnc.realtime(RealtimeCommand.STATUS_REPORT)
+    drain(fnc)
+    assert controller.current_position(clock.now)[0] == 5
+    fnc.cycle_start()
+    clock.advance(50)
+    drain(fnc)
+    assert fnc.states == ["Hold:0", "Hold:0", "Idle"]
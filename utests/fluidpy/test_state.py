@@ -0,0 +1,101 @@
+import logging
+import threading
+
+from fluidpy.fluidnc import FluidNC
+
+
+def test_snapshots_follow_reports(io):
+    fnc = FluidNC(io, reuse_objects=True)
+    machine = fnc.enable_machine_state()
+    fnc.process_message("<Idle|MPos:1.000,2.000,3.000|FS:0,0|WCO:1.000,0.000,0.000|Ov:100,100,100|Pn:P>")
+    first = machine.snapshot()
+    fnc.process_message("<Run|MPos:4.000,5.000,6.000|FS:500,12000|Bf:15,128>")
+    fnc.process_message("[GC:G0 G54 G17 G21 G90 G94 M5 M9 T0 F0 S0]")
+    latest = machine.snapshot()
+
+    assert (first.version, latest.version) == (1, 3)
+    assert (first.state, str(first.mpos.x), first.pins) == ("Idle", "1", "P")
+    assert (latest.state, str(latest.mpos.x), latest.pins) == ("Run", "4", "")
+    assert str(latest.wco.x) == "1"
+    assert [str(value) for value in latest.overrides] == ["100", "100", "100"]
+    assert (str(latest.feed), str(latest.spindle), latest.buffer) == ("500", "12000", (15, 128))
+    assert latest.mode.wco_index == 1
+
+    # messages that don't change the state don't publish a snapshot
+    fnc.process_message("[MSG:INFO: hello]")
+    assert machine.snapshot() is latest
+
+
+def test_alarm_cleared_when_unlocked(io):
+    fnc = FluidNC(io)
+    machine = fnc.enable_machine_state()
+    fnc.process_message("<Idle|MPos:0.000,0.000,0.000|FS:0,0>")
+    fnc.process_message("ALARM:1")
+    fnc.process_message("<Alarm|MPos:0.000,0.000,0.000|FS:0,0>")
+    assert machine.snapshot().alarm == "1"
+    fnc.process_message("<Idle|MPos:0.000,0.000,0.000|FS:0,0>")
+    assert machine.snapshot().alarm is None
+
+
+def test_disable_restores_handlers(io):
+    class Pendant(FluidNC):
+        def handle_position(self, kind, position):
+            self.position = position
+
+    pendant = Pendant(io)
+    pendant.enable_machine_state()
+    pendant.process_message("<Idle|MPos:1.000,0.000,0.000|FS:0,0>")
+    assert str(pendant.position.x) == "1"
+    pendant.disable_machine_state()
+    assert "handle_position" not in pendant.__dict__
+    assert "process_message" not in pendant.__dict__
+
+
+def test_handlers_stay_required_by_remaining_features(io, caplog):
+    caplog.set_level(logging.INFO, logger="fluidpy.fluidnc")
+    fnc = FluidNC(io)
+    fnc.enable_machine_state()
+    history = fnc.enable_history(capacity=8)
+    fnc.disable_machine_state()
+    fnc.process_message("<Run|MPos:1.000,2.000,3.000|FS:600,12000>")
+    latest = history.index(-1)
+    assert (history.feeds[latest], history.spindles[latest]) == (600.0, 12000.0)
+
+    fnc = FluidNC(io)
+    fnc.enable_adaptive_reporting()
+    machine = fnc.enable_machine_state()
+    fnc.disable_adaptive_reporting()
+    fnc.process_message("<Run|MPos:1.000,2.000,3.000|FS:600,12000>")
+    assert machine.snapshot().state == "Run"
+
+
+def test_readers_never_see_partial_reports(io):
+    fnc = FluidNC(io, reuse_objects=True)
+    machine = fnc.enable_machine_state()
+    done = threading.Event()
+    torn = []
+
+    def reader():
+        while not done.is_set():
+            snapshot = machine.snapshot()
+            if snapshot.mpos is not None:
+                values = {str(snapshot.mpos.x), str(snapshot.mpos.y), str(snapshot.mpos.z), str(snapshot.feed)}
+                if len(values) != 1:
+                    torn.append(values)
+
+    thread = threading.Thread(target=reader)
+    thread.start()
+    for i in range(2000):
+        fnc.process_message(f"<Run|MPos:{i}.5,{i}.5,{i}.5|FS:{i}.5,0>")
+    done.set()
+    thread.join()
+    assert torn == []
+    assert machine.version == 2000
+
+
+def test_work_position_in_snapshot(io):
+    fnc = FluidNC(io)
+    machine = fnc.enable_machine_state()
+    fnc.process_message("<Idle|WPos:2.000,0.000,0.000|FS:0,0|WCO:1.000,0.000,0.000>")
+    snapshot = machine.snapshot()
+    assert (str(snapshot.wpos.x), str(snapshot.mpos.x), str(snapshot.wco.x)) == ("2", "3", "1")
@@ -0,0 +1,136 @@
+import time
+
+import fluidpy.stats
+from fluidpy.fluidnc import FluidNC
+from fluidpy.simulator import SimulatorInterface
+from fluidpy.stats import Histogram
+
+MESSAGES = (
+    "<Idle|MPos:3.000,0.000,0.000|FS:0,0|Pn:PT>",
+    "<Jog|MPos:2.932,0.000,0.000|FS:7,0|Pn:PT|Ln:99999>",
+    "[MSG:DBG: ModbusVFD: setState:3 SpindleSpeed:100]",
+    "[GC:G0 G54 G17 G21 G90 G94 M5 M9 T0 F0 S100]",
+    "ok",
+    "error:x",
+    "ALARM:10",
+)
+
+
+def test_histogram_buckets():
+    histogram = Histogram()
+    for ns in (500, 1_500, 1_500, 3_000_000, 500_000_000):
+        histogram.record(ns)
+    assert histogram.counts[0] == 1
+    assert histogram.counts[1] == 2
+    assert histogram.counts[-1] == 1
+    assert histogram.max_ns == 500_000_000
+    assert histogram.percentile(50) == 2_000
+
+
+def test_stats_per_kind(io):
+    fnc = FluidNC(io)
+    fnc.dispatch_all = True
+    fnc.update_dispatch_plan()
+    assert fnc.stats() is None
+    fnc.enable_stats()
+    for message in MESSAGES:
+        fnc.process_message(message)
+    fnc.poll()
+
+    stats = fnc.stats()
+    assert stats["messages"] == 7
+    assert stats["kinds"]["status"]["count"] == 2
+    assert stats["kinds"]["gc"]["dispatch"]["count"] == 1
+    assert set(stats["kinds"]) == {"status", "msg", "gc", "ok", "error", "alarm"}
+
+    fnc.reset_stats()
+    assert fnc.stats()["messages"] == 0
+
+
+def test_disable_stats_restores_methods(io):
+    fnc = FluidNC(io)
+    fnc.enable_stats()
+    fnc.disable_stats()
+    assert "process_message" not in fnc.__dict__
+    assert not [name for name in fnc.__dict__ if name.startswith("handle_")]
+
+
+def test_features_disabled_in_any_order(io):
+    fnc = FluidNC(io)
+    fnc.enable_stats()
+    state = fnc.enable_machine_state()
+    fnc.disable_stats()
+    fnc.process_message(MESSAGES[0])
+    assert state.version == 1
+    assert state.snapshot().state == "Idle"
+
+    fnc.enable_stats()
+    fnc.disable_machine_state()
+    fnc.process_message(MESSAGES[1])
+    assert fnc.stats()["kinds"]["status"]["count"] == 1
+    fnc.disable_stats()
+    assert "process_message" not in fnc.__dict__ and not fnc._method_chains
+
+
+def test_handler_timing(io, caplog):
+    class SlowDisplay(FluidNC):
+        def handle_position(self, kind, position):
+            time.sleep(0.03)
+
+    fnc = SlowDisplay(io)
+    fnc.dispatch_all = True
+    fnc.update_dispatch_plan()
+    fnc.report_interval = 50
+    fnc.enable_handler_timing()
+    for message in MESSAGES[:3]:
+        fnc.process_message(message)
+
+    timings = fnc.handler_timings()
+    assert timings["handle_position"]["calls"] == 2
+    assert timings["handle_position"]["slow_calls"] == 2
+    assert timings["handle_position"]["max_ms"] >= 30
+    assert timings["handle_log"]["slow_calls"] == 0
+    assert "slow handler handle_position" in caplog.text
+
+    fnc.disable_handler_timing()
+    assert fnc.handler_timings() is None
+    assert "handle_position" not in fnc.__dict__
+
+
+def test_handler_budget_without_reports(io, caplog):
+    fnc = FluidNC(io, report_interval=0)
+    fnc.handle_position = lambda kind, position: None
+    fnc.enable_handler_timing()
+    for message in MESSAGES[:2]:
+        fnc.process_message(message)
+    assert fnc.handler_timings()["handle_position"]["slow_calls"] == 0
+    assert "slow handler" not in caplog.text
+    fnc.disable_handler_timing()
+
+
+def test_report_metrics(clock, monkeypatch):
+    monkeypatch.setattr(fluidpy.stats, "ticks_ns", clock)
+    io = SimulatorInterface(clock=clock)
+    fnc = FluidNC(io)
+    fnc.enable_report_metrics()
+
+    # the controller is asked for a report every 200 ms, one comes 400 ms after the last
+    for ms in (0, 200, 200, 400, 200):
+        clock.advance(ms)
+        while fnc.poll():
+            pass
+    clock.advance(50)
+
+    metrics = fnc.report_metrics()
+    assert metrics["reports"] == 4
+    assert metrics["expected_interval_ms"] == 200
+    assert metrics["age_ms"] == 50
+    assert metrics["interval_ms"]["min"] == 200
+    assert metrics["interval_ms"]["max"] == 400
+    assert metrics["max_deviation_ms"] == 200
+    assert metrics["late"] == 1
+    assert metrics["queueing"]["count"] == 4
+
+    fnc.disable_report_metrics()
+    assert "process_message" not in fnc.__dict__
+    assert fnc.report_metrics() is None
@@ -0,0 +1,53 @@
+from fluidpy.fluidnc import FluidNC
+from fluidpy.streamer import Streamer
+
+
+JOB = [
+    "G21 ; metric",
+    "",
+    "G0 X1",
+    "G1 X2 F100",
+    "G1 X3",
+    "G1 X4",
+]
+
+
+def test_lines_limited_by_receive_buffer(io):
+    fnc = FluidNC(io, rx_buffer_size=16)
+    fnc.queue_line("G0 X1")     # 6 bytes with newline
+    fnc.queue_line("G0 X2")
+    fnc.queue_line("G0 X3")
+    assert io.writes == [b"G0 X1\n", b"G0 X2\n"]
+    assert fnc.bytes_in_flight == 12
+    assert fnc.lines_queued == 1
+
+    fnc.process_message("ok")
+    assert io.writes[-1] == b"G0 X3\n"
+    assert fnc.lines_in_flight == 2
+    assert fnc.lines_queued == 0
+
+
+def test_streamer_results(io):
+    fnc = FluidNC(io, rx_buffer_size=24)
+    streamer = Streamer(fnc, JOB)
+    streamer.start()
+    assert io.writes == [b"G21\n", b"G0 X1\n", b"G1 X2 F100\n"]
+
+    for response in ("ok", "ok", "error:20", "ok", "ok"):
+        fnc.process_message(response)
+
+    assert streamer.done
+    assert streamer.lines_completed == 5
+    assert streamer.errors == [(3, "G1 X2 F100", "error:20")]
+    assert fnc.lines_in_flight == 0
+
+
+def test_streamer_aborted_by_restart(io):
+    fnc = FluidNC(io, rx_buffer_size=24)
+    streamer = Streamer(fnc, JOB)
+    streamer.start()
+    fnc.process_message("ok")
+    fnc.process_message("Grbl 4.0 [FluidNC v4.0.0 (wifi) '$' for help]")
+    assert streamer.aborted
+    assert streamer.done
+    assert io.writes[-1] == b"$Report/Interval=200\n"
@@ -0,0 +1,89 @@
+import pytest
+
+import fluidpy.throttle
+from fluidpy.fluidnc import FluidNC
+
+
+class Display(FluidNC):
+
+    def __init__(self, io, **kwargs):
+        self.calls = []
+        super().__init__(io, **kwargs)
+
+    def handle_machine_state(self, state):
+        self.calls.append(("state", state))
+
+    def handle_position(self, kind, position):
+        self.calls.append((kind, str(position.x)))
+
+    def handle_feed(self, feed_rate):
+        self.calls.append(("feed", str(feed_rate)))
+
+    def handle_alarm(self, alarm_code):
+        self.calls.append(("alarm", alarm_code))
+
+
+@pytest.fixture
+def clock(clock, monkeypatch):
+    clock.now = 1_000_000_000
+    monkeypatch.setattr(fluidpy.throttle, "ticks_ns", clock)
+    return clock
+
+
+def report(state: str, x: int, feed: int = 100) -> str:
+    return f"<{state}|MPos:{x}.000,0.000,0.000|F:{feed}>"
+
+
+def test_latest_value_delivered_at_max_rate(io, clock):
+    display = Display(io)
+    display.enable_throttle('handle_position', max_hz=10)
+    for x in range(5):
+        display.process_message(report('Run', x))
+        clock.advance(20)
+    # the first report is delivered at once, the rest replace each other until 100 ms later
+    positions = [call for call in display.calls if call[0] == 'MPos']
+    assert positions == [("MPos", "0")]
+    assert [call for call in display.calls if call[0] == 'feed'] == [("feed", "100")] * 5
+
+    display.poll(catch_exc=False)
+    assert display.calls[-1] == ("MPos", "4")
+    assert display._throttle.held_back == 3
+    display.poll()
+    assert display.calls[-1] == ("MPos", "4")
+
+
+def test_edges_delivered_immediately(io, clock):
+    display = Display(io)
+    display.enable_throttle('status', max_hz=1)
+    display.process_message(report('Run', 1, feed=100))
+    clock.advance(1)
+    display.process_message(report('Run', 2, feed=200))
+    assert display.calls == [("state", "Run"), ("MPos", "1"), ("feed", "100")]
+
+    # a new state flushes the values held back first, so they're never older than the state
+    display.calls.clear()
+    display.process_message(report('Hold:0', 3))
+    assert display.calls[:3] == [("MPos", "2"), ("feed", "200"), ("state", "Hold:0")]
+
+    display.process_message("ALARM:1")
+    assert display.calls[-1] == ("alarm", "1")
+
+
+def test_unthrottle_delivers_held_back_values(io, clock):
+    display = Display(io)
+    display.enable_throttle('status', max_hz=1)
+    display.process_message(report('Run', 1))
+    display.process_message(report('Run', 2))
+    display.disable_throttle()
+    assert display.calls[-2:] == [("MPos", "2"), ("feed", "100")]
+    assert display._throttle is None
+    assert "handle_position" not in vars(display)
+    assert "poll" not in vars(display)
+
+
+def test_never_throttled(io):
+    display = Display(io)
+    with pytest.raises(ValueError):
+        display.enable_throttle('handle_alarm', max_hz=1)
+    with pytest.raises(ValueError):
+        display.enable_throttle('position', max_hz=1)